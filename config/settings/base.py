@@ -54,6 +54,11 @@ DATABASES = {
     ),
 }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Optional read replicas (comma-separated URLs) exposed as "replica1", "replica2", ...
+# so `report_indexes --all-databases` can aggregate index usage across them.
+for _i, _url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    DATABASES[f"replica{_i}"] = env.db_url_config(_url)
+    DATABASES[f"replica{_i}"]["TEST"] = {"MIRROR": "default"}
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -291,3 +296,7 @@ SOCIALACCOUNT_FORMS = {"signup": "goodvibes.users.forms.UserSocialSignupForm"}
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Serve product-by-SKU and customer-by-email from goodvibes.shop.cache (in-process LRU + CACHES["default"]).
+SHOP_LOOKUP_CACHE = env.bool("SHOP_LOOKUP_CACHE", default=True)
+# Answer /api/shop/ for anyone, not only staff (it exposes customer emails and orders; benchmark databases only).
+SHOP_API_PUBLIC = env.bool("SHOP_API_PUBLIC", default=False)
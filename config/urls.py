@@ -19,7 +19,7 @@ urlpatterns = [
     path("users/", include("goodvibes.users.urls", namespace="users")),
     path("accounts/", include("allauth.urls")),
     # Your stuff: custom urls includes go here
-    # ...
+    path("api/shop/", include("goodvibes.shop.urls", namespace="shop")),
     # Media files
     *static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT),
 ]
@@ -1,5 +1,7 @@
 import pytest
+from django.core.cache import cache as django_cache
 
+from goodvibes.shop import cache
 from goodvibes.users.models import User
 from goodvibes.users.tests.factories import UserFactory
 
@@ -9,6 +11,15 @@ def _media_storage(settings, tmpdir) -> None:
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def _lookup_caches():
+    # Cached rows would outlive the test transaction that created them.
+    yield
+    django_cache.clear()
+    for lookup in cache.LOOKUP_CACHES:
+        lookup.local.clear()
+
+
 @pytest.fixture
 def user(db) -> User:
     return UserFactory()
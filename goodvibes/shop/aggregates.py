@@ -0,0 +1,192 @@
+"""Incrementally maintained sales aggregates (``ProductDailySales``).
+
+``refresh`` is a delta job meant to run periodically (``refresh_sales_aggregates``):
+
+* it adds the items of orders with ``last_order_id < id <= watermark`` to the
+  per-product, per-day totals with one ``INSERT ... ON CONFLICT DO UPDATE``;
+* ids are assigned at INSERT, not at commit, so a transaction still open can
+  commit orders below ids already visible, whatever their created_at (seeding
+  writes past timestamps). The watermark therefore follows transaction
+  visibility: with no other transaction open it is the highest visible id;
+  otherwise the highest id of an earlier run becomes the watermark once every
+  transaction open at that run has ended (see ``next_watermark``). Open
+  transactions of other databases in the cluster hold it back too;
+* orders cancelled, un-cancelled or deleted after they were counted are not
+  seen by the delta. A trigger on shop_order (migration 0011) records each
+  such change's order day in ``SalesAggregateStaleDay``, whatever issued it
+  (``save()``, ``QuerySet.update()``, raw SQL), and the refresh re-derives
+  those days from the order tables, using the created_at indexes.
+  ``recompute_days`` additionally re-derives the last N days. Changes to the
+  items of an order already counted are not tracked.
+
+``rebuild`` recomputes everything. Aggregates outlive the rows they came from,
+so after detaching or dropping order partitions a rebuild loses those months.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models import Sum
+from django.utils import timezone
+
+from goodvibes.shop.models import ProductDailySales
+from goodvibes.shop.models import SalesAggregateState
+
+STATE_ID = 1
+
+# Highest visible order id, the snapshot's xmax and the oldest other transaction still open, all
+# from one snapshot. A transaction draws its first order id just before it gets its xid, so one
+# stalled between the two is missed; the window is a few instructions long.
+SNAPSHOT_SQL = """
+SELECT
+    (SELECT COALESCE(max(id), 0) FROM shop_order),
+    pg_snapshot_xmax(s)::text::bigint,
+    (
+        SELECT min(x::text::bigint) FROM pg_snapshot_xip(s) AS x
+        WHERE x IS DISTINCT FROM pg_current_xact_id_if_assigned()
+    )
+FROM pg_current_snapshot() AS s
+"""
+
+ACCUMULATE_SQL = """
+INSERT INTO shop_productdailysales (day, product_id, category, units, order_lines)
+SELECT (o.created_at AT TIME ZONE 'UTC')::date, oi.product_id, p.category, sum(oi.quantity), count(*)
+FROM shop_order o
+JOIN shop_orderitem oi ON oi.order_id = o.id
+JOIN shop_product p ON p.id = oi.product_id
+WHERE o.id > %s AND o.id <= %s AND o.cancelled_at IS NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (product_id, day) DO UPDATE
+SET units = shop_productdailysales.units + EXCLUDED.units,
+    order_lines = shop_productdailysales.order_lines + EXCLUDED.order_lines,
+    category = EXCLUDED.category
+"""
+
+# Re-derives one UTC day from the orders earlier runs counted; the delta adds the rest.
+RECOMPUTE_SQL = """
+INSERT INTO shop_productdailysales (day, product_id, category, units, order_lines)
+SELECT (o.created_at AT TIME ZONE 'UTC')::date, oi.product_id, p.category, sum(oi.quantity), count(*)
+FROM shop_order o
+JOIN shop_orderitem oi ON oi.order_id = o.id
+JOIN shop_product p ON p.id = oi.product_id
+WHERE o.created_at >= %s AND o.created_at < %s AND o.id <= %s AND o.cancelled_at IS NULL
+GROUP BY 1, 2, 3
+"""
+
+# A change committing after this statement keeps its row for the next run.
+TAKE_STALE_DAYS_SQL = "DELETE FROM shop_salesaggregatestaleday RETURNING day"
+
+
+@dataclass(frozen=True)
+class RefreshResult:
+    previous_watermark: int
+    watermark: int
+    # Aggregate rows inserted or updated by the delta.
+    rows: int
+    recomputed_from: date | None
+    # Days re-derived because orders on them changed since the last run.
+    stale_days: int
+    recomputed_rows: int
+    seconds: float
+
+
+def recompute_start(now: datetime, days: int) -> date | None:
+    """First UTC day of the last ``days`` days (today included), or None for 0."""
+    if days <= 0:
+        return None
+    return now.astimezone(UTC).date() - timedelta(days=days - 1)
+
+
+def next_watermark(
+    previous: int,
+    pending: tuple[int, int] | None,
+    max_id: int,
+    xmax: int,
+    oldest_open: int | None,
+) -> tuple[int, tuple[int, int] | None]:
+    """New watermark and pending ``(order_id, xmax)`` from one snapshot.
+
+    Every id up to ``max_id`` is final if no other transaction is open
+    (``oldest_open`` is None). Otherwise ``max_id`` is parked as pending, and
+    a pending id becomes the watermark once the oldest open transaction
+    started after its snapshot (``xmax <= oldest_open``).
+    """
+    if oldest_open is None:
+        return max(previous, max_id), None
+    watermark = previous
+    if pending is not None and pending[1] <= oldest_open:
+        watermark = max(previous, pending[0])
+        pending = None
+    if pending is None and max_id > watermark:
+        pending = (max_id, xmax)
+    return watermark, pending
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=UTC)
+
+
+def refresh(
+    connection,
+    *,
+    recompute_days: int = 0,
+    rebuild: bool = False,
+) -> RefreshResult:
+    """Bring ProductDailySales up to date; concurrent runs wait for each other."""
+    started = time.perf_counter()
+    with transaction.atomic(using=connection.alias):
+        state, _ = SalesAggregateState.objects.using(connection.alias).select_for_update().get_or_create(pk=STATE_ID)
+        previous = 0 if rebuild else state.last_order_id
+        now = timezone.now()
+        start = None if rebuild else recompute_start(now, recompute_days)
+        recomputed_rows = 0
+        with connection.cursor() as cur:
+            cur.execute(SNAPSHOT_SQL)
+            max_id, xmax, oldest_open = cur.fetchone()
+            pending = (state.pending_order_id, state.pending_xmax) if state.pending_order_id else None
+            watermark, pending = next_watermark(previous, pending, max_id, xmax, oldest_open)
+            cur.execute(TAKE_STALE_DAYS_SQL)
+            stale = {day for (day,) in cur.fetchall()}
+            if rebuild:
+                cur.execute("DELETE FROM shop_productdailysales")
+                stale = set()
+            days = set(stale)
+            if start is not None:
+                days.update(start + timedelta(days=i) for i in range((now.astimezone(UTC).date() - start).days + 1))
+            for day in sorted(days):
+                cur.execute("DELETE FROM shop_productdailysales WHERE day = %s", [day])
+                cur.execute(RECOMPUTE_SQL, [_day_start(day), _day_start(day + timedelta(days=1)), previous])
+                recomputed_rows += cur.rowcount
+            cur.execute(ACCUMULATE_SQL, [previous, watermark])
+            rows = cur.rowcount
+        state.last_order_id = watermark
+        state.pending_order_id, state.pending_xmax = pending or (0, 0)
+        state.refreshed_at = timezone.now()
+        state.save(using=connection.alias)
+    return RefreshResult(
+        previous_watermark=previous,
+        watermark=watermark,
+        rows=rows,
+        recomputed_from=start,
+        stale_days=len(stale),
+        recomputed_rows=recomputed_rows,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def daily_units(start: date, end: date, *, by: str = "category") -> QuerySet:
+    """Units per day and ``by`` (``category`` or ``product``) for ``start``..``end`` inclusive."""
+    return (
+        ProductDailySales.objects.filter(day__gte=start, day__lte=end)
+        .values("day", by)
+        .annotate(units=Sum("units"), order_lines=Sum("order_lines"))
+        .order_by("day", by)
+    )
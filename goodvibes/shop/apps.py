@@ -5,4 +5,5 @@ class ShopConfig(AppConfig):
     name = "goodvibes.shop"
     verbose_name = "Shop"
 
-
+    def ready(self):
+        import goodvibes.shop.signals  # noqa: F401, PLC0415
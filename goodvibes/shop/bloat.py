@@ -0,0 +1,165 @@
+"""B-tree index bloat estimation.
+
+Two strategies are available:
+
+* ``estimate_bloat`` derives the expected number of pages for every B-tree
+  index from ``pg_stats`` column widths and ``pg_class`` tuple counts. It only
+  reads the catalogs, so it is cheap enough to run on every report, but it is
+  only as fresh as the last ANALYZE.
+* ``exact_bloat`` calls ``pgstatindex()`` from the ``pgstattuple`` extension.
+  It reads every page of the index, so it is exact but proportional to index
+  size.
+
+Both return ``{index_oid: (bloat_bytes, bloat_pct)}``. Indexes that cannot be
+measured (non-B-tree, empty, or missing statistics) are left out. They measure
+the physical indexes, i.e. each partition's copy of a partitioned table's
+index; ``by_model_index`` sums those into the partitioned index.
+"""
+
+from __future__ import annotations
+
+import math
+
+# Estimation follows the well-known catalog-only btree bloat query: every index
+# tuple costs an 8 byte header (plus a null bitmap when any key column has NULLs)
+# and its MAXALIGNed key width, plus a 4 byte line pointer; pages carry a 24 byte
+# header and a 16 byte btree special area and are filled up to ``fillfactor``.
+# Expression columns have their statistics stored under the index name.
+ESTIMATE_SQL = """
+WITH idx AS (
+  SELECT
+    ci.oid AS idxoid,
+    i.indrelid AS tbloid,
+    ci.relname AS idxname,
+    ci.relpages,
+    GREATEST(ci.reltuples, 0) AS reltuples,
+    COALESCE(
+      substring(array_to_string(ci.reloptions, ' ') FROM 'fillfactor=([0-9]+)')::int, 90
+    ) AS fillfactor,
+    i.indkey,
+    generate_series(1, i.indnatts) AS attpos
+  FROM pg_index i
+  JOIN pg_class ci ON ci.oid = i.indexrelid
+  JOIN pg_am am ON am.oid = ci.relam AND am.amname = 'btree'
+  JOIN pg_class ct ON ct.oid = i.indrelid
+  JOIN pg_namespace n ON n.oid = ct.relnamespace
+  WHERE ci.relpages > 0
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND ct.relname LIKE %s
+),
+cols AS (
+  SELECT
+    idx.*,
+    n.nspname,
+    COALESCE(a1.attname, a2.attname) AS attname,
+    CASE WHEN a1.attnum IS NULL THEN idx.idxname ELSE ct.relname END AS attrelname
+  FROM idx
+  JOIN pg_class ct ON ct.oid = idx.tbloid
+  JOIN pg_namespace n ON n.oid = ct.relnamespace
+  LEFT JOIN pg_attribute a1
+    ON idx.indkey[idx.attpos - 1] <> 0
+   AND a1.attrelid = idx.tbloid
+   AND a1.attnum = idx.indkey[idx.attpos - 1]
+  LEFT JOIN pg_attribute a2
+    ON idx.indkey[idx.attpos - 1] = 0
+   AND a2.attrelid = idx.idxoid
+   AND a2.attnum = idx.attpos
+),
+widths AS (
+  SELECT
+    cols.idxoid, cols.relpages, cols.reltuples, cols.fillfactor,
+    current_setting('block_size')::numeric AS bs,
+    CASE WHEN max(COALESCE(s.null_frac, 0)) = 0 THEN 8 ELSE 12 END AS tuple_hdr,
+    sum((1 - COALESCE(s.null_frac, 0)) * COALESCE(s.avg_width, 1024)) AS data_width
+  FROM cols
+  JOIN pg_stats s
+    ON s.schemaname = cols.nspname
+   AND s.tablename = cols.attrelname
+   AND s.attname = cols.attname
+  GROUP BY cols.idxoid, cols.relpages, cols.reltuples, cols.fillfactor
+),
+pages AS (
+  SELECT
+    idxoid, relpages, bs,
+    1 + ceil(
+      reltuples / NULLIF(floor(
+        (bs - 24 - 16) * fillfactor
+        / (100 * (4 + ceil(tuple_hdr / 8.0) * 8 + ceil(data_width / 8.0) * 8))
+      ), 0)
+    ) AS est_pages
+  FROM widths
+)
+SELECT
+  idxoid,
+  GREATEST(relpages - est_pages, 0)::bigint * bs::bigint AS bloat_bytes,
+  GREATEST(100 * (relpages - est_pages) / relpages, 0)::float AS bloat_pct
+FROM pages
+WHERE est_pages IS NOT NULL
+"""
+
+EXACT_SQL = """
+SELECT
+  ci.oid AS idxoid,
+  pg_relation_size(ci.oid) AS bytes,
+  current_setting('block_size')::bigint AS bs,
+  COALESCE(
+    substring(array_to_string(ci.reloptions, ' ') FROM 'fillfactor=([0-9]+)')::int, 90
+  ) AS fillfactor,
+  st.leaf_pages,
+  st.empty_pages,
+  st.deleted_pages,
+  st.avg_leaf_density
+FROM pg_index i
+JOIN pg_class ci ON ci.oid = i.indexrelid
+JOIN pg_am am ON am.oid = ci.relam AND am.amname = 'btree'
+JOIN pg_class ct ON ct.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = ct.relnamespace
+CROSS JOIN LATERAL pgstatindex(ci.oid::regclass) st
+WHERE ci.relpages > 0
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+  AND ct.relname LIKE %s
+"""
+
+
+ROOTS_SQL = """
+SELECT indexrelid, COALESCE(pg_partition_root(indexrelid), indexrelid), pg_relation_size(indexrelid)
+FROM pg_index
+WHERE indexrelid = ANY(%s)
+"""
+
+
+def has_pgstattuple(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+    return cursor.fetchone() is not None
+
+
+def estimate_bloat(cursor, table_pattern: str = "shop_%") -> dict[int, tuple[int, float]]:
+    cursor.execute(ESTIMATE_SQL, [table_pattern])
+    return {oid: (int(bloat_bytes), float(bloat_pct)) for oid, bloat_bytes, bloat_pct in cursor.fetchall()}
+
+
+def exact_bloat(cursor, table_pattern: str = "shop_%") -> dict[int, tuple[int, float]]:
+    cursor.execute(EXACT_SQL, [table_pattern])
+    result: dict[int, tuple[int, float]] = {}
+    for oid, bytes_, bs, fillfactor, leaf_pages, empty_pages, deleted_pages, density in cursor.fetchall():
+        if not bytes_ or math.isnan(density):  # no leaf pages yet
+            continue
+        # Leaf space beyond what fillfactor would leave free, plus fully reusable pages.
+        slack = leaf_pages * bs * max(0.0, 1 - density / fillfactor)
+        bloat_bytes = int(slack + (empty_pages + deleted_pages) * bs)
+        result[oid] = (bloat_bytes, 100.0 * bloat_bytes / bytes_)
+    return result
+
+
+def by_model_index(cursor, bloat: dict[int, tuple[int, float]]) -> dict[int, tuple[int, float]]:
+    """``bloat`` with partition indexes summed into the index of their partitioned table."""
+    cursor.execute(ROOTS_SQL, [list(bloat)])
+    totals: dict[int, list[int]] = {}
+    for oid, root, bytes_ in cursor.fetchall():
+        total = totals.setdefault(root, [0, 0])
+        total[0] += bloat[oid][0]
+        total[1] += bytes_
+    return {
+        root: (bloat_bytes, 100.0 * bloat_bytes / bytes_ if bytes_ else 0.0)
+        for root, (bloat_bytes, bytes_) in totals.items()
+    }
@@ -0,0 +1,367 @@
+"""Read-through caches for the hottest lookups: product by SKU, customer by email
+and a customer's recent orders.
+
+A lookup checks a small in-process LRU first, then the configured Django cache
+(Redis in production), and only then PostgreSQL; what it loads is stored in
+both. Products and customers are cached as the plain dicts the API returns,
+recent orders as packed int64 arrays, never as model instances, so entries
+stay small and cheap to (un)pickle.
+
+``goodvibes.shop.signals`` invalidates product and customer entries when the
+row is saved or deleted, immediately and again once the transaction commits,
+and applies order writes to the recent-orders entries after commit
+(``RecentOrdersCache``). A reader that loaded the old row before the commit
+may still store it afterwards, so shared entries carry the version token of
+their key that the reader saw before loading; every invalidation or update
+sets a new token, and entries stored under an older one are ignored.
+Other processes' LRUs are not told; their entries expire after ``LOCAL_TTL``
+seconds, which bounds how stale a read can be. ``QuerySet.update()``,
+``bulk_create()`` and ``bulk_update()`` send no signals: their changes show up
+once entries expire (``SHARED_TIMEOUT``); cancel orders with
+``Order.objects.filter(...).set_cancelled_at()``, which applies the change. Absent products and customers are
+not cached at all.
+
+The caches are on unless ``settings.SHOP_LOOKUP_CACHE`` is False; benchmarks
+switch them per run with ``lookup_caches_enabled``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import asdict
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import Product
+
+# Entries kept per in-process LRU.
+LOCAL_SIZE = 10_000
+# Seconds an in-process entry is trusted (other processes cannot invalidate it).
+LOCAL_TTL = 5.0
+# Seconds an entry lives in the shared Django cache.
+SHARED_TIMEOUT = 300
+# Orders returned per customer (the ``recent_orders`` workload operation reads 50).
+RECENT_ORDERS_LIMIT = 50
+# Extra orders kept per customer so deletes rarely force a reload.
+RECENT_ORDERS_SLACK = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int = LOCAL_SIZE, ttl: float = LOCAL_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+@dataclass
+class CacheCounters:
+    local_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    # Incremental changes applied to cached entries.
+    updates: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.local_hits + self.shared_hits + self.misses
+
+    @property
+    def hit_pct(self) -> float:
+        return 100.0 * (self.local_hits + self.shared_hits) / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_pct": round(self.hit_pct, 2)}
+
+
+class TwoLevelCache:
+    """An in-process LRU in front of a Django cache, with counters and an on/off switch."""
+
+    def __init__(self, name: str, *, alias: str = "default", timeout: int = SHARED_TIMEOUT):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.local = LRUCache()
+        self.counters = CacheCounters()
+        # None: follow settings.SHOP_LOOKUP_CACHE.
+        self.enabled: bool | None = None
+
+    @property
+    def active(self) -> bool:
+        if self.enabled is None:
+            return getattr(settings, "SHOP_LOOKUP_CACHE", True)
+        return self.enabled
+
+    def cache_key(self, key) -> str:
+        return f"shop:{self.name}:{key}"
+
+    def _version_key(self, cache_key: str) -> str:
+        return f"{cache_key}:version"
+
+    def _shared(self, cache_key: str) -> tuple[object | None, str | None]:
+        """The shared value if it was stored under the key's current version (else None), and that version."""
+        version_key = self._version_key(cache_key)
+        found = caches[self.alias].get_many([cache_key, version_key])
+        version = found.get(version_key)
+        entry = found.get(cache_key)
+        if entry is None or entry[0] != version:
+            return None, version
+        return entry[1], version
+
+    def _cached(self, cache_key: str) -> tuple[object | None, str | None]:
+        """The cached value from either level (counting the hit), or None (not counted).
+
+        Also returns the key's version as read before any database load, for ``_store``.
+        """
+        value = self.local.get(cache_key)
+        if value is not None:
+            self.counters.local_hits += 1
+            return value, None
+        value, version = self._shared(cache_key)
+        if value is not None:
+            self.counters.shared_hits += 1
+            self.local.set(cache_key, value)
+        return value, version
+
+    def _store(self, cache_key: str, value, version: str | None):
+        caches[self.alias].set(cache_key, (version, value), self.timeout)
+        self.local.set(cache_key, value)
+
+    def _new_version(self, cache_key: str) -> str:
+        """Retire the key's current entry, including copies stored late by readers that loaded before."""
+        # Random, not a counter: a token that expired is never issued again.
+        version = uuid.uuid4().hex
+        caches[self.alias].set(self._version_key(cache_key), version, self.timeout)
+        return version
+
+    def invalidate(self, key):
+        cache_key = self.cache_key(key)
+        self.local.delete(cache_key)
+        self._new_version(cache_key)
+        caches[self.alias].delete(cache_key)
+        self.counters.invalidations += 1
+
+    def reset_counters(self):
+        self.counters = CacheCounters()
+
+
+class LookupCache(TwoLevelCache):
+    """Read-through cache of ``load(key)`` (a dict, or None when absent)."""
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[str], dict | None],
+        *,
+        normalize: Callable[[str], str] = str,
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self.load = load
+        self.normalize = normalize
+
+    def cache_key(self, key: str) -> str:
+        return super().cache_key(self.normalize(key))
+
+    def get(self, key: str) -> dict | None:
+        if not self.active:
+            return self.load(key)
+        cache_key = self.cache_key(key)
+        value, version = self._cached(cache_key)
+        if value is not None:
+            return value
+        self.counters.misses += 1
+        value = self.load(key)
+        if value is not None:
+            self._store(cache_key, value, version)
+        return value
+
+
+@dataclass(frozen=True)
+class RecentOrder:
+    id: int
+    created_at: datetime
+    cancelled: bool
+
+    @property
+    def sort_key(self) -> tuple[datetime, int]:
+        return (self.created_at, self.id)
+
+
+def _micros(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def pack_recent_orders(orders: list[RecentOrder], *, complete: bool) -> bytes:
+    """``[complete, created_at_us, id, ...]`` as int64s; a cancelled order's id is stored negated."""
+    values = array("q", [int(complete)])
+    for order in orders:
+        values.extend((_micros(order.created_at), -order.id if order.cancelled else order.id))
+    return values.tobytes()
+
+
+def unpack_recent_orders(data: bytes) -> tuple[list[RecentOrder], bool]:
+    values = array("q")
+    values.frombytes(data)
+    orders = [
+        RecentOrder(abs(pk), EPOCH + timedelta(microseconds=us), pk < 0)
+        for us, pk in zip(values[1::2], values[2::2], strict=True)
+    ]
+    return orders, bool(values[0])
+
+
+class RecentOrdersCache(TwoLevelCache):
+    """Each customer's most recent orders, newest first, kept as packed ``(created_at, id)`` pairs.
+
+    Entries hold up to ``limit + slack`` orders plus a flag telling whether
+    that is all of the customer's orders; the slack lets deletes shrink an
+    entry without reloading it. Creates, updates (e.g. cancelling) and deletes
+    are applied to the shared entry in place after commit. That is a
+    read-modify-write: two processes updating the same customer at once can
+    lose one change until the entry expires.
+    """
+
+    def __init__(self, name: str, *, limit: int = RECENT_ORDERS_LIMIT, slack: int = RECENT_ORDERS_SLACK, **kwargs):
+        super().__init__(name, **kwargs)
+        self.limit = limit
+        self.capacity = limit + slack
+
+    def _load(self, customer_id: int) -> tuple[list[RecentOrder], bool]:
+        rows = list(
+            Order.objects.filter(customer_id=customer_id)
+            .order_by("-created_at", "-id")
+            .values_list("id", "created_at", "cancelled_at")[: self.capacity],
+        )
+        orders = [RecentOrder(pk, created_at, cancelled_at is not None) for pk, created_at, cancelled_at in rows]
+        return orders, len(rows) < self.capacity
+
+    def get(self, customer_id: int) -> list[RecentOrder]:
+        if not self.active:
+            return self._load(customer_id)[0][: self.limit]
+        cache_key = self.cache_key(customer_id)
+        data, version = self._cached(cache_key)
+        if data is not None:
+            orders, _complete = unpack_recent_orders(data)
+        else:
+            self.counters.misses += 1
+            orders, complete = self._load(customer_id)
+            self._store(cache_key, pack_recent_orders(orders, complete=complete), version)
+        return orders[: self.limit]
+
+    def ids(self, customer_id: int) -> list[int]:
+        return [order.id for order in self.get(customer_id)]
+
+    def _update(self, customer_id: int, change: Callable[[list[RecentOrder], bool], list[RecentOrder]]):
+        cache_key = self.cache_key(customer_id)
+        self.local.delete(cache_key)
+        shared = caches[self.alias]
+        data, _version = self._shared(cache_key)
+        if data is None:
+            # Not cached; the next read loads it.
+            return
+        orders, complete = unpack_recent_orders(data)
+        orders = change(orders, complete)
+        if len(orders) > self.capacity:
+            orders, complete = orders[: self.capacity], False
+        if not complete and len(orders) < self.limit:
+            # Orders beyond the entry moved into the top ``limit``; only the database knows them.
+            self._new_version(cache_key)
+            shared.delete(cache_key)
+            self.counters.invalidations += 1
+            return
+        # A new version, so what a reader that loaded before this change stores is ignored.
+        version = self._new_version(cache_key)
+        shared.set(cache_key, (version, pack_recent_orders(orders, complete=complete)), self.timeout)
+        self.counters.updates += 1
+
+    def order_saved(self, customer_id: int, order: RecentOrder):
+        def change(orders, complete):
+            orders = [o for o in orders if o.id != order.id]
+            if complete or (orders and order.sort_key > orders[-1].sort_key):
+                orders.append(order)
+                orders.sort(key=lambda o: o.sort_key, reverse=True)
+            return orders
+
+        self._update(customer_id, change)
+
+    def order_deleted(self, customer_id: int, order_id: int):
+        self._update(customer_id, lambda orders, complete: [o for o in orders if o.id != order_id])
+
+
+def _load_product(sku: str) -> dict | None:
+    return Product.objects.filter(sku=sku).values("id", "sku", "name", "category", "is_active").first()
+
+
+def _load_customer(email: str) -> dict | None:
+    return Customer.objects.filter(email__iexact=email).values("id", "email", "full_name").first()
+
+
+product_by_sku = LookupCache("product-sku", _load_product)
+# Matches the case-insensitive email lookup.
+customer_by_email = LookupCache("customer-email", _load_customer, normalize=str.lower)
+
+recent_orders = RecentOrdersCache("recent-orders")
+
+LOOKUP_CACHES = (product_by_sku, customer_by_email, recent_orders)
+
+
+@contextmanager
+def lookup_caches_enabled(*, enabled: bool):
+    """Turn all lookup caches on or off for the block, with fresh counters and empty LRUs."""
+    previous = [c.enabled for c in LOOKUP_CACHES]
+    for c in LOOKUP_CACHES:
+        c.enabled = enabled
+        c.local.clear()
+        c.reset_counters()
+    try:
+        yield
+    finally:
+        for c, value in zip(LOOKUP_CACHES, previous, strict=True):
+            c.enabled = value
@@ -0,0 +1,276 @@
+"""Drive the workload through the Django WSGI application in-process.
+
+``simulate_load`` normally calls the ORM directly, so the request stack
+(``ATOMIC_REQUESTS``, sessions, allauth's ``AccountMiddleware``, URL routing,
+JSON encoding) never shows up in its latencies. With ``--http`` each operation
+that has a ``goodvibes.shop.views`` endpoint is sent as a GET request to a
+``WSGIHandler`` built from the current settings, and every request's time is
+split into:
+
+* ``db``: time inside ``cursor.execute`` (``connection.execute_wrapper``);
+* ``orm``: time inside queryset evaluation, excluding ``db``;
+* ``view``: the rest of URL resolution and the view (serialization), excluding ``orm`` and ``db``;
+* ``middleware``: the rest of the request, excluding ``db``.
+
+COMMIT does not go through ``execute_wrapper``; it counts as view time. The
+database connection stays open for the whole run (``persistent_connection``),
+as with ``CONN_MAX_AGE > 0``: with the repo's ``CONN_MAX_AGE = 0`` every
+request would otherwise reconnect, and connection setup would dominate the
+view time and make it incomparable with a direct ``simulate_load`` run.
+"""
+
+from __future__ import annotations
+
+import functools
+import io
+import random
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import ExitStack
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.db.models.sql import Query
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from goodvibes.shop.workload import Operation
+from goodvibes.shop.workload import WorkloadKeys
+
+COMPONENTS = ("middleware", "view", "orm", "db")
+
+# Workload operation -> URL of the endpoint issuing the same query.
+ENDPOINTS: dict[str, Callable[[WorkloadKeys, random.Random], str]] = {
+    "product_by_sku": lambda keys, rng: reverse(
+        "shop:product-detail",
+        kwargs={"sku": rng.choice(keys.product_skus)},
+    ),
+    "customer_by_email": lambda keys, rng: (
+        f"{reverse('shop:customer-by-email')}?{urlencode({'email': rng.choice(keys.customer_emails)})}"
+    ),
+    "recent_orders": lambda keys, rng: (
+        f"{reverse('shop:customer-orders', kwargs={'customer_id': rng.choice(keys.customer_ids)})}?limit=50"
+    ),
+}
+
+
+def http_operations(operations: tuple[Operation, ...]) -> tuple[tuple[Operation, ...], list[str]]:
+    """Split ``operations`` into those with an endpoint and the names of those without."""
+    served = tuple(op for op in operations if op.name in ENDPOINTS)
+    return served, [op.name for op in operations if op.name not in ENDPOINTS]
+
+
+class RequestTimer:
+    """Accumulates db/orm/view time for the request in flight."""
+
+    def __init__(self):
+        self.db = 0.0
+        self.orm = 0.0
+        self.view = 0.0
+        self._orm_depth = 0
+
+    def reset(self):
+        self.db = self.orm = self.view = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+
+    @contextmanager
+    def orm_span(self):
+        # Prefetches and subqueries evaluate querysets inside querysets; time the outermost only.
+        self._orm_depth += 1
+        started, db_before = time.perf_counter(), self.db
+        try:
+            yield
+        finally:
+            self._orm_depth -= 1
+            if not self._orm_depth:
+                self.orm += time.perf_counter() - started - (self.db - db_before)
+
+    @contextmanager
+    def view_span(self):
+        started, db_before, orm_before = time.perf_counter(), self.db, self.orm
+        try:
+            yield
+        finally:
+            self.view += time.perf_counter() - started - (self.db - db_before) - (self.orm - orm_before)
+
+
+@contextmanager
+def instrument_orm(timer: RequestTimer):
+    """Time queryset evaluation (``_fetch_all``) and ``exists()`` while the block runs."""
+    originals = [(QuerySet, "_fetch_all"), (Query, "has_results")]
+    saved = [getattr(cls, name) for cls, name in originals]
+
+    def timed(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer.orm_span():
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    for (cls, name), func in zip(originals, saved, strict=True):
+        setattr(cls, name, timed(func))
+    try:
+        yield
+    finally:
+        for (cls, name), func in zip(originals, saved, strict=True):
+            setattr(cls, name, func)
+
+
+@contextmanager
+def persistent_connection():
+    """Keep requests from closing the database connection (``close_old_connections``) while the block runs."""
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+class TimedWSGIHandler(WSGIHandler):
+    """``WSGIHandler`` whose innermost layer (routing + view) is timed by ``timer``."""
+
+    def __init__(self, timer: RequestTimer):
+        self.timer = timer
+        super().__init__()
+
+    def _get_response(self, request):
+        with self.timer.view_span():
+            return super()._get_response(request)
+
+
+@dataclass
+class EndpointTiming:
+    count: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(COMPONENTS, 0.0))
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def mean_ms(self, component: str) -> float:
+        return self.seconds[component] / self.count * 1000 if self.count else 0.0
+
+
+def _host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+class HttpLoad:
+    """Issues GET requests to an in-process WSGI application and keeps per-endpoint timings.
+
+    Use as a context manager: it installs the timing hooks and keeps the
+    database connection open for its duration.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.timer = RequestTimer()
+        self.handler = TimedWSGIHandler(self.timer)
+        self.host = _host()
+        self.endpoints: dict[str, EndpointTiming] = {}
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        # The requests are anonymous and never leave the process.
+        self._stack.enter_context(override_settings(SHOP_API_PUBLIC=True))
+        self._stack.enter_context(persistent_connection())
+        self._stack.enter_context(self.connection.execute_wrapper(self.timer))
+        self._stack.enter_context(instrument_orm(self.timer))
+        return self
+
+    def __exit__(self, *exc):
+        return self._stack.__exit__(*exc)
+
+    def url(self, operation: Operation, keys: WorkloadKeys, rng: random.Random) -> str:
+        return ENDPOINTS[operation.name](keys, rng)
+
+    def get(self, name: str, url: str) -> int:
+        """Send one request; raises RuntimeError for non-2xx responses (after recording the timing)."""
+        path, _, query = url.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": self.host,
+            "wsgi.input": io.BytesIO(b""),
+            "wsgi.errors": io.StringIO(),
+            "wsgi.url_scheme": "http",
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        statuses = []
+        self.timer.reset()
+        started = time.perf_counter()
+        response = self.handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _chunk in response:
+                pass
+        finally:
+            # Fires request_finished.
+            response.close()
+        total = time.perf_counter() - started
+
+        timer = self.timer
+        status = int(statuses[-1].split()[0])
+        timing = self.endpoints.setdefault(name, EndpointTiming())
+        timing.count += 1
+        timing.statuses[status] += 1
+        timing.seconds["db"] += timer.db
+        timing.seconds["orm"] += timer.orm
+        timing.seconds["view"] += timer.view
+        timing.seconds["middleware"] += total - timer.view - timer.orm - timer.db
+        if not 200 <= status < 300:
+            msg = f"{url} returned HTTP {status}"
+            raise RuntimeError(msg)
+        return status
+
+    def report_lines(self) -> list[str]:
+        header = "".join(f" {component + '_ms':>13}" for component in COMPONENTS)
+        lines = [f"  {'endpoint':<18} {'requests':>8} {'mean_ms':>8}{header}  statuses"]
+        for name, timing in sorted(self.endpoints.items(), key=lambda item: -item[1].count):
+            total = timing.total_seconds
+            parts = "".join(
+                f" {timing.mean_ms(c):>7.3f} ({timing.seconds[c] / total * 100 if total else 0:>2.0f}%)"
+                for c in COMPONENTS
+            )
+            statuses = ", ".join(f"{status}x{count}" for status, count in sorted(timing.statuses.items()))
+            lines.append(f"  {name:<18} {timing.count:>8} {total / timing.count * 1000:>8.3f}{parts}  {statuses}")
+        return lines
+
+    def as_dict(self) -> dict:
+        return {
+            name: {
+                "requests": timing.count,
+                "statuses": {str(status): count for status, count in timing.statuses.items()},
+                **{f"{c}_mean_ms": round(timing.mean_ms(c), 3) for c in COMPONENTS},
+            }
+            for name, timing in self.endpoints.items()
+        }
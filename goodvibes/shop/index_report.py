@@ -0,0 +1,313 @@
+"""Row source for ``report_indexes``.
+
+Index rows are streamed from a server-side cursor so the report stays
+low-memory regardless of how many indexes exist; everything that needs a view
+of several indexes at once (redundancy, bloat, snapshot baselines) is computed
+up front into small per-index lookups.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+
+from django.db import connections
+
+from goodvibes.shop import snapshots
+from goodvibes.shop.io_stats import IoStats
+from goodvibes.shop.write_cost import WriteCost
+
+# One row per model index: the index of a partitioned table stands for its
+# partitions' copies, whose counters and sizes are summed into it.
+INDEX_ROWS_SQL = """
+SELECT
+  ic.oid AS oid,
+  n.nspname AS schema,
+  c.relname AS table,
+  ic.relname AS index,
+  pg_get_indexdef(ic.oid) AS indexdef,
+  tree.idx_scan,
+  tree.idx_tup_read,
+  tree.idx_tup_fetch,
+  tree.bytes,
+  ic.relkind = 'I' AS partitioned
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_index i ON i.indrelid = c.oid
+JOIN pg_class ic ON ic.oid = i.indexrelid
+CROSS JOIN LATERAL (
+  SELECT
+    COALESCE(sum(s.idx_scan), 0)::bigint AS idx_scan,
+    COALESCE(sum(s.idx_tup_read), 0)::bigint AS idx_tup_read,
+    COALESCE(sum(s.idx_tup_fetch), 0)::bigint AS idx_tup_fetch,
+    sum(pg_relation_size(t.relid))::bigint AS bytes
+  FROM (SELECT ic.oid AS relid UNION SELECT relid FROM pg_partition_tree(ic.oid)) AS t
+  LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = t.relid
+) AS tree
+WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+  AND c.relkind IN ('r', 'p')
+  AND NOT ic.relispartition
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+ORDER BY array_position(%s::oid[], ic.oid), bytes DESC
+"""
+
+INDEX_KEYS_SQL = """
+SELECT
+  i.indexrelid,
+  i.indrelid,
+  i.indisunique OR i.indisprimary,
+  am.amname,
+  ARRAY(
+    SELECT pg_get_indexdef(i.indexrelid, k, true)
+    FROM generate_series(1, i.indnkeyatts) AS k
+    ORDER BY k
+  ),
+  COALESCE(pg_get_expr(i.indpred, i.indrelid), ''),
+  ic.relname,
+  c.relname,
+  ARRAY(
+    SELECT pg_get_indexdef(i.indexrelid, k, true)
+    FROM generate_series(i.indnkeyatts + 1, i.indnatts) AS k
+    ORDER BY k
+  )
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_am am ON am.oid = ic.relam
+WHERE c.relkind IN ('r', 'p')
+  AND NOT ic.relispartition
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+"""
+
+
+@dataclass
+class IndexRow:
+    oid: int
+    schema: str
+    table: str
+    index: str
+    indexdef: str
+    idx_scan: int
+    idx_tup_read: int
+    idx_tup_fetch: int
+    size_bytes: int
+    bloat_bytes: int | None = None
+    bloat_pct: float | None = None
+    redundancy: str = ""
+    ins_per_sec: float | None = None
+    upd_per_sec: float | None = None
+    del_per_sec: float | None = None
+    non_hot_pct: float | None = None
+    growth_bytes_per_sec: float | None = None
+    write_bytes_per_sec: float | None = None
+    idx_blks_hit: int | None = None
+    idx_blks_read: int | None = None
+    idx_hit_pct: float | None = None
+    heap_blks_hit: int | None = None
+    heap_blks_read: int | None = None
+    heap_hit_pct: float | None = None
+    buffered_bytes: int | None = None
+    scans_by_database: dict[str, int] = field(default_factory=dict)
+    flags: list[str] = field(default_factory=list)
+    # Index of a partitioned table (no CONCURRENTLY DDL of its own).
+    partitioned: bool = False
+
+    def apply_write_cost(self, cost: WriteCost):
+        self.ins_per_sec = cost.ins_per_sec
+        self.upd_per_sec = cost.upd_per_sec
+        self.del_per_sec = cost.del_per_sec
+        self.non_hot_pct = cost.non_hot_pct
+        self.growth_bytes_per_sec = cost.growth_bytes_per_sec
+        self.write_bytes_per_sec = cost.write_bytes_per_sec
+
+    def apply_io(self, io: IoStats):
+        self.idx_blks_hit = io.idx_blks_hit
+        self.idx_blks_read = io.idx_blks_read
+        self.idx_hit_pct = io.idx_hit_pct
+        self.heap_blks_hit = io.heap_blks_hit
+        self.heap_blks_read = io.heap_blks_read
+        self.heap_hit_pct = io.heap_hit_pct
+        self.buffered_bytes = io.buffered_bytes
+
+
+@dataclass(frozen=True)
+class IndexKeys:
+    oid: int
+    table_oid: int
+    unique: bool
+    method: str
+    keys: tuple[str, ...]
+    predicate: str
+    name: str = ""
+    table: str = ""
+    # Non-key (INCLUDE) columns.
+    include: tuple[str, ...] = ()
+
+
+def classify_redundancy(indexes: list[IndexKeys]) -> dict[int, str]:
+    """Classify indexes made unnecessary by another index on the same table.
+
+    * ``duplicate``: same access method, key columns, INCLUDE columns and
+      predicate as another index. Of a group of duplicates the unique one (or
+      else the oldest) is kept.
+    * ``covered``: another index with the same predicate can do everything
+      this one does: same key columns but a superset of its INCLUDE columns,
+      or (B-trees) key columns that extend this one's and hold all its INCLUDE
+      columns, so index-only scans keep working.
+
+    Unique and primary key indexes enforce constraints and are never flagged.
+    """
+    by_table: dict[int, list[IndexKeys]] = defaultdict(list)
+    for idx in indexes:
+        by_table[idx.table_oid].append(idx)
+
+    result: dict[int, str] = {}
+    for siblings in by_table.values():
+        for idx in siblings:
+            if idx.unique:
+                continue
+            for other in siblings:
+                if other.oid == idx.oid or other.method != idx.method or other.predicate != idx.predicate:
+                    continue
+                include, other_include = set(idx.include), set(other.include)
+                if other.keys == idx.keys:
+                    if include == other_include and (other.unique or other.oid < idx.oid):
+                        result[idx.oid] = "duplicate"
+                        break
+                    if include < other_include:
+                        result[idx.oid] = "covered"
+                elif (
+                    idx.method == "btree"
+                    and len(other.keys) > len(idx.keys)
+                    and other.keys[: len(idx.keys)] == idx.keys
+                    and include <= set(other.keys) | other_include
+                ):
+                    result[idx.oid] = "covered"
+    return result
+
+
+def fetch_index_keys(cursor) -> list[IndexKeys]:
+    cursor.execute(INDEX_KEYS_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+    return [
+        IndexKeys(oid, table_oid, unique, method, tuple(keys), predicate, name, table, tuple(include))
+        for oid, table_oid, unique, method, keys, predicate, name, table, include in cursor.fetchall()
+    ]
+
+
+Usage = dict[tuple[str, str], tuple[int, int, int]]
+
+
+def _usage_since(baseline: dict | None, key: tuple[str, str], idx_scan, idx_tup_read, idx_tup_fetch):
+    """The counters as ``(idx_scan, idx_tup_read, idx_tup_fetch)``, as deltas if there is a ``baseline``."""
+    if baseline is None:
+        return idx_scan, idx_tup_read, idx_tup_fetch
+    base = baseline.get(key, {})
+    return (
+        snapshots.delta(idx_scan, base.get("idx_scan")),
+        snapshots.delta(idx_tup_read, base.get("idx_tup_read")),
+        snapshots.delta(idx_tup_fetch, base.get("idx_tup_fetch")),
+    )
+
+
+def _read_usage(alias: str, baseline: dict | None) -> Usage:
+    try:
+        with connections[alias].cursor() as cur:
+            rows = snapshots.read_counters(cur)
+    finally:
+        # Worker threads get their own connection; don't leak it.
+        connections[alias].close()
+    usage: Usage = {}
+    for schema, _table, index, idx_scan, idx_tup_read, idx_tup_fetch, *_ in rows:
+        usage[(schema, index)] = _usage_since(baseline, (schema, index), idx_scan, idx_tup_read, idx_tup_fetch)
+    return usage
+
+
+def collect_usage(aliases: list[str], snapshot=None) -> dict[str, Usage]:
+    """Read index usage counters from several databases concurrently.
+
+    Each alias is queried from its own worker thread (and therefore its own
+    connection). With ``snapshot`` the counters are deltas against what the
+    snapshot recorded for that alias; an alias it recorded nothing for raises
+    ValueError rather than adding its cumulative counters to everyone's deltas.
+    """
+    if not aliases:
+        return {}
+    if snapshot is not None:
+        missing = sorted(set(aliases) - snapshots.recorded_databases(snapshot))
+        if missing:
+            msg = f"Snapshot {snapshot} has no counters for database(s): {', '.join(missing)}"
+            raise ValueError(msg)
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix="report_indexes") as pool:
+        futures = {
+            alias: pool.submit(
+                _read_usage,
+                alias,
+                snapshots.baseline(snapshot, alias) if snapshot is not None else None,
+            )
+            for alias in aliases
+        }
+        return {alias: future.result() for alias, future in futures.items()}
+
+
+def iter_index_rows(
+    connection,
+    *,
+    bloat_by_oid: dict[int, tuple[int, float]],
+    redundancy: dict[int, str],
+    write_costs: dict[int, WriteCost] | None = None,
+    io_stats: dict[int, IoStats] | None = None,
+    order_oids: list[int] | None = None,
+    baseline: dict[tuple[str, str], dict[str, int]] | None = None,
+    other_usage: dict[str, Usage] | None = None,
+) -> Iterator[IndexRow]:
+    """Yield one ``IndexRow`` per shop index.
+
+    Rows come out in ``order_oids`` order first (remaining rows by size). With
+    ``baseline`` (see ``snapshots.baseline``) the counters are deltas.
+    ``other_usage`` (see ``collect_usage``) adds the counters seen on replicas
+    or other databases, so an index is only ``unused`` if no database scanned it.
+    """
+    primary = connection.alias
+    with connection.chunked_cursor() as cur:
+        cur.execute(INDEX_ROWS_SQL, [list(snapshots.SNAPSHOT_TABLES), order_oids or []])
+        for oid, schema, table, index, indexdef, scans, tup_read, tup_fetch, bytes_, partitioned in cur:
+            idx_scan, idx_tup_read, idx_tup_fetch = _usage_since(baseline, (schema, index), scans, tup_read, tup_fetch)
+            scans_by_database = {primary: idx_scan}
+            for alias, usage in (other_usage or {}).items():
+                other_scans, other_read, other_fetch = usage.get((schema, index), (0, 0, 0))
+                scans_by_database[alias] = other_scans
+                idx_scan += other_scans
+                idx_tup_read += other_read
+                idx_tup_fetch += other_fetch
+            row = IndexRow(
+                oid=oid,
+                schema=schema,
+                table=table,
+                index=index,
+                indexdef=indexdef,
+                idx_scan=idx_scan,
+                idx_tup_read=idx_tup_read,
+                idx_tup_fetch=idx_tup_fetch,
+                size_bytes=bytes_,
+                partitioned=partitioned,
+                redundancy=redundancy.get(oid, ""),
+                scans_by_database=scans_by_database,
+            )
+            if oid in bloat_by_oid:
+                row.bloat_bytes, row.bloat_pct = bloat_by_oid[oid]
+            if write_costs and oid in write_costs:
+                row.apply_write_cost(write_costs[oid])
+            if io_stats and oid in io_stats:
+                row.apply_io(io_stats[oid])
+            if idx_scan == 0:
+                row.flags.append("unused")
+            elif scans_by_database[primary] == 0:
+                row.flags.append("replica-only")
+            if row.redundancy:
+                row.flags.append(row.redundancy)
+            yield row
@@ -0,0 +1,143 @@
+"""Buffer-cache and I/O figures for shop indexes.
+
+* ``pg_statio_user_indexes``: index blocks found in shared_buffers (hit) or
+  read from the OS (read), per index.
+* ``pg_statio_user_tables``: the same for the heap of the index's table.
+  PostgreSQL does not attribute heap I/O to the index that led to it, so these
+  are table-level figures repeated on each of the table's indexes.
+* ``pg_buffercache`` (optional extension): how much of each index currently
+  sits in shared_buffers, i.e. the memory an unused index takes from hot data.
+* ``pg_stat_io`` (PostgreSQL 16+): a cluster-wide summary by backend type and
+  I/O context, including buffer evictions.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from goodvibes.shop import snapshots
+
+# Per model index; a partitioned table's counters are summed over its
+# partitions (pg_partition_tree), buffers are counted by partition index and
+# attributed to its root (pg_partition_root).
+IO_SQL = """
+SELECT
+  ic.oid,
+  n.nspname,
+  c.relname,
+  ic.relname,
+  si.idx_blks_read,
+  si.idx_blks_hit,
+  st.heap_blks_read,
+  st.heap_blks_hit
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+CROSS JOIN LATERAL (
+  SELECT
+    COALESCE(sum(s.idx_blks_read), 0)::bigint AS idx_blks_read,
+    COALESCE(sum(s.idx_blks_hit), 0)::bigint AS idx_blks_hit
+  FROM (SELECT ic.oid AS relid UNION SELECT relid FROM pg_partition_tree(ic.oid)) AS tree
+  JOIN pg_statio_user_indexes s ON s.indexrelid = tree.relid
+) AS si
+CROSS JOIN LATERAL (
+  SELECT
+    COALESCE(sum(s.heap_blks_read), 0)::bigint AS heap_blks_read,
+    COALESCE(sum(s.heap_blks_hit), 0)::bigint AS heap_blks_hit
+  FROM (SELECT c.oid AS relid UNION SELECT relid FROM pg_partition_tree(c.oid)) AS tree
+  JOIN pg_statio_user_tables s ON s.relid = tree.relid
+) AS st
+WHERE c.relkind IN ('r', 'p')
+  AND NOT ic.relispartition
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+"""
+
+BUFFERCACHE_SQL = """
+SELECT COALESCE(pg_partition_root(ic.oid), ic.oid), COUNT(*) * current_setting('block_size')::bigint
+FROM pg_buffercache b
+JOIN pg_class ic ON b.relfilenode = pg_relation_filenode(ic.oid)
+JOIN pg_index i ON i.indexrelid = ic.oid
+JOIN pg_class c ON c.oid = i.indrelid
+WHERE b.reldatabase IN (0, (SELECT oid FROM pg_database WHERE datname = current_database()))
+  AND c.relkind = 'r'
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+GROUP BY 1
+"""
+
+PG_STAT_IO_SQL = """
+SELECT
+  backend_type,
+  context,
+  COALESCE(reads, 0),
+  COALESCE(hits, 0),
+  COALESCE(evictions, 0),
+  COALESCE(writes, 0)
+FROM pg_stat_io
+WHERE object = 'relation'
+  AND (COALESCE(reads, 0) + COALESCE(hits, 0) + COALESCE(evictions, 0)) > 0
+ORDER BY COALESCE(reads, 0) DESC, COALESCE(hits, 0) DESC
+"""
+
+
+@dataclass(frozen=True)
+class IoStats:
+    idx_blks_read: int
+    idx_blks_hit: int
+    heap_blks_read: int
+    heap_blks_hit: int
+    buffered_bytes: int | None = None
+
+    @property
+    def idx_hit_pct(self) -> float | None:
+        return _hit_pct(self.idx_blks_hit, self.idx_blks_read)
+
+    @property
+    def heap_hit_pct(self) -> float | None:
+        return _hit_pct(self.heap_blks_hit, self.heap_blks_read)
+
+
+def _hit_pct(hit: int, read: int) -> float | None:
+    total = hit + read
+    return round(100.0 * hit / total, 1) if total else None
+
+
+def has_pg_buffercache(cursor) -> bool:
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_buffercache')")
+    return cursor.fetchone()[0]
+
+
+def fetch_io_stats(cursor, snapshot=None) -> dict[int, IoStats]:
+    """Block I/O per shop index oid; deltas since ``snapshot`` when given."""
+    index_base = snapshots.baseline(snapshot, cursor.db.alias) if snapshot is not None else {}
+    table_base = snapshots.table_baseline(snapshot) if snapshot is not None else {}
+    buffered: dict[int, int] | None = None
+    if has_pg_buffercache(cursor):
+        cursor.execute(BUFFERCACHE_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+        buffered = dict(cursor.fetchall())
+
+    cursor.execute(IO_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+    result = {}
+    for oid, schema, table, index, idx_read, idx_hit, heap_read, heap_hit in cursor.fetchall():
+        ibase = index_base.get((schema, index), {})
+        tbase = table_base.get((schema, table), {})
+        result[oid] = IoStats(
+            idx_blks_read=snapshots.delta(idx_read, ibase.get("idx_blks_read")),
+            idx_blks_hit=snapshots.delta(idx_hit, ibase.get("idx_blks_hit")),
+            heap_blks_read=snapshots.delta(heap_read, tbase.get("heap_blks_read")),
+            heap_blks_hit=snapshots.delta(heap_hit, tbase.get("heap_blks_hit")),
+            # Residency is a point-in-time figure; not available without the extension.
+            buffered_bytes=buffered.get(oid, 0) if buffered is not None else None,
+        )
+    return result
+
+
+def pg_stat_io_summary(cursor) -> list[tuple] | None:
+    """``(backend_type, context, reads, hits, evictions, writes)`` rows, or None before PostgreSQL 16."""
+    cursor.execute("SELECT to_regclass('pg_catalog.pg_stat_io') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(PG_STAT_IO_SQL)
+    return cursor.fetchall()
@@ -0,0 +1,138 @@
+"""Switch the shop tables between index layouts for benchmarking.
+
+A layout is the set of (non-unique) shop indexes that are absent. Switching
+drops indexes with ``DROP INDEX CONCURRENTLY`` and re-creates previously
+dropped ones from their recorded ``pg_get_indexdef`` with ``CREATE INDEX
+CONCURRENTLY`` (progress reporting and INVALID-index cleanup via
+``operations.concurrent_build``), so the tables stay readable and writable
+throughout. Indexes of partitioned tables are re-created one partition at a
+time, but dropped with a plain ``DROP INDEX``, which locks the table. The
+database then differs from the migration state until ``restore()`` is called;
+only use this on a benchmark database.
+
+``truncate_dataset`` and ``vacuum_analyze`` reset the data itself between
+layouts (``benchmark_index_layouts --reseed``).
+"""
+
+from __future__ import annotations
+
+import re
+
+from goodvibes.shop import snapshots
+from goodvibes.shop.operations import build_partitioned_index
+from goodvibes.shop.operations import concurrent_build
+from goodvibes.shop.operations import drop_partitioned_index
+
+# Model indexes: those of partitioned tables, not the partitions' copies attached to them.
+INDEX_DEFS_SQL = """
+SELECT ic.relname, c.relname, pg_get_indexdef(ic.oid), i.indisunique OR i.indisprimary, ic.relkind = 'I'
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indrelid
+WHERE c.relkind IN ('r', 'p')
+  AND NOT ic.relispartition
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+"""
+
+# Physical index bytes: partitions are plain tables ('r') here, partitioned indexes have no storage.
+INDEX_BYTES_SQL = """
+SELECT COALESCE(SUM(pg_relation_size(i.indexrelid)), 0)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indrelid
+WHERE c.relkind = 'r'
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+"""
+
+
+# Emptied before each layout by ``benchmark_index_layouts --reseed``; the sales
+# aggregates go too, as they would not match the new order ids.
+DATASET_TABLES = (
+    "shop_orderitem",
+    "shop_order",
+    "shop_customer",
+    "shop_product",
+    "shop_productdailysales",
+    "shop_salesaggregatestate",
+)
+
+
+def truncate_dataset(cursor):
+    """Empty the shop data tables and restart their ids, so a reseed reproduces the same rows."""
+    cursor.execute(f"TRUNCATE {', '.join(DATASET_TABLES)} RESTART IDENTITY")
+
+
+def vacuum_analyze(cursor, tables: tuple[str, ...] = DATASET_TABLES):
+    cursor.execute(f"VACUUM (ANALYZE) {', '.join(tables)}")
+
+
+def total_index_bytes(cursor) -> int:
+    cursor.execute(INDEX_BYTES_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+    return cursor.fetchone()[0]
+
+
+def current_wal_lsn(cursor) -> str:
+    cursor.execute("SELECT pg_current_wal_lsn()::text")
+    return cursor.fetchone()[0]
+
+
+def wal_bytes_since(cursor, lsn: str) -> int:
+    cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s::pg_lsn)::bigint", [lsn])
+    return cursor.fetchone()[0]
+
+
+class LayoutSwitcher:
+    def __init__(self, connection):
+        self.connection = connection
+        with connection.cursor() as cur:
+            cur.execute(INDEX_DEFS_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+            rows = cur.fetchall()
+        self.definitions = {name: indexdef for name, _table, indexdef, _unique, _partitioned in rows}
+        self.tables = {name: table for name, table, _indexdef, _unique, _partitioned in rows}
+        self.unique = {name for name, _table, _indexdef, unique, _partitioned in rows if unique}
+        # Indexes of partitioned tables, which have no CONCURRENTLY DDL of their own.
+        self.partitioned = {name for name, _table, _indexdef, _unique, partitioned in rows if partitioned}
+        self.dropped: set[str] = set()
+
+    def validate(self, names: set[str]):
+        unknown = sorted(names - set(self.definitions))
+        if unknown:
+            msg = f"Unknown shop index(es): {', '.join(unknown)}"
+            raise ValueError(msg)
+        constrained = sorted(names & self.unique)
+        if constrained:
+            msg = f"Unique/primary key indexes back constraints and cannot be dropped: {', '.join(constrained)}"
+            raise ValueError(msg)
+
+    def apply(self, drop: set[str]) -> list[str]:
+        """Make exactly ``drop`` absent; returns the tables whose indexes changed."""
+        self.validate(drop)
+        changed = set()
+        quote = self.connection.ops.quote_name
+        with self.connection.schema_editor(atomic=False) as editor:
+            for name in sorted(self.dropped - drop):
+                if name in self.partitioned:
+                    build_partitioned_index(editor, self.tables[name], name, self.definitions[name])
+                else:
+                    with concurrent_build(editor, name):
+                        editor.execute(
+                            re.sub(
+                                r"^CREATE (UNIQUE )?INDEX ",
+                                r"CREATE \1INDEX CONCURRENTLY ",
+                                self.definitions[name],
+                            ),
+                        )
+                self.dropped.discard(name)
+                changed.add(self.tables[name])
+            for name in sorted(drop - self.dropped):
+                if name in self.partitioned:
+                    drop_partitioned_index(editor, name)
+                else:
+                    editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}")
+                self.dropped.add(name)
+                changed.add(self.tables[name])
+        return sorted(changed)
+
+    def restore(self) -> list[str]:
+        return self.apply(set())
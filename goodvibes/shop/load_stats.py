@@ -0,0 +1,131 @@
+"""Client-side latency and throughput metrics for the workload commands."""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+
+# Latency samples kept per operation (reservoir sampling beyond that).
+RESERVOIR_SIZE = 10_000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (``q`` in 0..100); 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    samples: list[float] = field(default_factory=list)
+
+
+class LoadStats:
+    """Per-operation counts and latencies, with ops/s over the measured window."""
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self.reservoir_size = reservoir_size
+        self.operations: dict[str, OperationStats] = {}
+        # All operations together, for overall percentiles.
+        self.overall = OperationStats()
+        # Separate from the workload's seeded generator so sampling does not change the workload.
+        self._rng = random.Random(0)
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        # Operations completed in each whole second of the run.
+        self.per_second: list[int] = []
+
+    @contextmanager
+    def measure(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(name, time.perf_counter() - started, error=True)
+            raise
+        self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float, *, error: bool = False):
+        second = int(time.perf_counter() - self.started)
+        if second >= len(self.per_second):
+            self.per_second.extend([0] * (second + 1 - len(self.per_second)))
+        self.per_second[second] += 1
+        for stats in (self.operations.setdefault(name, OperationStats()), self.overall):
+            stats.count += 1
+            stats.errors += error
+            stats.total_seconds += seconds
+            if len(stats.samples) < self.reservoir_size:
+                stats.samples.append(seconds)
+            else:
+                slot = self._rng.randrange(stats.count)
+                if slot < self.reservoir_size:
+                    stats.samples[slot] = seconds
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def count(self) -> int:
+        return self.overall.count
+
+    @property
+    def busy_seconds(self) -> float:
+        """Time spent inside measured operations (excludes sleeps and bookkeeping)."""
+        return self.overall.total_seconds
+
+    def throughput_series(self) -> list[int]:
+        """Ops per second for each complete second (the trailing partial second is dropped)."""
+        full = int(self.elapsed)
+        return self.per_second[:full] + [0] * (full - len(self.per_second))
+
+    def as_dict(self) -> dict:
+        """Plain-data summary (latencies in milliseconds)."""
+        elapsed = self.elapsed
+
+        def summarize(stats: OperationStats) -> dict:
+            return {
+                "count": stats.count,
+                "errors": stats.errors,
+                "ops_per_s": round(stats.count / elapsed, 1) if elapsed else 0.0,
+                "mean_ms": round(stats.total_seconds / stats.count * 1000, 3) if stats.count else 0.0,
+                **{f"p{q}_ms": round(percentile(stats.samples, q) * 1000, 3) for q in (50, 95, 99)},
+            }
+
+        overall = summarize(self.overall)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "ops": overall.pop("count"),
+            **overall,
+            "operations": {name: summarize(stats) for name, stats in self.operations.items()},
+        }
+
+    def report_lines(self) -> list[str]:
+        summary = self.as_dict()
+        lines = [
+            f"{'operation':<18} {'count':>8} {'ops/s':>8} {'mean_ms':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'errors':>6}",
+        ]
+        for name, op in sorted(summary["operations"].items(), key=lambda item: -item[1]["count"]):
+            lines.append(
+                f"{name:<18} {op['count']:>8} {op['ops_per_s']:>8.1f} {op['mean_ms']:>8.3f} "
+                f"{op['p50_ms']:>8.3f} {op['p95_ms']:>8.3f} {op['p99_ms']:>8.3f} {op['errors']:>6}",
+            )
+        lines.append(
+            f"Total: {summary['ops']} ops in {summary['elapsed_s']:.1f}s ({summary['ops_per_s']:.1f} ops/s, "
+            f"p50 {summary['p50_ms']:.3f}ms, p99 {summary['p99_ms']:.3f}ms)",
+        )
+        return lines
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from statistics import mean
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
+
+from goodvibes.shop import index_report
+from goodvibes.shop import layouts
+from goodvibes.shop import results
+from goodvibes.shop.scenario import Step
+from goodvibes.shop.scenario import run_step
+from goodvibes.shop.workload import MIXES
+
+MB = 1024 * 1024
+
+COLUMNS = (
+    ("read_p50_ms", "read p50", "{:>9.3f}"),
+    ("read_p95_ms", "read p95", "{:>9.3f}"),
+    ("read_p99_ms", "read p99", "{:>9.3f}"),
+    ("read_ops_per_s", "read/s", "{:>9.1f}"),
+    ("write_ops_per_s", "write/s", "{:>9.1f}"),
+    ("wal_mb", "WAL MB", "{:>9.1f}"),
+    ("index_mb", "index MB", "{:>9.1f}"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the simulate_load reads and generate_bloat writes under several index layouts, "
+        "switching layouts with concurrent index drops/builds, and compare latency, write throughput, "
+        "WAL volume and index size. Writes change the data, so they only run with --reseed, which "
+        "re-creates the same dataset before each layout. Restores all indexes at the end; use a "
+        "benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--layout",
+            dest="layouts",
+            action="append",
+            metavar="NAME=INDEX[,INDEX...]",
+            help=(
+                "A layout and the indexes absent in it, e.g. 'lean=idx_order_customer_only,idx_product_sku_nonunique' "
+                "or 'current=' (repeatable; default: current vs. no-redundant)"
+            ),
+        )
+        parser.add_argument("--read-seconds", type=int, default=30, help="simulate_load duration per layout")
+        parser.add_argument(
+            "--write-seconds",
+            type=int,
+            default=30,
+            help="generate_bloat duration per layout (with --reseed only)",
+        )
+        parser.add_argument(
+            "--reseed",
+            type=int,
+            default=0,
+            metavar="SCALE",
+            help=(
+                "Before each layout, TRUNCATE the shop data tables, run seed_demo_data --scale SCALE and "
+                "VACUUM ANALYZE, so every layout starts from the same data; enables the write phase"
+            ),
+        )
+        parser.add_argument("--rounds", type=int, default=1, help="Run all layouts this many times, alternating")
+        parser.add_argument("--seed", type=int, default=123, help="generate_bloat PRNG seed")
+        parser.add_argument("--mix", choices=sorted(MIXES), default="default", help="simulate_load operation mix")
+        parser.add_argument(
+            "--checkpoint",
+            action="store_true",
+            help="CHECKPOINT before each write phase so full-page writes weigh equally (needs pg_checkpoint)",
+        )
+
+    def handle(self, *args, **options):
+        switcher = layouts.LayoutSwitcher(connection)
+        plan = self._layouts(options["layouts"], switcher)
+        for name, drop in plan.items():
+            self.stdout.write(f"- {name}: drops {', '.join(sorted(drop)) or 'nothing'}")
+
+        reseed = max(0, options["reseed"])
+        if not reseed:
+            self.stdout.write(
+                "Reads only: generate_bloat would change the data between layouts; pass --reseed SCALE "
+                "to measure writes.",
+            )
+        measured: dict[str, list[dict]] = {name: [] for name in plan}
+        datasets: dict[str, dict] = {}
+        try:
+            for round_no in range(1, max(1, options["rounds"]) + 1):
+                for name, drop in plan.items():
+                    self.stdout.write(self.style.SUCCESS(f"Round {round_no}, layout {name}"))
+                    if reseed:
+                        # Emptied first, so the layout's index builds are instant.
+                        with connection.cursor() as cur:
+                            layouts.truncate_dataset(cur)
+                        switcher.apply(drop)
+                        self._reseed(reseed)
+                    else:
+                        self._analyze(switcher.apply(drop))
+                    dataset = results.dataset_fingerprint()
+                    self._check_dataset(datasets, f"round {round_no}, layout {name}", dataset)
+                    measured[name].append(self._measure(options, f"layout:{name}", writes=bool(reseed)))
+        finally:
+            self.stdout.write("Restoring all indexes...")
+            self._analyze(switcher.restore())
+
+        summary = {
+            name: {key: self._mean([run[key] for run in runs]) for key, _label, _fmt in COLUMNS}
+            for name, runs in measured.items()
+        }
+        self.stdout.write("")
+        self.stdout.write(f"{'layout':<16}" + "".join(f"{label:>10}" for _key, label, _fmt in COLUMNS))
+        for name, values in summary.items():
+            cells = [f"{'-':>9}" if values[key] is None else fmt.format(values[key]) for key, _label, fmt in COLUMNS]
+            self.stdout.write(f"{name:<16}" + "".join(f" {cell}" for cell in cells))
+        if options["rounds"] > 1:
+            self.stdout.write(f"Means over {options['rounds']} rounds.")
+        self.stdout.write(f"Every layout ran on dataset {next(iter(datasets.values()))['hash']}.")
+
+        self.metrics = {
+            "dataset": next(iter(datasets.values())),
+            "reseed_scale": reseed,
+            "layouts": {name: sorted(drop) for name, drop in plan.items()},
+            "summary": summary,
+            "runs": measured,
+        }
+
+    def _layouts(self, specs, switcher) -> dict[str, set[str]]:
+        if not specs:
+            with connection.cursor() as cur:
+                keys = index_report.fetch_index_keys(cur)
+            redundancy = index_report.classify_redundancy(keys)
+            return {"current": set(), "no-redundant": {k.name for k in keys if k.oid in redundancy}}
+        plan = {}
+        for spec in specs:
+            name, sep, indexes = spec.partition("=")
+            if not sep or not name:
+                msg = f"Invalid --layout {spec!r}; expected NAME=INDEX[,INDEX...]"
+                raise CommandError(msg)
+            drop = {index.strip() for index in indexes.split(",") if index.strip()}
+            try:
+                switcher.validate(drop)
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+            plan[name] = drop
+        return plan
+
+    def _reseed(self, scale: int):
+        """Fill the emptied shop tables with the same rows every time, then VACUUM ANALYZE them."""
+        self.stdout.write(f"Re-seeding the dataset (scale {scale})...")
+        self._run(Step("seed_demo_data", {"scale": scale, "txn_per_batch": True}))
+        with connection.cursor() as cur:
+            layouts.vacuum_analyze(cur)
+
+    def _check_dataset(self, datasets: dict[str, dict], where: str, dataset: dict):
+        """Refuse to compare layouts measured on different data (e.g. concurrent writers)."""
+        first = next(iter(datasets.values()), None)
+        datasets[where] = dataset
+        if first is not None and dataset["hash"] != first["hash"]:
+            msg = (
+                f"The dataset changed between layouts ({first['hash']} before, {dataset['hash']} at {where}); "
+                "the results are not comparable. Stop other writers, or use --reseed."
+            )
+            raise CommandError(msg)
+
+    def _mean(self, values: list) -> float | None:
+        values = [v for v in values if v is not None]
+        return mean(values) if values else None
+
+    def _analyze(self, tables: list[str]):
+        if not tables:
+            return
+        with connection.cursor() as cur:
+            cur.execute(f"ANALYZE {', '.join(connection.ops.quote_name(t) for t in tables)}")
+
+    def _measure(self, options, label: str, *, writes: bool) -> dict:
+        with connection.cursor() as cur:
+            index_bytes = layouts.total_index_bytes(cur)
+        reads = self._run(
+            Step("simulate_load", {"seconds": options["read_seconds"], "mix": options["mix"], "label": label}),
+        )
+        measurement = {
+            "read_p50_ms": reads["p50_ms"],
+            "read_p95_ms": reads["p95_ms"],
+            "read_p99_ms": reads["p99_ms"],
+            "read_ops_per_s": reads["ops_per_s"],
+            "write_ops_per_s": None,
+            "write_p99_ms": None,
+            "wal_mb": None,
+            "index_mb": index_bytes / MB,
+        }
+        if not writes:
+            return measurement
+
+        with connection.cursor() as cur:
+            if options["checkpoint"]:
+                try:
+                    cur.execute("CHECKPOINT")
+                except DatabaseError as exc:
+                    msg = f"CHECKPOINT failed: {exc}"
+                    raise CommandError(msg) from exc
+            lsn = layouts.current_wal_lsn(cur)
+        writes = self._run(
+            Step("generate_bloat", {"seconds": options["write_seconds"], "seed": options["seed"], "label": label}),
+        )
+        with connection.cursor() as cur:
+            wal_bytes = layouts.wal_bytes_since(cur, lsn)
+
+        measurement["write_ops_per_s"] = writes["ops_per_s"]
+        measurement["write_p99_ms"] = writes["p99_ms"]
+        measurement["wal_mb"] = wal_bytes / MB
+        return measurement
+
+    def _run(self, step: Step) -> dict:
+        result = run_step(step)
+        if "error" in result:
+            msg = f"{step.command} failed: {result['error']}"
+            raise CommandError(msg)
+        return result["metrics"]
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from goodvibes.shop import results
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a baseline and a candidate workload run from the result store and flag statistically "
+        "significant throughput or p99 latency regressions (bootstrap confidence intervals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline", nargs="?", help="Run id (or prefix), label (pools its runs) or 'latest'")
+        parser.add_argument("candidate", nargs="?", default="latest", help="Run id, label or 'latest' (default)")
+        parser.add_argument(
+            "--results-file",
+            type=Path,
+            default=results.RESULTS_FILE,
+            help=f"JSON-lines result store (default: {results.RESULTS_FILE})",
+        )
+        parser.add_argument(
+            "--kind",
+            choices=["simulate_load", "generate_bloat"],
+            help="Only compare runs of this command (needed when comparing scenario runs)",
+        )
+        parser.add_argument(
+            "--min-change",
+            type=float,
+            default=5.0,
+            help="Ignore changes whose confidence interval does not clear this many percent",
+        )
+        parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+        parser.add_argument("--resamples", type=int, default=1000, help="Bootstrap resamples")
+        parser.add_argument("--seed", type=int, default=0, help="Bootstrap PRNG seed")
+        parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if anything regressed")
+        parser.add_argument("--list", action="store_true", help="List recorded runs instead of comparing")
+        parser.add_argument("--limit", type=int, default=20, help="Runs to list (with --list)")
+
+    def handle(self, *args, **options):
+        runs = results.load_runs(options["results_file"])
+        if options["list"]:
+            self._list(runs, options["limit"])
+            return
+        if not options["baseline"]:
+            msg = "Give a baseline run id or label (see --list)."
+            raise CommandError(msg)
+        if not 0 < options["confidence"] < 1:
+            msg = "--confidence must be between 0 and 1."
+            raise CommandError(msg)
+
+        try:
+            baseline = results.select_runs(runs, options["baseline"], options["kind"] or "")
+            candidate = results.select_runs(runs, options["candidate"], options["kind"] or "")
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        if {run["id"] for run in baseline} & {run["id"] for run in candidate}:
+            msg = "Baseline and candidate share runs."
+            raise CommandError(msg)
+
+        self.stdout.write(f"Baseline:  {', '.join(run['id'] for run in baseline)}")
+        self.stdout.write(f"Candidate: {', '.join(run['id'] for run in candidate)}")
+        for warning in results.differences(baseline, candidate):
+            self.stdout.write(self.style.WARNING(warning))
+
+        comparisons = results.compare(
+            baseline,
+            candidate,
+            min_change_pct=options["min_change"],
+            confidence=options["confidence"],
+            resamples=max(100, options["resamples"]),
+            seed=options["seed"],
+        )
+        level = round(options["confidence"] * 100)
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'metric':<28} {'baseline':>10} {'candidate':>10} {'change':>8} {f'{level}% CI':>18}  verdict",
+        )
+        for c in comparisons:
+            line = (
+                f"{c.metric:<28} {c.baseline:>10.3f} {c.candidate:>10.3f} {c.change_pct:>+7.1f}% "
+                f"[{c.low_pct:>+6.1f}%, {c.high_pct:>+6.1f}%]  {c.verdict}"
+            )
+            style = {"regression": self.style.ERROR, "improvement": self.style.SUCCESS}.get(c.verdict)
+            self.stdout.write(style(line) if style else line)
+
+        regressions = [c.metric for c in comparisons if c.verdict == "regression"]
+        self.metrics = {
+            "baseline": [run["id"] for run in baseline],
+            "candidate": [run["id"] for run in candidate],
+            "regressions": regressions,
+            "comparisons": [asdict(c) for c in comparisons],
+        }
+        if regressions and options["fail_on_regression"]:
+            msg = f"Regression in: {', '.join(regressions)}"
+            raise CommandError(msg)
+
+    def _list(self, runs: list[dict], limit: int):
+        self.stdout.write(
+            f"{'id':<12} {'recorded':<19} {'kind':<14} {'label':<20} {'ops/s':>9} {'p99_ms':>9}  dataset",
+        )
+        for run in runs[-limit:]:
+            metrics = run["metrics"]
+            self.stdout.write(
+                f"{run['id']:<12} {run['recorded_at'][:19]:<19} {run['kind']:<14} {run['label'][:20]:<20} "
+                f"{metrics.get('ops_per_s', 0.0):>9.1f} {metrics.get('p99_ms', 0.0):>9.3f}  {run['dataset']['hash']}",
+            )
@@ -2,9 +2,13 @@ import random
 import time
 
 from django.core.management.base import BaseCommand
+from django.db import connection
 from django.db import transaction
 from django.utils import timezone
 
+from goodvibes.shop import results
+from goodvibes.shop import statements
+from goodvibes.shop.load_stats import LoadStats
 from goodvibes.shop.models import Customer
 from goodvibes.shop.models import Order
 from goodvibes.shop.models import OrderItem
@@ -61,6 +65,7 @@ class Command(BaseCommand):
             default=123,
             help="PRNG seed",
         )
+        results.add_record_arguments(parser)
 
     def handle(self, *args, **options):
         max_order_ids = 20_000
@@ -101,9 +106,14 @@ class Command(BaseCommand):
             )
             return
 
+        # Fingerprint the data this run starts from; the churn changes it.
+        dataset = None if options["no_record"] else results.dataset_fingerprint()
         orders_before = Order.objects.count()
         self.stdout.write(self.style.SUCCESS(f"Orders before: {orders_before}"))
 
+        with connection.cursor() as cur:
+            statements_before = statements.read_statements(cur)
+        stats = LoadStats()
         end_at = time.time() + seconds
         ops = 0
         created_orders = 0
@@ -116,28 +126,26 @@ class Command(BaseCommand):
             if existing_order_ids and random.random() < toggle_cancel_ratio:  # noqa: S311
                 oid = random.choice(existing_order_ids)  # noqa: S311
                 # Flip between NULL and NOW(); each flip updates cancelled_at indexes.
-                updated = (
-                    Order.objects.filter(id=oid, cancelled_at__isnull=True).update(
-                        cancelled_at=timezone.now(),
-                    )
-                )
-                if not updated:
-                    Order.objects.filter(id=oid, cancelled_at__isnull=False).update(
-                        cancelled_at=None,
+                with stats.measure("toggle_cancel"):
+                    updated = Order.objects.filter(id=oid, cancelled_at__isnull=True).set_cancelled_at(
+                        timezone.now(),
                     )
+                    if not updated:
+                        Order.objects.filter(id=oid, cancelled_at__isnull=False).set_cancelled_at(None)
                 toggled_orders += 1
                 ops += 1
             else:
                 # 2) INSERT+DELETE churn on Order / OrderItem to bloat indexes
                 # (especially OrderItem composites).
                 cid = random.choice(customer_ids)  # noqa: S311
-                with transaction.atomic():
+                with stats.measure("order_churn"), transaction.atomic():
                     order = Order.objects.create(customer_id=cid)
                     created_orders += 1
 
                     items = [
                         OrderItem(
                             order=order,
+                            order_created_at=order.created_at,
                             product_id=random.choice(product_ids),  # noqa: S311
                             quantity=random.randint(1, 5),  # noqa: S311
                         )
@@ -164,6 +172,7 @@ class Command(BaseCommand):
             if sleep_ms:
                 time.sleep(sleep_ms / 1000.0)
 
+        stats.stop()
         orders_after = Order.objects.count()
         self.stdout.write(self.style.SUCCESS(f"Orders after: {orders_after}"))
 
@@ -176,5 +185,21 @@ class Command(BaseCommand):
                 f"toggled_orders={toggled_orders}",
             ),
         )
-
-
+        for line in stats.report_lines():
+            self.stdout.write(line)
+        self.stdout.write("")
+        with connection.cursor() as cur:
+            deltas = statements.deltas_since(cur, statements_before)
+        for line in statements.summary_lines(deltas, client_seconds=stats.busy_seconds):
+            self.stdout.write(line)
+        self.metrics = {
+            **stats.as_dict(),
+            "created_orders": created_orders,
+            "deleted_orders": deleted_orders,
+            "toggled_orders": toggled_orders,
+            "server": statements.summary_dict(deltas),
+        }
+        if dataset is not None:
+            run = results.record_run("generate_bloat", options, self.metrics, stats, dataset=dataset)
+            self.metrics["run_id"] = run["id"]
+            self.stdout.write(f"Recorded run {run['id']} in {options['results_file']}")
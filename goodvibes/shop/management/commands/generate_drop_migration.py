@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db import migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from goodvibes.shop import index_report
+from goodvibes.shop import snapshots
+from goodvibes.shop.models import IndexStatsSnapshot
+from goodvibes.shop.operations import RemoveIndexConcurrently
+
+APP_LABEL = "shop"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a non-atomic migration that drops the drop candidates from report_indexes "
+        "(redundant and/or unused indexes) with DROP INDEX CONCURRENTLY and reversible operations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=["redundant", "unused", "all"],
+            default="all",
+            help="Which drop candidates to include: duplicate/covered indexes, unused ones, or both",
+        )
+        parser.add_argument(
+            "--index",
+            dest="indexes",
+            action="append",
+            metavar="NAME",
+            help="Drop exactly these indexes instead of the report's candidates (repeatable)",
+        )
+        parser.add_argument(
+            "--since",
+            metavar="SNAPSHOT",
+            help="Judge usage by counter deltas since an index stats snapshot",
+        )
+        parser.add_argument(
+            "--database",
+            dest="databases",
+            action="append",
+            metavar="ALIAS",
+            help="Database alias to read usage from; repeat for replicas (first is the primary)",
+        )
+        parser.add_argument("--name", default="drop_unneeded_indexes", help="Migration name suffix")
+        parser.add_argument("--dry-run", action="store_true", help="Print the migration instead of writing it")
+
+    def handle(self, *args, **options):
+        aliases = list(dict.fromkeys(options["databases"] or ["default"]))
+        connection = connections[aliases[0]]
+        candidates = self._candidates(connection, aliases, options)
+        if not candidates:
+            self.stdout.write(self.style.WARNING("No drop candidates found; nothing to generate."))
+            return
+
+        operations = []
+        reminders = []
+        for row in candidates:
+            operation, reminder = self._operation(row)
+            operations.append(operation)
+            reminders.append(reminder)
+            self.stdout.write(f"- {row.index} on {row.table} ({', '.join(row.flags) or 'requested'})")
+
+        loader = MigrationLoader(connection, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes(APP_LABEL)
+        if len(leaves) != 1:
+            msg = f"Expected a single leaf migration for {APP_LABEL!r}, found {leaves}; run makemigrations --merge."
+            raise CommandError(msg)
+        number = (MigrationAutodetector.parse_number(leaves[0][1]) or 0) + 1
+        name = f"{number:04d}_{options['name']}"
+
+        migration = migrations.Migration(name, APP_LABEL)
+        migration.dependencies = [leaves[0]]
+        migration.operations = operations
+        writer = MigrationWriter(migration)
+        # DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+        source = writer.as_string().replace(
+            "class Migration(migrations.Migration):\n",
+            "class Migration(migrations.Migration):\n\n    atomic = False\n",
+            1,
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(source)
+        else:
+            path = Path(writer.path)
+            path.write_text(source)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+        self.stdout.write("")
+        self.stdout.write("Update goodvibes/shop/models.py so the next makemigrations does not re-add them:")
+        for reminder in reminders:
+            self.stdout.write(f"  {reminder}")
+
+    def _candidates(self, connection, aliases, options):
+        snapshot = baseline = None
+        if options["since"]:
+            try:
+                snapshot = snapshots.resolve_snapshot(options["since"])
+            except IndexStatsSnapshot.DoesNotExist as exc:
+                raise CommandError(str(exc)) from exc
+            if connection.alias not in snapshots.recorded_databases(snapshot):
+                msg = f"Snapshot {snapshot} has no counters for {connection.alias}."
+                raise CommandError(msg)
+            baseline = snapshots.baseline(snapshot, connection.alias)
+
+        with connection.cursor() as cur:
+            keys = {k.oid: k for k in index_report.fetch_index_keys(cur)}
+        try:
+            # Leaving a database out could make an index it scans look unused.
+            other_usage = index_report.collect_usage(aliases[1:], snapshot)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        rows = index_report.iter_index_rows(
+            connection,
+            bloat_by_oid={},
+            redundancy=index_report.classify_redundancy(list(keys.values())),
+            baseline=baseline,
+            other_usage=other_usage,
+        )
+
+        wanted = set(options["indexes"] or [])
+        candidates = []
+        for row in rows:
+            if wanted:
+                if row.index in wanted:
+                    candidates.append(row)
+                    wanted.discard(row.index)
+                continue
+            if keys[row.oid].unique:
+                # Unique and primary key indexes back constraints.
+                continue
+            redundant = bool(row.redundancy)
+            unused = "unused" in row.flags
+            if (options["kind"] in ("redundant", "all") and redundant) or (
+                options["kind"] in ("unused", "all") and unused
+            ):
+                candidates.append(row)
+        if wanted:
+            msg = f"Index(es) not found on shop tables: {', '.join(sorted(wanted))}"
+            raise CommandError(msg)
+        return candidates
+
+    def _operation(self, row):
+        """Build the migration operation for one index and a models.py reminder."""
+        model = next(
+            (m for m in apps.get_app_config(APP_LABEL).get_models() if m._meta.db_table == row.table),
+            None,
+        )
+        if model is not None:
+            if any(index.name == row.index for index in model._meta.indexes):
+                # Declared in Meta.indexes: the state-aware operation re-creates it on reverse.
+                return (
+                    RemoveIndexConcurrently(model_name=model._meta.model_name, name=row.index),
+                    f"remove {row.index!r} from {model.__name__}.Meta.indexes",
+                )
+            field = self._db_index_field(model, row.indexdef)
+            if field is not None:
+                # Index implied by db_index=True (e.g. a ForeignKey): drop it concurrently in the
+                # database and record db_index=False in the migration state.
+                name, _path, args, kwargs = field.deconstruct()
+                kwargs["db_index"] = False
+                return (
+                    migrations.SeparateDatabaseAndState(
+                        database_operations=[self._run_sql(row)],
+                        state_operations=[
+                            migrations.AlterField(
+                                model_name=model._meta.model_name,
+                                name=name,
+                                field=field.__class__(*args, **kwargs),
+                            ),
+                        ],
+                    ),
+                    f"set db_index=False on {model.__name__}.{name}",
+                )
+        return self._run_sql(row), f"{row.index!r} is not managed by Django models; no change needed"
+
+    def _db_index_field(self, model, indexdef: str):
+        match = re.search(r"USING \w+ \(([^,()]+)\)$", indexdef)
+        if not match:
+            return None
+        column = match.group(1).strip('"')
+        for field in model._meta.local_fields:
+            if field.column == column and field.db_index and not field.unique:
+                return field
+        return None
+
+    def _run_sql(self, row):
+        if row.partitioned:
+            # Partitioned indexes have no CONCURRENTLY DDL; dropping or re-creating one locks the table.
+            # pg_get_indexdef says "ON ONLY", which would not build the partitions' indexes.
+            reverse = re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", row.indexdef)
+            return migrations.RunSQL(
+                sql=f'DROP INDEX IF EXISTS "{row.schema}"."{row.index}";',
+                reverse_sql=f"{reverse.replace(' ON ONLY ', ' ON ', 1)};",
+            )
+        reverse = re.sub(
+            r"^CREATE (UNIQUE )?INDEX ",
+            r"CREATE \1INDEX CONCURRENTLY IF NOT EXISTS ",
+            row.indexdef,
+        )
+        return migrations.RunSQL(
+            sql=f'DROP INDEX CONCURRENTLY IF EXISTS "{row.schema}"."{row.index}";',
+            reverse_sql=f"{reverse};",
+        )
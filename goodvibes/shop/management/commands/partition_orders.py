@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
+from django.utils import timezone
+
+from goodvibes.shop import partitioning
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage monthly range partitions of shop_order/shop_orderitem: convert the tables once (--convert), "
+        "keep partitions created ahead of time, and detach or drop months past the retention period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help=(
+                "Rebuild shop_order and shop_orderitem as partitioned tables, copying all rows "
+                "(locks both tables for the duration; run in a maintenance window)"
+            ),
+        )
+        parser.add_argument("--ahead", type=int, default=3, help="Months of partitions to keep created ahead")
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            help="Detach partitions that ended more than this many months before the current month",
+        )
+        parser.add_argument("--drop", action="store_true", help="Drop expired partitions after detaching them")
+        parser.add_argument("--dry-run", action="store_true", help="Show what would be created/detached")
+
+    def handle(self, *args, **options):
+        ahead = max(0, options["ahead"])
+        now = timezone.now()
+        with connection.cursor() as cur:
+            partitioned = partitioning.is_partitioned(cur)
+
+        if options["convert"]:
+            if partitioned:
+                msg = "shop_order is already partitioned."
+                raise CommandError(msg)
+            if options["dry_run"]:
+                self.stdout.write("Would convert shop_order and shop_orderitem to monthly partitions.")
+                return
+            self.stdout.write("Converting shop_order and shop_orderitem (copying all rows)...")
+            try:
+                created = partitioning.convert(connection, months_ahead=ahead)
+            except (DatabaseError, ValueError) as exc:
+                msg = f"Conversion failed (nothing changed): {exc}"
+                raise CommandError(msg) from exc
+            self.stdout.write(self.style.SUCCESS(f"Converted; created {len(created)} partitions."))
+        elif not partitioned:
+            msg = "shop_order is not partitioned; run with --convert first."
+            raise CommandError(msg)
+        elif options["dry_run"]:
+            self.stdout.write(f"Would create partitions up to {partitioning.add_months(now, ahead):%Y-%m}.")
+        else:
+            with connection.cursor() as cur:
+                created = partitioning.create_partitions(cur, now, partitioning.add_months(now, ahead))
+            for name in created:
+                self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+
+        detached = []
+        if options["retain_months"] is not None:
+            with connection.cursor() as cur:
+                expired = partitioning.expired(
+                    partitioning.list_partitions(cur),
+                    now,
+                    max(0, options["retain_months"]),
+                )
+            for partition in expired:
+                action = "drop" if options["drop"] else "detach"
+                if options["dry_run"]:
+                    self.stdout.write(f"Would {action} {partition.name} ({partition.rows} rows)")
+                    continue
+                try:
+                    partitioning.detach_partition(connection, partition, drop=options["drop"])
+                except DatabaseError as exc:
+                    msg = f"Could not {action} {partition.name}: {exc}"
+                    raise CommandError(msg) from exc
+                detached.append(partition.name)
+                done = "Dropped" if options["drop"] else "Detached"
+                self.stdout.write(self.style.SUCCESS(f"{done} {partition.name}"))
+
+        with connection.cursor() as cur:
+            partitions = partitioning.list_partitions(cur)
+        self.stdout.write("")
+        self.stdout.write(f"{'partition':<28} {'from':<10} {'to':<10} {'rows':>10} {'total_mb':>9} {'index_mb':>9}")
+        for p in partitions:
+            lower = f"{p.lower:%Y-%m-%d}" if p.lower else "-"
+            upper = f"{p.upper:%Y-%m-%d}" if p.upper else "-"
+            self.stdout.write(
+                f"{p.name:<28} {lower:<10} {upper:<10} {p.rows:>10} "
+                f"{p.total_bytes / MB:>9.1f} {p.index_bytes / MB:>9.1f}",
+            )
+        self.metrics = {
+            "partitions": len(partitions),
+            "detached": detached,
+            "index_bytes": sum(p.index_bytes for p in partitions),
+        }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
+from django.utils import timezone
+
+from goodvibes.shop import aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Add orders placed since the last run to the per-product daily sales aggregates "
+        "(shop_productdailysales) and re-derive the days whose orders were cancelled or deleted "
+        "since; optionally re-derive recent days or rebuild everything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recompute-days",
+            type=int,
+            default=0,
+            help="Also re-derive the last N days from the order tables (changed days are re-derived anyway)",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help=(
+                "Recompute all aggregates from the order tables (loses days whose order partitions were "
+                "detached or dropped)"
+            ),
+        )
+        parser.add_argument(
+            "--report",
+            type=int,
+            default=0,
+            metavar="DAYS",
+            help="Afterwards, print units sold per category for the last DAYS days",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = aggregates.refresh(
+                connection,
+                recompute_days=max(0, options["recompute_days"]),
+                rebuild=options["rebuild"],
+            )
+        except DatabaseError as exc:
+            msg = f"Refreshing sales aggregates failed (nothing changed): {exc}"
+            raise CommandError(msg) from exc
+
+        if options["rebuild"]:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt from orders up to id {result.watermark}."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Added orders {result.previous_watermark + 1}..{result.watermark} "
+                    f"({result.watermark - result.previous_watermark} ids).",
+                ),
+            )
+        if result.stale_days:
+            self.stdout.write(f"{result.stale_days} day(s) had cancelled or deleted orders.")
+        if result.recomputed_from is not None or result.stale_days:
+            since = f" (and every day since {result.recomputed_from})" if result.recomputed_from else ""
+            self.stdout.write(f"Re-derived changed days{since}: {result.recomputed_rows} rows.")
+        self.stdout.write(f"{result.rows} aggregate rows written in {result.seconds:.2f}s.")
+
+        self.metrics = {
+            "previous_watermark": result.previous_watermark,
+            "watermark": result.watermark,
+            "rows": result.rows,
+            "stale_days": result.stale_days,
+            "recomputed_rows": result.recomputed_rows,
+            "seconds": round(result.seconds, 3),
+        }
+
+        if options["report"] > 0:
+            end = timezone.now().date()
+            start = end - timedelta(days=options["report"] - 1)
+            self.stdout.write("")
+            self.stdout.write(f"{'day':<10} {'category':<24} {'units':>10} {'lines':>10}")
+            for row in aggregates.daily_units(start, end):
+                self.stdout.write(
+                    f"{row['day']:%Y-%m-%d} {row['category']:<24} {row['units']:>10} {row['order_lines']:>10}",
+                )
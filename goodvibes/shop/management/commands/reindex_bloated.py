@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
+
+from goodvibes.shop import bloat
+from goodvibes.shop import snapshots
+from goodvibes.shop.operations import drop_invalid_index
+
+MB = 1024 * 1024
+
+# Physical indexes only: bloat is per partition, and each partition's copy of a
+# partitioned index (its table is a plain 'r' partition) is rebuilt on its own.
+INDEXES_SQL = """
+SELECT ic.oid, n.nspname, c.relname, ic.relname, pg_relation_size(ic.oid)
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind = 'r'
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+  AND i.indisvalid
+"""
+
+# REINDEX CONCURRENTLY builds a "<name>_ccnew[N]" copy and, once it has swapped the two,
+# renames the old index "<name>_ccold[N]"; a failure leaves whichever exists behind INVALID.
+LEFTOVERS_SQL = """
+SELECT ic.relname
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+WHERE NOT i.indisvalid
+  AND i.indrelid = %s::regclass
+  AND ic.relname ~ %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild bloated shop indexes one at a time with REINDEX INDEX CONCURRENTLY, "
+        "with lock_timeout and pauses so it can run during business hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-bloat-pct", type=float, default=30.0, help="Only indexes at least this %% bloated")
+        parser.add_argument(
+            "--min-bloat-mb",
+            type=float,
+            default=1.0,
+            help="Only indexes with at least this much bloat",
+        )
+        parser.add_argument("--exact", action="store_true", help="Select by pgstatindex() instead of the estimate")
+        parser.add_argument("--limit", type=int, default=0, help="Rebuild at most this many indexes (0 = no limit)")
+        parser.add_argument(
+            "--lock-timeout",
+            default="5s",
+            help="lock_timeout for each REINDEX; indexes whose locks cannot be taken in time are skipped",
+        )
+        parser.add_argument("--pause", type=float, default=10.0, help="Seconds to sleep between indexes")
+        parser.add_argument(
+            "--parallel-workers",
+            type=int,
+            default=None,
+            help="max_parallel_maintenance_workers for each rebuild (default: server setting)",
+        )
+        parser.add_argument(
+            "--max-minutes",
+            type=float,
+            default=0,
+            help="Do not start another index after this many minutes (0 = no limit)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only list the indexes that would be rebuilt")
+
+    def handle(self, *args, **options):
+        if connection.in_atomic_block:
+            msg = "REINDEX CONCURRENTLY cannot run inside a transaction."
+            raise CommandError(msg)
+
+        targets = self._targets(options)
+        if not targets:
+            self.stdout.write(self.style.SUCCESS("No index above the bloat threshold."))
+            return
+
+        for _oid, schema, table, index, size, bloat_bytes, bloat_pct in targets:
+            self.stdout.write(
+                f"{schema}.{index:<34} on {table:<18} size={size / MB:.1f}MB "
+                f"bloat={bloat_bytes / MB:.1f}MB ({bloat_pct:.0f}%)",
+            )
+        if options["dry_run"]:
+            return
+
+        deadline = time.monotonic() + options["max_minutes"] * 60 if options["max_minutes"] else None
+        reclaimed = 0
+        rebuilt = skipped = 0
+        started = time.monotonic()
+        with connection.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, false)", [options["lock_timeout"]])
+            if options["parallel_workers"] is not None:
+                cur.execute(
+                    "SELECT set_config('max_parallel_maintenance_workers', %s, false)",
+                    [str(max(0, options["parallel_workers"]))],
+                )
+            try:
+                for i, (_oid, schema, table, index, size, _bloat_bytes, _pct) in enumerate(targets):
+                    if deadline is not None and time.monotonic() > deadline:
+                        self.stdout.write(self.style.WARNING("Time budget exhausted; stopping."))
+                        break
+                    if i and options["pause"]:
+                        time.sleep(options["pause"])
+
+                    qualified = f"{connection.ops.quote_name(schema)}.{connection.ops.quote_name(index)}"
+                    t0 = time.monotonic()
+                    try:
+                        cur.execute(f"REINDEX INDEX CONCURRENTLY {qualified}")
+                    except DatabaseError as exc:
+                        skipped += 1
+                        self.stdout.write(self.style.WARNING(f"Skipped {index}: {str(exc).strip()}"))
+                        self._drop_leftovers(cur, schema, table, index, options["lock_timeout"])
+                        continue
+                    elapsed = time.monotonic() - t0
+                    # The rebuilt index takes over the name but not the oid.
+                    cur.execute("SELECT pg_relation_size(%s::regclass)", [qualified])
+                    after = cur.fetchone()[0]
+                    reclaimed += size - after
+                    rebuilt += 1
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Rebuilt {index} in {elapsed:.1f}s: {size / MB:.1f}MB -> {after / MB:.1f}MB",
+                        ),
+                    )
+            finally:
+                cur.execute("RESET lock_timeout")
+                cur.execute("RESET max_parallel_maintenance_workers")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. rebuilt={rebuilt} skipped={skipped} reclaimed={reclaimed / MB:.1f}MB "
+                f"elapsed={time.monotonic() - started:.1f}s",
+            ),
+        )
+
+    def _targets(self, options):
+        with connection.cursor() as cur:
+            if options["exact"]:
+                if not bloat.has_pgstattuple(cur):
+                    msg = "--exact requires the pgstattuple extension (CREATE EXTENSION pgstattuple)."
+                    raise CommandError(msg)
+                bloat_by_oid = bloat.exact_bloat(cur)
+            else:
+                bloat_by_oid = bloat.estimate_bloat(cur)
+            cur.execute(INDEXES_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+            indexes = cur.fetchall()
+
+        targets = []
+        for oid, schema, table, index, size in indexes:
+            bloat_bytes, bloat_pct = bloat_by_oid.get(oid, (0, 0.0))
+            if bloat_pct >= options["min_bloat_pct"] and bloat_bytes >= options["min_bloat_mb"] * MB:
+                targets.append((oid, schema, table, index, size, bloat_bytes, bloat_pct))
+        targets.sort(key=lambda t: t[5], reverse=True)
+        if options["limit"]:
+            targets = targets[: options["limit"]]
+        return targets
+
+    def _drop_leftovers(self, cur, schema: str, table: str, index: str, lock_timeout: str):
+        qualified_table = f"{connection.ops.quote_name(schema)}.{connection.ops.quote_name(table)}"
+        cur.execute(LEFTOVERS_SQL, [qualified_table, f"^{re.escape(index)}_cc(new|old)[0-9]*$"])
+        leftovers = [row[0] for row in cur.fetchall()]
+        if not leftovers:
+            return
+        # The drops wait for the locks the REINDEX timed out on rather than leave the copies behind.
+        cur.execute("RESET lock_timeout")
+        try:
+            with connection.schema_editor(atomic=False) as editor:
+                for name in leftovers:
+                    drop_invalid_index(editor, name)
+        except DatabaseError as exc:
+            self.stdout.write(
+                self.style.WARNING(f"Could not drop INVALID {', '.join(leftovers)}; drop it manually: {exc}"),
+            )
+        finally:
+            cur.execute("SELECT set_config('lock_timeout', %s, false)", [lock_timeout])
@@ -1,82 +1,228 @@
 from __future__ import annotations
 
-import re
-from collections import defaultdict
-from typing import Dict, List, Tuple
-
 from django.core.management.base import BaseCommand
-from django.db import connection
+from django.core.management.base import CommandError
+from django.db import connections
+
+from goodvibes.shop import bloat
+from goodvibes.shop import index_report
+from goodvibes.shop import io_stats
+from goodvibes.shop import snapshots
+from goodvibes.shop import visibility
+from goodvibes.shop import write_cost
+from goodvibes.shop.models import IndexStatsSnapshot
+from goodvibes.shop.report_writers import WRITERS
 
 
 class Command(BaseCommand):
-    help = "Report index usage and size for shop tables using pg_stat_user_indexes."
+    help = "Report index usage, size and estimated bloat for shop tables using pg_stat_user_indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--exact-bloat",
+            action="store_true",
+            help="Measure bloat with pgstatindex() (pgstattuple extension); reads every index page",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["size", "bloat", "write-cost", "buffers"],
+            default="size",
+            help=(
+                "Order rows by total size, by reclaimable (bloat) bytes, by estimated "
+                "write I/O per second (drop candidates that save the most first), or by "
+                "shared_buffers residency (needs pg_buffercache)"
+            ),
+        )
+        parser.add_argument(
+            "--since",
+            metavar="SNAPSHOT",
+            help="Report counter deltas since an index stats snapshot (id, label or 'latest')",
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(WRITERS),
+            default="table",
+            help="Output format; json/csv/prometheus are streamed row by row for automation",
+        )
+        parser.add_argument(
+            "--database",
+            dest="databases",
+            action="append",
+            metavar="ALIAS",
+            help=(
+                "Database alias to read usage from; repeat for replicas. The first alias is the "
+                "primary that definitions, sizes and bloat come from (default: 'default')"
+            ),
+        )
+        parser.add_argument(
+            "--all-databases",
+            action="store_true",
+            help="Aggregate usage over every configured database alias",
+        )
 
     def handle(self, *args, **options):
-        rows = self._fetch()
-        if not rows:
-            self.stdout.write(self.style.WARNING("No indexes found for shop_* tables."))
-            return
+        human = options["format"] == "table"
+        # Keep stdout parseable for machine formats; notes go to stderr instead.
+        notes = self.stdout if human else self.stderr
+
+        aliases = self._aliases(options)
+        connection = connections[aliases[0]]
+
+        snapshot = baseline = None
+        if options["since"]:
+            snapshot = self._snapshot(options["since"], notes, aliases)
+            baseline = snapshots.baseline(snapshot, connection.alias)
+            missing = [alias for alias in aliases[1:] if alias not in snapshots.recorded_databases(snapshot)]
+            if missing:
+                notes.write(
+                    self.style.WARNING(
+                        f"Snapshot {snapshot} has no counters for {', '.join(missing)}; leaving them out "
+                        "(record them with snapshot_index_stats --database).",
+                    ),
+                )
+                aliases = [alias for alias in aliases if alias not in missing]
 
-        # Build simple redundancy hints based on same leading columns per table
-        duplicates: Dict[Tuple[str, str], List[int]] = defaultdict(list)
-        leading_cols: List[str] = []
-        for i, r in enumerate(rows):
-            lead = self._leading_columns(r[3])
-            leading_cols.append(lead)
-            duplicates[(r[0], r[1], lead)].append(i)
-
-        header = f"{'schema':<10} {'table':<18} {'index':<34} {'scan':>8} {'tup_read':>10} {'size_mb':>8}  flags"
-        self.stdout.write(header)
-        self.stdout.write("-" * len(header))
-
-        for i, (schema, table, index, indexdef, idx_scan, idx_tup_read, bytes_) in enumerate(rows):
-            size_mb = bytes_ / (1024 * 1024)
-            flags: List[str] = []
-            if idx_scan == 0:
-                flags.append("unused")
-            # Heuristic: any other index on same table with identical leading columns
-            key = (schema, table, leading_cols[i])
-            if len(duplicates[key]) > 1:
-                flags.append("duplicate/covered")
+        # Replica counters are gathered concurrently before the primary is streamed.
+        other_usage = index_report.collect_usage(aliases[1:], snapshot)
+        if other_usage:
+            notes.write(f"Usage aggregated over databases: {', '.join(aliases)}")
+
+        with connection.cursor() as cur:
+            redundancy = index_report.classify_redundancy(index_report.fetch_index_keys(cur))
+            write_costs = write_cost.fetch_write_costs(cur, snapshot)
+            io_by_oid = io_stats.fetch_io_stats(cur, snapshot)
+        bloat_by_oid = self._bloat(connection, exact=options["exact_bloat"])
+        order_oids = None
+        if options["sort"] == "bloat":
+            order_oids = sorted(bloat_by_oid, key=lambda oid: bloat_by_oid[oid][0], reverse=True)
+        elif options["sort"] == "write-cost":
+            order_oids = sorted(write_costs, key=lambda oid: write_costs[oid].write_bytes_per_sec, reverse=True)
+        elif options["sort"] == "buffers":
+            order_oids = sorted(io_by_oid, key=lambda oid: io_by_oid[oid].buffered_bytes or 0, reverse=True)
+
+        writer = WRITERS[options["format"]](self.stdout)
+        rows = index_report.iter_index_rows(
+            connection,
+            bloat_by_oid=bloat_by_oid,
+            redundancy=redundancy,
+            write_costs=write_costs,
+            io_stats=io_by_oid,
+            order_oids=order_oids,
+            baseline=baseline,
+            other_usage=other_usage,
+        )
+        count = 0
+        total_bloat = 0
+        # Compact per-index figures for callers such as run_scenario.
+        self.metrics = {"indexes": {}}
+        # shared_buffers held by indexes that are drop candidates (unused or redundant)
+        idle_buffered = 0
+        writer.begin()
+        for row in rows:
+            writer.row(row)
+            count += 1
+            total_bloat += row.bloat_bytes or 0
+            self.metrics["indexes"][row.index] = {
+                "table": row.table,
+                "idx_scan": row.idx_scan,
+                "size_bytes": row.size_bytes,
+                "bloat_bytes": row.bloat_bytes,
+                "write_bytes_per_sec": row.write_bytes_per_sec,
+                "idx_hit_pct": row.idx_hit_pct,
+                "buffered_bytes": row.buffered_bytes,
+                "flags": row.flags,
+            }
+            if row.flags and row.flags != ["replica-only"]:
+                idle_buffered += row.buffered_bytes or 0
+        writer.end()
+        self.metrics["total_bloat_bytes"] = total_bloat
+
+        if not count:
+            notes.write(self.style.WARNING("No indexes found for shop_* tables."))
+            return
+        if human:
+            self.stdout.write("")
+            mode = "measured with pgstatindex" if options["exact_bloat"] else "estimated from pg_stats"
+            self.stdout.write(f"Reclaimable bloat ({mode}): {total_bloat / (1024 * 1024):.1f} MB")
+            self.stdout.write(
+                "wr_kb/s: estimated index write cost = (inserts + non-HOT updates)/s x (avg entry size + WAL record).",
+            )
             self.stdout.write(
-                f"{schema:<10} {table:<18} {index:<34} {idx_scan:>8} {idx_tup_read:>10} {size_mb:>8.1f}  {' '.join(flags)}"
+                "hit%: index blocks found in shared_buffers (pg_statio_user_indexes); buf_mb: index pages "
+                "currently in shared_buffers (pg_buffercache).",
             )
+            if any(io.buffered_bytes is not None for io in io_by_oid.values()):
+                self.stdout.write(
+                    f"Unused/redundant indexes hold {idle_buffered / (1024 * 1024):.1f} MB of shared_buffers.",
+                )
+            self._report_pg_stat_io(connection)
+            self._report_visibility(connection)
+            if not options["since"]:
+                self.stdout.write(
+                    "Tip: run `python manage.py snapshot_index_stats` before a new load and "
+                    "`report_indexes --since latest` afterwards to see per-run deltas.",
+                )
 
-        self.stdout.write("")
-        self.stdout.write("Tip: run `python manage.py reset_index_stats` before a new load to zero scans.")
-
-    def _fetch(self):
-        sql = """
-        SELECT
-          n.nspname AS schema,
-          c.relname AS table,
-          ic.relname AS index,
-          pg_get_indexdef(ic.oid) AS indexdef,
-          COALESCE(s.idx_scan, 0) AS idx_scan,
-          COALESCE(s.idx_tup_read, 0) AS idx_tup_read,
-          pg_relation_size(ic.oid) AS bytes
-        FROM pg_class c
-        JOIN pg_namespace n ON n.oid = c.relnamespace
-        JOIN pg_index i ON i.indrelid = c.oid
-        JOIN pg_class ic ON ic.oid = i.indexrelid
-        LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = ic.oid
-        WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
-          AND c.relkind = 'r'
-          AND c.relname LIKE 'shop_%'
-        ORDER BY bytes DESC;
-        """
-        with connection.cursor() as cur:
-            cur.execute(sql)
-            return cur.fetchall()
+    def _aliases(self, options) -> list[str]:
+        if options["all_databases"]:
+            # Keep "default" first so it acts as the primary.
+            return sorted(connections.settings, key=lambda alias: alias != "default")
+        aliases = list(dict.fromkeys(options["databases"] or ["default"]))
+        unknown = [alias for alias in aliases if alias not in connections.settings]
+        if unknown:
+            msg = f"Unknown database alias(es): {', '.join(unknown)}"
+            raise CommandError(msg)
+        return aliases
 
-    def _leading_columns(self, indexdef: str) -> str:
-        # parse between first pair of parentheses, take first column/expression (naive but effective)
-        m = re.search(r"\((.+?)\)", indexdef)
-        if not m:
-            return ""
-        cols = m.group(1)
-        # Normalize: trim, collapse spaces, lowercase, cut at comma
-        first = cols.split(",")[0].strip().lower()
-        return first
+    def _snapshot(self, ref: str, notes, aliases: list[str]):
+        try:
+            snapshot = snapshots.resolve_snapshot(ref)
+        except IndexStatsSnapshot.DoesNotExist as exc:
+            raise CommandError(str(exc)) from exc
+        if aliases[0] not in snapshots.recorded_databases(snapshot):
+            msg = f"Snapshot {snapshot} has no counters for {aliases[0]}."
+            raise CommandError(msg)
+        notes.write(f"Counters since snapshot {snapshot} taken at {snapshot.created_at:%Y-%m-%d %H:%M:%S %Z}")
+        for alias in aliases:
+            if snapshots.stats_reset_since(snapshot, alias):
+                notes.write(
+                    self.style.WARNING(
+                        f"Statistics on {alias} were reset after this snapshot; deltas may be understated.",
+                    ),
+                )
+        return snapshot
+
+    def _bloat(self, connection, *, exact: bool):
+        # Bloat is only estimated for B-tree indexes; others show "-" in the report.
+        with connection.cursor() as cur:
+            if not exact:
+                return bloat.by_model_index(cur, bloat.estimate_bloat(cur))
+            if not bloat.has_pgstattuple(cur):
+                msg = "--exact-bloat requires the pgstattuple extension (CREATE EXTENSION pgstattuple)."
+                raise CommandError(msg)
+            return bloat.by_model_index(cur, bloat.exact_bloat(cur))
 
+    def _report_visibility(self, connection):
+        with connection.cursor() as cur:
+            tables = visibility.fetch_visibility(cur)
+        if not tables:
+            return
+        self.stdout.write("")
+        self.stdout.write("Visibility map (pg_class.relallvisible): index-only scans visit the heap for the rest.")
+        for line in visibility.report_lines(tables):
+            self.stdout.write(line)
 
+    def _report_pg_stat_io(self, connection):
+        with connection.cursor() as cur:
+            rows = io_stats.pg_stat_io_summary(cur)
+        if not rows:
+            return
+        self.stdout.write("")
+        self.stdout.write("pg_stat_io (relation I/O since the last reset, all databases):")
+        self.stdout.write(
+            f"  {'backend_type':<22} {'context':<10} {'reads':>10} {'hits':>12} {'evictions':>10} {'writes':>10}",
+        )
+        for backend_type, context, reads, hits, evictions, writes in rows[:8]:
+            self.stdout.write(
+                f"  {backend_type:<22} {context:<10} {reads:>10} {hits:>12} {evictions:>10} {writes:>10}",
+            )
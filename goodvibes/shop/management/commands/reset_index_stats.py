@@ -1,13 +1,46 @@
 from django.core.management.base import BaseCommand
 from django.db import connection
 
+from goodvibes.shop import snapshots
+
 
 class Command(BaseCommand):
-    help = "Reset PostgreSQL statistics (pg_stat_reset)."
+    help = (
+        "Start a new measurement window. By default records an index stats snapshot "
+        "(see `report_indexes --since`); --global runs pg_stat_reset() instead."
+    )
 
-    def handle(self, *args, **options):
-        with connection.cursor() as cur:
-            cur.execute("SELECT pg_stat_reset();")
-        self.stdout.write(self.style.SUCCESS("pg_stat_reset() executed."))
+    def add_arguments(self, parser):
+        parser.add_argument("--label", default="", help="Label for the recorded snapshot")
+        parser.add_argument(
+            "--database",
+            dest="databases",
+            action="append",
+            metavar="ALIAS",
+            help="Also record index counters from this database alias (e.g. a read replica); repeatable",
+        )
+        parser.add_argument(
+            "--global",
+            dest="global_reset",
+            action="store_true",
+            help="Call pg_stat_reset(), wiping statistics for the whole database (not for shared servers)",
+        )
 
+    def handle(self, *args, **options):
+        if options["global_reset"]:
+            with connection.cursor() as cur:
+                cur.execute("SELECT pg_stat_reset();")
+            self.stdout.write(self.style.SUCCESS("pg_stat_reset() executed."))
+            return
 
+        snap = snapshots.take_snapshot(
+            label=options["label"],
+            databases=list(dict.fromkeys(["default", *(options["databases"] or [])])),
+        )
+        self.metrics = {"snapshot": snap.pk}
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recorded index stats snapshot {snap}; report deltas with "
+                f"`report_indexes --since {snap.pk}` (statistics were not reset).",
+            ),
+        )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from goodvibes.shop import results
+from goodvibes.shop import scenario as scenarios
+from goodvibes.shop import snapshots
+
+RESULTS_DIR = Path("scenario-results")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a scenario file (TOML or JSON) of management-command phases, e.g. reset, seed, load "
+        "during bloat, report, snapshotting index stats between phases, and write one JSON result bundle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", help="Path to a .toml or .json scenario file")
+        parser.add_argument(
+            "--output",
+            help=f"Result bundle path (default: the scenario's 'output' or {RESULTS_DIR}/<name>-<timestamp>.json)",
+        )
+        parser.add_argument("--no-snapshots", action="store_true", help="Do not snapshot index stats between phases")
+        parser.add_argument(
+            "--keep-going",
+            action="store_true",
+            help="Run the remaining phases after a phase fails",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Validate the scenario and list its phases")
+        results.add_record_arguments(parser)
+
+    def handle(self, *args, **options):
+        path = Path(options["scenario"])
+        try:
+            scenario = scenarios.load_scenario(path)
+        except (OSError, ValueError) as exc:
+            msg = f"Cannot load scenario {path}: {exc}"
+            raise CommandError(msg) from exc
+
+        for phase in scenario.phases:
+            steps = " | ".join(f"{step.command} {step.options}" for step in phase.steps)
+            self.stdout.write(f"- {phase.name}: {steps}")
+        if options["dry_run"]:
+            return
+
+        started_at = timezone.now()
+        dataset = None if options["no_record"] else results.dataset_fingerprint()
+        output = Path(
+            options["output"] or scenario.output or RESULTS_DIR / f"{scenario.name}-{started_at:%Y%m%d-%H%M%S}.json",
+        )
+        bundle = {
+            "scenario": scenario.name,
+            "file": str(path),
+            "started_at": started_at.isoformat(),
+            "environment": scenarios.environment(),
+            "status": "ok",
+            "phases": [],
+        }
+        for phase in scenario.phases:
+            self.stdout.write(self.style.SUCCESS(f"Phase {phase.name}"))
+            result = scenarios.run_phase(phase)
+            if phase.snapshot and not options["no_snapshots"]:
+                result["snapshot"] = snapshots.take_snapshot(label=f"{scenario.name}:{phase.name}").pk
+            bundle["phases"].append(result)
+
+            errors = [step["error"] for step in result["steps"] if "error" in step]
+            for error in errors:
+                self.stdout.write(self.style.ERROR(f"  {error}"))
+            self.stdout.write(f"  done in {result['elapsed_s']:.1f}s")
+            if errors:
+                bundle["status"] = "failed"
+                if not options["keep_going"]:
+                    break
+
+        bundle["finished_at"] = timezone.now().isoformat()
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(bundle, indent=2, default=str))
+        self.metrics = {"bundle": str(output), "status": bundle["status"]}
+        if dataset is not None:
+            step_metrics = {
+                f"{phase['name']}/{step['command']}": step["metrics"]
+                for phase in bundle["phases"]
+                for step in phase["steps"]
+            }
+            run_ids = [metrics["run_id"] for metrics in step_metrics.values() if "run_id" in metrics]
+            run = results.record_run(
+                "scenario",
+                {**options, "label": options["label"] or scenario.name},
+                {**self.metrics, "steps": step_metrics},
+                dataset=dataset,
+                runs=run_ids,
+            )
+            self.metrics["run_id"] = run["id"]
+            self.stdout.write(f"Recorded run {run['id']} in {options['results_file']}")
+        if bundle["status"] != "ok":
+            msg = f"Scenario {scenario.name} failed; partial results in {output}"
+            raise CommandError(msg)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
@@ -1,10 +1,28 @@
 import random
 import time
-from typing import List
+from collections import Counter
+from contextlib import ExitStack
 
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
 
-from goodvibes.shop.models import Customer, Order, OrderItem, Product
+from goodvibes.shop import cache
+from goodvibes.shop import http_load
+from goodvibes.shop import index_report
+from goodvibes.shop import results
+from goodvibes.shop import statements
+from goodvibes.shop import visibility
+from goodvibes.shop.load_stats import LoadStats
+from goodvibes.shop.plans import HeapFetchSampler
+from goodvibes.shop.plans import PlanCache
+from goodvibes.shop.query_profile import QueryProfiler
+from goodvibes.shop.query_profile import advise
+from goodvibes.shop.wait_events import WaitEventSampler
+from goodvibes.shop.workload import MIXES
+from goodvibes.shop.workload import OperationPicker
+from goodvibes.shop.workload import WorkloadKeys
 
 
 class Command(BaseCommand):
@@ -13,57 +31,304 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--seconds", type=int, default=60, help="Duration to run load")
         parser.add_argument("--sleep-ms", type=int, default=0, help="Optional sleep between ops in ms")
+        parser.add_argument(
+            "--mix",
+            choices=sorted(MIXES),
+            default="default",
+            help="Operations to run: the biased default mix, created_at time-range scans, or all",
+        )
+        parser.add_argument(
+            "--http",
+            action="store_true",
+            help=(
+                "Send the operations that have a /api/shop/ endpoint as GET requests through the Django WSGI "
+                "application in-process (full middleware stack) and split each endpoint's latency into "
+                "middleware, view, ORM and DB time"
+            ),
+        )
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help=(
+                "Serve product-by-SKU, customer-by-email and recent orders through the read-through caches "
+                "(in-process LRU in front of the Django cache) and report hit ratios; without it they are bypassed"
+            ),
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help=(
+                "Run EXPLAIN (ANALYZE, FORMAT JSON) once per distinct query shape and report which "
+                "index each operation actually uses, with estimated vs actual rows"
+            ),
+        )
+        parser.add_argument(
+            "--sample-heap-fetches",
+            type=int,
+            default=0,
+            metavar="N",
+            help=(
+                "EXPLAIN ANALYZE every N-th call of each operation and report Index Only Scan heap fetches, "
+                "with the tables' all-visible page ratios before and after the run"
+            ),
+        )
+        parser.add_argument(
+            "--profile-queries",
+            action="store_true",
+            help=(
+                "Fingerprint every SQL statement via connection.execute_wrapper and print an advisory "
+                "report: hottest query shapes, proposed missing indexes and which shop indexes are needed"
+            ),
+        )
+        parser.add_argument(
+            "--sample-waits",
+            action="store_true",
+            help="Sample pg_stat_activity wait events from a background thread and summarize them per operation",
+        )
+        parser.add_argument(
+            "--sample-interval-ms",
+            type=int,
+            default=10,
+            help="Wait-event sampling interval (with --sample-waits)",
+        )
+        results.add_record_arguments(parser)
 
     def handle(self, *args, **options):
         seconds: int = max(1, int(options["seconds"]))
         sleep_ms: int = max(0, int(options["sleep_ms"]))
 
-        random.seed(123)
-        self.stdout.write(self.style.SUCCESS(f"Simulating load for {seconds}s (sleep {sleep_ms}ms)"))
+        if options["http"] and (options["explain"] or options["sample_heap_fetches"] or options["sample_waits"]):
+            msg = "--http cannot be combined with --explain, --sample-heap-fetches or --sample-waits."
+            raise CommandError(msg)
 
-        # Preload ids/keys to avoid extra queries
-        product_skus: List[str] = list(Product.objects.values_list("sku", flat=True)[:10000])
-        customer_ids: List[int] = list(Customer.objects.values_list("id", flat=True)[:10000])
-        customer_emails: List[str] = list(Customer.objects.values_list("email", flat=True)[:10000])
-        order_ids: List[int] = list(Order.objects.values_list("id", flat=True)[:20000])
+        rng = random.Random(123)
+        self.stdout.write(self.style.SUCCESS(f"Simulating load for {seconds}s (sleep {sleep_ms}ms)"))
 
-        if not (product_skus and customer_ids and customer_emails and order_ids):
+        keys = WorkloadKeys.load()
+        if not keys:
             self.stdout.write(self.style.ERROR("Insufficient data; run seed_demo_data first."))
             return
 
+        operations = MIXES[options["mix"]]
+        http = None
+        if options["http"]:
+            operations, skipped = http_load.http_operations(operations)
+            if not operations:
+                msg = f"No operation of the {options['mix']!r} mix has an HTTP endpoint."
+                raise CommandError(msg)
+            if skipped:
+                self.stdout.write(f"No endpoint for {', '.join(skipped)}; running the rest over HTTP.")
+            http = http_load.HttpLoad(connection)
+        picker = OperationPicker(operations)
+        dataset = None if options["no_record"] else results.dataset_fingerprint()
+        plans = PlanCache() if options["explain"] else None
+        profiler = QueryProfiler() if options["profile_queries"] else None
+        heap_fetches = HeapFetchSampler(options["sample_heap_fetches"]) if options["sample_heap_fetches"] > 0 else None
+        with connection.cursor() as cur:
+            statements_before = statements.read_statements(cur)
+            visibility_before = visibility.fetch_visibility(cur) if heap_fetches is not None else []
+        stats = LoadStats()
+        self.diagnostic_failures: Counter[str] = Counter()
         end_at = time.time() + seconds
         ops = 0
 
-        while time.time() < end_at:
-            r = random.random()
-            try:
-                if r < 0.3:
-                    # Product by SKU (uses implicit unique index; leaves duplicate non-unique unused)
-                    sku = random.choice(product_skus)
-                    Product.objects.only("id").get(sku=sku)
-                elif r < 0.55:
-                    # Customer by case-insensitive email (uses functional lower(email) index)
-                    email = random.choice(customer_emails)
-                    Customer.objects.only("id").get(email__iexact=email)
-                elif r < 0.8:
-                    # Recent orders for a customer (uses composite (customer, created_at))
-                    cid = random.choice(customer_ids)
-                    list(Order.objects.filter(customer_id=cid).order_by("-created_at").only("id")[:50])
-                elif r < 0.95:
-                    # Order items by order (uses (order, product) or (order))
-                    oid = random.choice(order_ids)
-                    list(OrderItem.objects.filter(order_id=oid).only("id")[:100])
-                else:
-                    # Cancelled filter with isnull True (planner should use partial index)
-                    list(Order.objects.filter(cancelled_at__isnull=True).order_by("created_at").only("id")[:50])
-            except Exception:
-                # Ignore transient misses
-                pass
-
-            ops += 1
-            if sleep_ms:
-                time.sleep(max(0, sleep_ms) / 1000.0)
+        with ExitStack() as stack:
+            if profiler is not None:
+                stack.enter_context(connection.execute_wrapper(profiler))
+            if http is not None:
+                stack.enter_context(http)
+            stack.enter_context(cache.lookup_caches_enabled(enabled=options["cached"]))
+            sampler = None
+            if options["sample_waits"]:
+                with connection.cursor() as cur:
+                    cur.execute("SELECT pg_backend_pid()")
+                    pid = cur.fetchone()[0]
+                sampler = stack.enter_context(
+                    WaitEventSampler(pid, interval=max(1, options["sample_interval_ms"]) / 1000.0),
+                )
+            while time.time() < end_at:
+                operation = picker.pick(rng)
+                queryset = None
+                if sampler is not None:
+                    sampler.current = operation.name
+                try:
+                    if http is not None:
+                        url = http.url(operation, keys, rng)
+                        with stats.measure(operation.name):
+                            http.get(operation.name, url)
+                    elif options["cached"] and operation.cached is not None:
+                        with stats.measure(operation.name):
+                            operation.cached(keys, rng)
+                    else:
+                        queryset = operation.build(keys, rng)
+                        with stats.measure(operation.name):
+                            operation.run(queryset)
+                except Exception:
+                    # Ignore transient misses (LoadStats.measure has counted the error)
+                    pass
+                finally:
+                    # Waits of the EXPLAINs below are not the operation's.
+                    if sampler is not None:
+                        sampler.current = None
+                if queryset is not None:
+                    # Outside the measured call: extra EXPLAIN ANALYZE executions of the same query.
+                    if plans is not None:
+                        self._diagnose("--explain", plans.capture, operation.name, queryset)
+                    if heap_fetches is not None:
+                        self._diagnose("--sample-heap-fetches", heap_fetches.sample, operation.name, queryset)
+
+                ops += 1
+                if sleep_ms:
+                    time.sleep(max(0, sleep_ms) / 1000.0)
 
+        stats.stop()
         self.stdout.write(self.style.SUCCESS(f"Completed {ops} operations."))
+        for line in stats.report_lines():
+            self.stdout.write(line)
+        self.stdout.write("")
+        with connection.cursor() as cur:
+            deltas = statements.deltas_since(cur, statements_before)
+        for line in statements.summary_lines(deltas, client_seconds=stats.busy_seconds):
+            self.stdout.write(line)
+        self.metrics = {**stats.as_dict(), "server": statements.summary_dict(deltas)}
+        if sampler is not None:
+            self.stdout.write("")
+            for line in sampler.report_lines():
+                self.stdout.write(line)
+            self.metrics["waits"] = {op: dict(waits) for op, waits in sampler.summary().items()}
+        if options["cached"]:
+            self.stdout.write("")
+            self.stdout.write("Lookup cache:")
+            for lookup in cache.LOOKUP_CACHES:
+                c = lookup.counters
+                self.stdout.write(
+                    f"  {lookup.name:<16} {c.lookups:>8} lookups  {c.hit_pct:>5.1f}% hits "
+                    f"(local {c.local_hits}, shared {c.shared_hits})  {c.misses} misses to PostgreSQL",
+                )
+            self.metrics["cache"] = {lookup.name: lookup.counters.as_dict() for lookup in cache.LOOKUP_CACHES}
+        if http is not None:
+            self.stdout.write("")
+            self.stdout.write(
+                "HTTP latency breakdown (mean ms per request, in-process WSGI, connection kept open):",
+            )
+            for line in http.report_lines():
+                self.stdout.write(line)
+            self.metrics["http"] = http.as_dict()
+        if plans is not None:
+            self._report_plans(plans, operations)
+            self.metrics["plans"] = {
+                op.name: [
+                    {"verdict": plans.plans[key].verdict(op.expected_indexes), "indexes": plans.plans[key].indexes}
+                    for key in plans.by_operation.get(op.name, [])
+                ]
+                for op in operations
+            }
+        if heap_fetches is not None:
+            self._report_heap_fetches(heap_fetches, visibility_before)
+        if self.diagnostic_failures:
+            self.metrics["diagnostic_failures"] = dict(self.diagnostic_failures)
+            for option, failures in sorted(self.diagnostic_failures.items()):
+                self.stdout.write(self.style.WARNING(f"{option}: {failures} EXPLAIN ANALYZE call(s) failed."))
+        if profiler is not None:
+            self._report_profile(profiler)
+        if not options["no_record"]:
+            run = results.record_run("simulate_load", options, self.metrics, stats, dataset=dataset)
+            self.metrics["run_id"] = run["id"]
+            self.stdout.write(f"Recorded run {run['id']} in {options['results_file']}")
+
+    def _diagnose(self, option: str, explain, operation: str, queryset):
+        """Run one of the EXPLAIN-based samplers, counting (and first warning about) its failures."""
+        try:
+            explain(operation, queryset)
+        except DatabaseError as exc:
+            self.diagnostic_failures[option] += 1
+            if self.diagnostic_failures[option] == 1:
+                self.stdout.write(self.style.WARNING(f"{option}: EXPLAIN ANALYZE of {operation} failed: {exc}"))
+
+    def _report_plans(self, plans: PlanCache, operations):
+        self.stdout.write("")
+        self.stdout.write("Access paths chosen by the planner (one EXPLAIN ANALYZE per query shape):")
+        for operation in operations:
+            for key in plans.by_operation.get(operation.name, []):
+                plan = plans.plans[key]
+                verdict = plan.verdict(operation.expected_indexes)
+                style = self.style.SUCCESS if verdict == "ok" else self.style.WARNING
+                self.stdout.write(style(f"{operation.name:<18} [{key}] {verdict}"))
+                if verdict != "ok":
+                    self.stdout.write(f"  expected: {', '.join(operation.expected_indexes)}")
+                for scan in plan.scans:
+                    note = "  <- misestimate" if scan.misestimated else ""
+                    self.stdout.write(f"  {scan}{note}")
+                if plan.execution_ms is not None:
+                    self.stdout.write(f"  cost={plan.total_cost:.2f} time={plan.execution_ms:.3f}ms")
+
+    def _report_heap_fetches(self, sampler: HeapFetchSampler, visibility_before):
+        self.stdout.write("")
+        self.stdout.write(f"Index Only Scan heap fetches (EXPLAIN ANALYZE of every {sampler.every}th call):")
+        self.stdout.write(
+            f"  {'operation':<18} {'samples':>7} {'ios_rows':>10} {'heap_fetches':>12} {'fetch%':>7}  index",
+        )
+        for name, fetches in sorted(sampler.stats.items()):
+            if not fetches.index_only_scans:
+                self.stdout.write(f"  {name:<18} {fetches.samples:>7}  (no index-only scan)")
+                continue
+            style = self.style.WARNING if fetches.fetch_pct > 10 else str
+            self.stdout.write(
+                style(
+                    f"  {name:<18} {fetches.samples:>7} {fetches.rows:>10.0f} {fetches.heap_fetches:>12.0f} "
+                    f"{fetches.fetch_pct:>6.1f}%  {', '.join(sorted(fetches.indexes))}",
+                ),
+            )
+        with connection.cursor() as cur:
+            visibility_after = visibility.fetch_visibility(cur)
+        before = {t.table: t.all_visible_pct for t in visibility_before}
+        self.stdout.write("")
+        self.stdout.write("All-visible pages (pg_class.relallvisible; updated by VACUUM/ANALYZE):")
+        for line in visibility.report_lines(visibility_after):
+            self.stdout.write(line)
+        for t in visibility_after:
+            old = before.get(t.table)
+            if old is not None and t.all_visible_pct is not None and old != t.all_visible_pct:
+                self.stdout.write(f"  {t.table}: {old:.1f}% -> {t.all_visible_pct:.1f}% all-visible during the run")
+        self.metrics["heap_fetches"] = {
+            name: {
+                "samples": fetches.samples,
+                "index_only_rows": fetches.rows,
+                "heap_fetches": fetches.heap_fetches,
+                "fetch_pct": round(fetches.fetch_pct, 2),
+            }
+            for name, fetches in sampler.stats.items()
+        }
+        self.metrics["all_visible_pct"] = {
+            t.table: {"before": before.get(t.table), "after": t.all_visible_pct} for t in visibility_after
+        }
 
+    def _report_profile(self, profiler: QueryProfiler):
+        self.stdout.write("")
+        self.stdout.write("Hottest query shapes (ORM side):")
+        for stats in profiler.top():
+            filters = ", ".join(expr for _table, expr in stats.filters) or "-"
+            sorts = ", ".join(expr for _table, expr in stats.sorts) or "-"
+            self.stdout.write(
+                f"  {stats.calls:>8} calls {stats.total_ms:>10.1f}ms total {stats.avg_ms:>7.3f}ms avg  "
+                f"{stats.table} where [{filters}] order by [{sorts}]",
+            )
+        if profiler.overflow_calls:
+            self.stdout.write(
+                f"  ({profiler.overflow_calls} calls / {profiler.overflow_ms:.1f}ms in shapes beyond the "
+                f"{profiler.max_fingerprints}-fingerprint limit)",
+            )
 
+        with connection.cursor() as cur:
+            indexes = index_report.fetch_index_keys(cur)
+        advice = advise(list(profiler.stats.values()), indexes)
+        self.stdout.write("")
+        self.stdout.write("Index advice (advisory; based only on this run's query shapes):")
+        for proposal in advice.proposals:
+            self.stdout.write(
+                self.style.WARNING(f"  missing: {proposal.sql}  -- {proposal.calls} calls, {proposal.total_ms:.1f}ms"),
+            )
+        for name, (calls, total_ms) in sorted(advice.needed.items(), key=lambda item: -item[1][0]):
+            self.stdout.write(f"  needed:  {name}  -- serves {calls} calls, {total_ms:.1f}ms")
+        for name in advice.not_needed:
+            self.stdout.write(f"  unneeded by this workload: {name}")
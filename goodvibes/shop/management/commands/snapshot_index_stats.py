@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from goodvibes.shop import snapshots
+from goodvibes.shop.models import IndexStatsSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Record current pg_stat_user_indexes/pg_statio_user_indexes counters for shop tables "
+        "so `report_indexes --since` can report per-run deltas without pg_stat_reset()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--label", default="", help="Optional label to refer to the snapshot by")
+        parser.add_argument(
+            "--database",
+            dest="databases",
+            action="append",
+            metavar="ALIAS",
+            help="Also record index counters from this database alias (e.g. a read replica); repeatable",
+        )
+        parser.add_argument("--list", action="store_true", help="List existing snapshots instead of taking one")
+        parser.add_argument(
+            "--prune",
+            type=int,
+            metavar="KEEP",
+            help="Delete all but the KEEP most recent snapshots",
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for snap in IndexStatsSnapshot.objects.order_by("-created_at", "-pk"):
+                self.stdout.write(f"{snap.pk:>6}  {snap.created_at:%Y-%m-%d %H:%M:%S}  {snap.label}")
+            return
+
+        if options["prune"] is not None:
+            keep = list(
+                IndexStatsSnapshot.objects.order_by("-created_at", "-pk").values_list("pk", flat=True)[
+                    : max(0, options["prune"])
+                ],
+            )
+            deleted, _ = IndexStatsSnapshot.objects.exclude(pk__in=keep).delete()
+            self.stdout.write(self.style.SUCCESS(f"Pruned snapshots, deleted {deleted} rows."))
+            return
+
+        snap = snapshots.take_snapshot(
+            label=options["label"],
+            databases=list(dict.fromkeys(["default", *(options["databases"] or [])])),
+        )
+        self.metrics = {"snapshot": snap.pk}
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot {snap} recorded ({snap.entries.count()} indexes). "
+                f"Use `report_indexes --since {snap.pk}` for deltas.",
+            ),
+        )
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db import connection
+
+from goodvibes.shop import whatif
+from goodvibes.shop.workload import MIXES
+from goodvibes.shop.workload import WorkloadKeys
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare planner costs of the simulate_load query shapes with and without a hypothetical "
+        "index set (HypoPG), without building or dropping anything for real."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--add",
+            action="append",
+            default=[],
+            metavar="CREATE_INDEX_SQL",
+            help="Hypothetical index to add, e.g. 'CREATE INDEX ON shop_order USING brin (created_at)' (repeatable)",
+        )
+        parser.add_argument(
+            "--hide",
+            action="append",
+            default=[],
+            metavar="INDEX",
+            help="Existing index to pretend is dropped, e.g. idx_order_customer_only (repeatable; HypoPG 1.4+)",
+        )
+        parser.add_argument("--mix", choices=sorted(MIXES), default="default", help="simulate_load operation mix")
+        parser.add_argument("--samples", type=int, default=5, help="Parameter samples per operation")
+        parser.add_argument("--seed", type=int, default=123, help="PRNG seed for the samples")
+
+    def handle(self, *args, **options):
+        if not options["add"] and not options["hide"]:
+            msg = "Nothing to evaluate; pass --add and/or --hide."
+            raise CommandError(msg)
+
+        keys = WorkloadKeys.load()
+        if not keys:
+            self.stdout.write(self.style.ERROR("Insufficient data; run seed_demo_data first."))
+            return
+
+        with connection.cursor() as cur:
+            hypopg = whatif.hypopg_support(cur)
+        if options["add"] and not hypopg.installed:
+            msg = "--add requires the HypoPG extension (CREATE EXTENSION hypopg)."
+            raise CommandError(msg)
+        if options["hide"] and not hypopg.can_hide:
+            # Dropping real indexes instead would lock their tables for the whole evaluation.
+            msg = "--hide requires hypopg_hide_index() (HypoPG 1.4+: ALTER EXTENSION hypopg UPDATE)."
+            raise CommandError(msg)
+
+        operations = MIXES[options["mix"]]
+        queries = whatif.sample_queries(keys, max(1, options["samples"]), options["seed"], operations)
+        with connection.cursor() as cur:
+            before = whatif.evaluate(cur, queries)
+        try:
+            with (
+                whatif.hypothetical_indexes(
+                    connection,
+                    add=options["add"],
+                    hide=options["hide"],
+                    hypopg=hypopg,
+                ),
+                connection.cursor() as cur,
+            ):
+                after = whatif.evaluate(cur, queries)
+        except DatabaseError as exc:
+            msg = f"Could not apply the hypothetical index set: {exc}"
+            raise CommandError(msg) from exc
+
+        self.stdout.write(f"{'operation':<18} {'cost before':>12} {'cost after':>12} {'change':>8}  access path")
+        weighted_before = weighted_after = 0.0
+        for operation in operations:
+            b, a = before[operation.name], after[operation.name]
+            weighted_before += operation.weight * b.mean_cost
+            weighted_after += operation.weight * a.mean_cost
+            change = (a.mean_cost - b.mean_cost) / b.mean_cost * 100 if b.mean_cost else 0.0
+            line = (
+                f"{operation.name:<18} {b.mean_cost:>12.2f} {a.mean_cost:>12.2f} {change:>+7.1f}%  "
+                f"{self._path(b.plan)} -> {self._path(a.plan)}"
+            )
+            style = self.style.WARNING if change > 1 else self.style.SUCCESS if change < -1 else str
+            self.stdout.write(style(line))
+
+        total_change = (weighted_after - weighted_before) / weighted_before * 100 if weighted_before else 0.0
+        self.stdout.write("")
+        self.stdout.write(f"Workload-weighted planner cost change: {total_change:+.1f}%")
+        self.stdout.write("Costs are planner estimates (plain EXPLAIN); confirm winners with a real build.")
+
+    def _path(self, plan) -> str:
+        if plan.indexes:
+            # HypoPG names hypothetical indexes "<oid>btree_<table>_<column>".
+            return ",".join(plan.indexes)
+        if plan.seq_scans:
+            return "seq scan"
+        return "-"
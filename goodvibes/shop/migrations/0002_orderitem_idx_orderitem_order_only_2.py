@@ -1,7 +1,7 @@
 # Generated by Django 5.2.7 on 2025-11-05 22:20
 
 from django.db import migrations, models
-from django.contrib.postgres.operations import AddIndexConcurrently
+from goodvibes.shop.operations import AddIndexConcurrently
 
 
 class Migration(migrations.Migration):
@@ -1,7 +1,7 @@
 # Generated by Django 5.2.7 on 2025-11-05 22:21
 
 from django.db import migrations
-from django.contrib.postgres.operations import RemoveIndexConcurrently
+from goodvibes.shop.operations import RemoveIndexConcurrently
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_remove_orderitem_idx_orderitem_order_only_2'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stats_reset', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndexStatsSnapshotEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema', models.CharField(max_length=63)),
+                ('table', models.CharField(max_length=63)),
+                ('index', models.CharField(max_length=63)),
+                ('idx_scan', models.BigIntegerField(default=0)),
+                ('idx_tup_read', models.BigIntegerField(default=0)),
+                ('idx_tup_fetch', models.BigIntegerField(default=0)),
+                ('idx_blks_read', models.BigIntegerField(default=0)),
+                ('idx_blks_hit', models.BigIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='shop.indexstatssnapshot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'schema', 'index'), name='uniq_index_stats_snapshot_entry')],
+            },
+        ),
+    ]
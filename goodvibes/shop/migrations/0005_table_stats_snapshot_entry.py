@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_index_stats_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableStatsSnapshotEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema', models.CharField(max_length=63)),
+                ('table', models.CharField(max_length=63)),
+                ('n_tup_ins', models.BigIntegerField(default=0)),
+                ('n_tup_upd', models.BigIntegerField(default=0)),
+                ('n_tup_hot_upd', models.BigIntegerField(default=0)),
+                ('n_tup_del', models.BigIntegerField(default=0)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tables', to='shop.indexstatssnapshot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'schema', 'table'), name='uniq_table_stats_snapshot_entry')],
+            },
+        ),
+    ]
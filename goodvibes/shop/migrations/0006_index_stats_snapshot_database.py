@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_table_stats_snapshot_entry'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='indexstatssnapshotentry',
+            name='uniq_index_stats_snapshot_entry',
+        ),
+        migrations.AddField(
+            model_name='indexstatssnapshotentry',
+            name='database',
+            field=models.CharField(default='default', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='indexstatssnapshotentry',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'database', 'schema', 'index'), name='uniq_index_stats_snapshot_entry'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_index_stats_snapshot_database'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tablestatssnapshotentry',
+            name='heap_blks_hit',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tablestatssnapshotentry',
+            name='heap_blks_read',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
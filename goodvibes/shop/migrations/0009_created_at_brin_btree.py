@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:30
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+from goodvibes.shop.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('shop', '0008_orderitem_order_created_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='idx_order_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='idx_order_created_btree'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='idx_product_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['created_at'], name='idx_product_created_btree'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_created_at_brin_btree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAggregateState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('pending_order_id', models.BigIntegerField(default=0)),
+                ('pending_xmax', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=64)),
+                ('units', models.BigIntegerField(default=0)),
+                ('order_lines', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'category'], name='idx_sales_day_category')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='uniq_sales_product_day')],
+            },
+        ),
+    ]
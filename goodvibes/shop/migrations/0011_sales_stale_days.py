@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+# Marks the (UTC) order days touched by cancellation changes, created_at changes
+# and deletes, so refresh_sales_aggregates re-derives them
+# (goodvibes/shop/aggregates.py). Statement-level with transition tables: one
+# INSERT of distinct days per statement instead of one per changed row. These
+# cannot have column lists or WHEN clauses, so every UPDATE of shop_order
+# fires the trigger and filters the changed rows itself.
+STALE_DAY_TRIGGER_SQL = """
+CREATE FUNCTION shop_mark_sales_days_stale_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO shop_salesaggregatestaleday (day)
+    SELECT (o.created_at AT TIME ZONE 'UTC')::date
+    FROM old_orders o JOIN new_orders n ON n.id = o.id
+    WHERE o.cancelled_at IS DISTINCT FROM n.cancelled_at OR o.created_at IS DISTINCT FROM n.created_at
+    UNION
+    SELECT (n.created_at AT TIME ZONE 'UTC')::date
+    FROM old_orders o JOIN new_orders n ON n.id = o.id
+    WHERE o.created_at IS DISTINCT FROM n.created_at;
+    RETURN NULL;
+END
+$$;
+
+CREATE FUNCTION shop_mark_sales_days_stale_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO shop_salesaggregatestaleday (day)
+    SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date FROM old_orders;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER shop_order_sales_stale_update
+AFTER UPDATE ON shop_order
+REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+FOR EACH STATEMENT
+EXECUTE FUNCTION shop_mark_sales_days_stale_update();
+
+CREATE TRIGGER shop_order_sales_stale_delete
+AFTER DELETE ON shop_order
+REFERENCING OLD TABLE AS old_orders
+FOR EACH STATEMENT
+EXECUTE FUNCTION shop_mark_sales_days_stale_delete();
+"""
+
+DROP_STALE_DAY_TRIGGER_SQL = """
+DROP TRIGGER shop_order_sales_stale_delete ON shop_order;
+DROP TRIGGER shop_order_sales_stale_update ON shop_order;
+DROP FUNCTION shop_mark_sales_days_stale_delete();
+DROP FUNCTION shop_mark_sales_days_stale_update();
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_sales_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAggregateStaleDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.RunSQL(STALE_DAY_TRIGGER_SQL, DROP_STALE_DAY_TRIGGER_SQL),
+    ]
@@ -1,6 +1,9 @@
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.db import transaction
 from django.db.models import Q
 from django.db.models.functions import Lower
+from django.utils import timezone
 
 
 class Product(models.Model):
@@ -19,6 +22,9 @@ class Product(models.Model):
             # Plain vs functional (we'll bias workload to use the functional)
             models.Index(fields=["name"], name="idx_product_name_plain"),
             models.Index(Lower("name"), name="idx_product_name_lower"),
+            # created_at follows insertion order: BRIN (a few pages) vs B-tree for range scans
+            BrinIndex(fields=["created_at"], name="idx_product_created_brin"),
+            models.Index(fields=["created_at"], name="idx_product_created_btree"),
         ]
 
 
@@ -36,11 +42,41 @@ class Customer(models.Model):
         ]
 
 
+class OrderQuerySet(models.QuerySet):
+    def set_cancelled_at(self, cancelled_at) -> int:
+        """Cancel the orders (or un-cancel them, with None) and return how many changed.
+
+        Unlike a plain ``update()``, which sends no signals, this also applies
+        the change to the recent-orders cache once the transaction commits.
+        """
+        from goodvibes.shop import cache  # cache imports the models
+
+        if not cache.recent_orders.active:
+            return self.update(cancelled_at=cancelled_at)
+        with transaction.atomic(using=self.db):
+            rows = list(self.select_for_update().values_list("id", "customer_id", "created_at"))
+            updated = (
+                self.model._base_manager.using(self.db)
+                .filter(pk__in=[pk for pk, _customer_id, _created_at in rows])
+                .update(cancelled_at=cancelled_at)
+            )
+            for pk, customer_id, created_at in rows:
+                order = cache.RecentOrder(pk, created_at, cancelled_at is not None)
+                transaction.on_commit(
+                    lambda customer_id=customer_id, order=order: cache.recent_orders.order_saved(customer_id, order),
+                    using=self.db,
+                )
+        return updated
+
+
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so seeding can spread orders over time (and partitions).
+    created_at = models.DateTimeField(default=timezone.now)
     cancelled_at = models.DateTimeField(null=True, blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         indexes = [
             # Composite index used by our hot path queries
@@ -54,6 +90,9 @@ class Order(models.Model):
             models.Index(
                 fields=["cancelled_at"], name="idx_order_cancelled_partial", condition=Q(cancelled_at__isnull=True)
             ),
+            # Time-range scans: BRIN vs B-tree on the append-mostly created_at
+            BrinIndex(fields=["created_at"], name="idx_order_created_brin"),
+            models.Index(fields=["created_at"], name="idx_order_created_btree"),
         ]
 
 
@@ -61,6 +100,9 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Copy of order.created_at: the partition key when shop_orderitem is
+    # partitioned together with shop_order (see goodvibes/shop/partitioning.py).
+    order_created_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
@@ -72,4 +114,113 @@ class OrderItem(models.Model):
             models.Index(fields=["order"], name="idx_orderitem_order_only"),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.order_created_at is None and self.order_id is not None:
+            self.order_created_at = self.order.created_at
+        super().save(*args, **kwargs)
+
+
+class ProductDailySales(models.Model):
+    """Units sold per product and (UTC) order day, excluding cancelled orders.
+
+    Derived from shop_order/shop_orderitem by ``refresh_sales_aggregates``
+    (goodvibes/shop/aggregates.py), so reports need not scan the order tables.
+    """
+
+    day = models.DateField()
+    # No separate FK index: uniq_sales_product_day leads with product.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
+    # Copy of product.category, so category reports need no join.
+    category = models.CharField(max_length=64)
+    units = models.BigIntegerField(default=0)
+    order_lines = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the ON CONFLICT target of the incremental refresh.
+            models.UniqueConstraint(fields=["product", "day"], name="uniq_sales_product_day"),
+        ]
+        indexes = [
+            # Reports over a range of days, optionally for one category
+            models.Index(fields=["day", "category"], name="idx_sales_day_category"),
+        ]
+
+
+class SalesAggregateState(models.Model):
+    """Progress of the incremental sales aggregation (a single row)."""
+
+    # Orders with an id up to this one are counted in ProductDailySales.
+    last_order_id = models.BigIntegerField(default=0)
+    # Highest order id seen while other transactions were open, and the
+    # snapshot's xmax: it becomes the watermark once those have all ended.
+    pending_order_id = models.BigIntegerField(default=0)
+    pending_xmax = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
 
+class SalesAggregateStaleDay(models.Model):
+    """A day whose aggregates an order change made stale; consumed by the next refresh.
+
+    Rows are inserted by a trigger on shop_order (cancelled_at or created_at
+    updated, or order deleted), so ``QuerySet.update()`` and raw SQL are
+    seen too. One row per day per statement rather than a unique day: that
+    would make concurrent cancellations of the same day wait for each other.
+    """
+
+    day = models.DateField()
+
+
+class IndexStatsSnapshot(models.Model):
+    """Point-in-time copy of per-index statistics counters for shop tables."""
+
+    label = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # pg_stat_database.stats_reset at capture time; a later value means the
+    # counters were reset and deltas against this snapshot are unreliable.
+    stats_reset = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.label}".rstrip()
+
+
+class IndexStatsSnapshotEntry(models.Model):
+    snapshot = models.ForeignKey(IndexStatsSnapshot, on_delete=models.CASCADE, related_name="entries")
+    # Django database alias the counters were read from (primary or a replica).
+    database = models.CharField(max_length=64, default="default")
+    schema = models.CharField(max_length=63)
+    table = models.CharField(max_length=63)
+    index = models.CharField(max_length=63)
+    idx_scan = models.BigIntegerField(default=0)
+    idx_tup_read = models.BigIntegerField(default=0)
+    idx_tup_fetch = models.BigIntegerField(default=0)
+    idx_blks_read = models.BigIntegerField(default=0)
+    idx_blks_hit = models.BigIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "database", "schema", "index"],
+                name="uniq_index_stats_snapshot_entry",
+            ),
+        ]
+
+
+class TableStatsSnapshotEntry(models.Model):
+    """Row write counters (pg_stat_user_tables) and heap block I/O (pg_statio_user_tables)
+    recorded alongside index counters."""
+
+    snapshot = models.ForeignKey(IndexStatsSnapshot, on_delete=models.CASCADE, related_name="tables")
+    schema = models.CharField(max_length=63)
+    table = models.CharField(max_length=63)
+    n_tup_ins = models.BigIntegerField(default=0)
+    n_tup_upd = models.BigIntegerField(default=0)
+    n_tup_hot_upd = models.BigIntegerField(default=0)
+    n_tup_del = models.BigIntegerField(default=0)
+    heap_blks_read = models.BigIntegerField(default=0)
+    heap_blks_hit = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "schema", "table"], name="uniq_table_stats_snapshot_entry"),
+        ]
@@ -0,0 +1,230 @@
+"""Index migration operations that are safe to run under production load.
+
+They extend Django's ``AddIndexConcurrently``/``RemoveIndexConcurrently`` with:
+
+* cleanup of an INVALID index with the same name left behind by an earlier,
+  failed or cancelled ``CREATE INDEX CONCURRENTLY`` (retrying would otherwise
+  fail with "relation already exists"), and of the INVALID index a build that
+  fails now leaves behind;
+* progress logging from ``pg_stat_progress_create_index`` while an index is
+  being built, polled from a separate connection;
+* support for partitioned tables (see ``partitioning.py``), where PostgreSQL
+  has no ``CREATE INDEX CONCURRENTLY``: the parent index is created ``ON ONLY``
+  the parent, each partition's index is built concurrently and attached, and
+  the parent index becomes valid once all partitions are attached.
+
+Migrations using them must set ``atomic = False``.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from contextlib import contextmanager
+
+from django.contrib.postgres import operations as pg_operations
+from django.db import connections
+from django.db.backends.utils import truncate_name
+
+from goodvibes.shop import partitioning
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 5.0
+
+PROGRESS_SQL = """
+SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total, lockers_done, lockers_total
+FROM pg_stat_progress_create_index
+WHERE pid = %s
+"""
+
+# "CREATE [UNIQUE] INDEX [IF NOT EXISTS] <name> " and " ON [ONLY] <table> " in Django's and
+# pg_get_indexdef's spelling.
+_INDEX_NAME_RE = re.compile(r"^CREATE (UNIQUE )?INDEX (?:IF NOT EXISTS )?(?:CONCURRENTLY )?\S+ ")
+_INDEX_TABLE_RE = re.compile(r" ON (?:ONLY )?(?P<table>\S+) ")
+
+PARTITIONS_OF_SQL = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass(%s)
+ORDER BY c.relname
+"""
+
+
+def drop_invalid_index(schema_editor, name: str) -> bool:
+    """Drop index ``name`` if it exists and is INVALID. Returns True if dropped."""
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(
+            "SELECT NOT i.indisvalid, c.relkind = 'I' FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indexrelid = to_regclass(%s)",
+            [schema_editor.quote_name(name)],
+        )
+        row = cur.fetchone()
+    if not row or not row[0]:
+        return False
+    logger.warning("Dropping INVALID index %s left by a failed concurrent build", name)
+    # Partitioned (parent) indexes cannot be dropped concurrently.
+    concurrently = "" if row[1] else " CONCURRENTLY"
+    schema_editor.execute(f"DROP INDEX{concurrently} IF EXISTS {schema_editor.quote_name(name)}")
+    return True
+
+
+def _is_partitioned(schema_editor, table: str) -> bool:
+    if schema_editor.collect_sql:
+        # sqlmigrate: show the plain statements.
+        return False
+    with schema_editor.connection.cursor() as cur:
+        return partitioning.is_partitioned(cur, table)
+
+
+def build_partitioned_index(schema_editor, table: str, name: str, sql: str) -> None:
+    """Build index ``name`` (its ``CREATE INDEX`` is ``sql``) on partitioned ``table``
+    one partition at a time, concurrently.
+
+    ``sql`` may come from Django (``Index.create_sql``) or ``pg_get_indexdef``.
+    Safe to re-run after a failure: existing, valid partition indexes are kept
+    and only attached.
+    """
+    quote = schema_editor.quote_name
+    parent_sql = _INDEX_NAME_RE.sub(rf"CREATE \1INDEX IF NOT EXISTS {quote(name)} ", sql, 1)
+    schema_editor.execute(_INDEX_TABLE_RE.sub(r" ON ONLY \g<table> ", parent_sql, 1))
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(PARTITIONS_OF_SQL, [quote(table)])
+        partitions = [partition for (partition,) in cur.fetchall()]
+    for partition in partitions:
+        child = truncate_name(f"{partition}_{name}", schema_editor.connection.ops.max_name_length())
+        with schema_editor.connection.cursor() as cur:
+            cur.execute(
+                "SELECT i.indisvalid, EXISTS (SELECT FROM pg_inherits WHERE inhrelid = i.indexrelid) "
+                "FROM pg_index i WHERE i.indexrelid = to_regclass(%s)",
+                [quote(child)],
+            )
+            row = cur.fetchone()
+        if row and row[1]:
+            continue
+        if not (row and row[0]):
+            child_sql = _INDEX_NAME_RE.sub(rf"CREATE \1INDEX CONCURRENTLY {quote(child)} ", sql, 1)
+            child_sql = _INDEX_TABLE_RE.sub(f" ON {quote(partition)} ", child_sql, 1)
+            with concurrent_build(schema_editor, child):
+                schema_editor.execute(child_sql)
+        schema_editor.execute(f"ALTER INDEX {quote(name)} ATTACH PARTITION {quote(child)}")
+    logger.info("Partitioned index %s built on %d partitions", name, len(partitions))
+
+
+def _report_progress(alias: str, pid: int, name: str, stop: threading.Event) -> None:
+    try:
+        while not stop.wait(PROGRESS_INTERVAL):
+            with connections[alias].cursor() as cur:
+                cur.execute(PROGRESS_SQL, [pid])
+                row = cur.fetchone()
+            if row is None:
+                continue
+            phase, blocks_done, blocks_total, tuples_done, tuples_total, lockers_done, lockers_total = row
+            parts = [phase]
+            if blocks_total:
+                parts.append(f"blocks {blocks_done}/{blocks_total} ({100 * blocks_done / blocks_total:.0f}%)")
+            if tuples_total:
+                parts.append(f"tuples {tuples_done}/{tuples_total}")
+            if lockers_total:
+                parts.append(f"waiting for lockers {lockers_done}/{lockers_total}")
+            logger.info("Building %s: %s", name, ", ".join(parts))
+    except Exception:
+        logger.exception("Progress reporting for %s stopped", name)
+    finally:
+        connections[alias].close()
+
+
+@contextmanager
+def concurrent_build(schema_editor, name: str):
+    """Wrap a concurrent index build with cleanup and progress reporting."""
+    if schema_editor.collect_sql:
+        # sqlmigrate: only the DDL itself is wanted.
+        yield
+        return
+    drop_invalid_index(schema_editor, name)
+    connection = schema_editor.connection
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_backend_pid()")
+        pid = cur.fetchone()[0]
+    stop = threading.Event()
+    reporter = threading.Thread(
+        target=_report_progress,
+        args=(connection.alias, pid, name, stop),
+        name=f"index-progress-{name}",
+        daemon=True,
+    )
+    reporter.start()
+    try:
+        yield
+    except Exception:
+        stop.set()
+        # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index that still
+        # slows down writes; remove it so the migration can simply be retried.
+        if not connection.in_atomic_block:
+            drop_invalid_index(schema_editor, name)
+        raise
+    finally:
+        stop.set()
+        reporter.join()
+    logger.info("Index %s built", name)
+
+
+def _partitioned_model(operation, app_label, schema_editor, state):
+    """The operation's model if its table is partitioned (and migrated on this database), else None."""
+    model = state.apps.get_model(app_label, operation.model_name)
+    if operation.allow_migrate_model(schema_editor.connection.alias, model) and _is_partitioned(
+        schema_editor,
+        model._meta.db_table,
+    ):
+        return model
+    return None
+
+
+def drop_partitioned_index(schema_editor, name: str) -> None:
+    # Drops the partitions' indexes too; partitioned indexes cannot be dropped CONCURRENTLY.
+    schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class AddIndexConcurrently(pg_operations.AddIndexConcurrently):
+    """``AddIndexConcurrently`` with progress reporting and INVALID index cleanup."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = _partitioned_model(self, app_label, schema_editor, to_state)
+        if model is not None:
+            sql = str(self.index.create_sql(model, schema_editor))
+            build_partitioned_index(schema_editor, model._meta.db_table, self.index.name, sql)
+            return
+        with concurrent_build(schema_editor, self.index.name):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        if _partitioned_model(self, app_label, schema_editor, from_state) is not None:
+            drop_partitioned_index(schema_editor, self.index.name)
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(pg_operations.RemoveIndexConcurrently):
+    """``RemoveIndexConcurrently`` whose reverse (re-creating the index) reports progress."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        if _partitioned_model(self, app_label, schema_editor, from_state) is not None:
+            drop_partitioned_index(schema_editor, self.name)
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = _partitioned_model(self, app_label, schema_editor, to_state)
+        if model is not None:
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            sql = str(index.create_sql(model, schema_editor))
+            build_partitioned_index(schema_editor, model._meta.db_table, index.name, sql)
+            return
+        with concurrent_build(schema_editor, self.name):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
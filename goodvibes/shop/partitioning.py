@@ -0,0 +1,269 @@
+"""Monthly range partitioning of ``shop_order`` and ``shop_orderitem``.
+
+The partitioned layout is opt-in (``partition_orders --convert``):
+
+* ``shop_order`` is ``PARTITION BY RANGE (created_at)`` with one partition per
+  month (``shop_order_p2026_10``). PostgreSQL requires the partition key in
+  unique constraints, so its primary key becomes ``(id, created_at)``; ids stay
+  unique because they all come from one sequence, and Django keeps using
+  ``id`` alone.
+* ``shop_orderitem`` is partitioned the same way on ``order_created_at`` (a
+  copy of its order's ``created_at``) and references ``shop_order`` with a
+  composite foreign key, so an order and its items always sit in the same
+  month and a month can be detached from both tables without deleting rows.
+
+Each partition has its own, small copies of the model's indexes; the hot
+recent partitions' indexes fit in memory however much history is kept.
+Everything here is plain SQL so migrations can use it too.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> partition key column.
+PARTITION_KEYS = {
+    "shop_order": "created_at",
+    "shop_orderitem": "order_created_at",
+}
+# Order of creation; detaching goes the other way (items reference orders).
+TABLES = ("shop_order", "shop_orderitem")
+
+ORDER_FK_NAME = "shop_orderitem_order_fk"
+
+PARTITIONS_SQL = """
+SELECT parent.relname, c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+       pg_total_relation_size(c.oid), pg_indexes_size(c.oid)
+FROM pg_inherits i
+JOIN pg_class parent ON parent.oid = i.inhparent
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE parent.relname = ANY(%s)
+  AND parent.relkind = 'p'
+ORDER BY parent.relname, c.relname
+"""
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    table: str
+    name: str
+    lower: datetime | None
+    upper: datetime | None
+    rows: int
+    total_bytes: int
+    index_bytes: int
+
+
+def is_partitioned(cursor, table: str = "shop_order") -> bool:
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y_%m}"
+
+
+def list_partitions(cursor) -> list[Partition]:
+    cursor.execute(PARTITIONS_SQL, [list(TABLES)])
+    partitions = []
+    for table, name, bound, rows, total_bytes, index_bytes in cursor.fetchall():
+        match = _BOUND_RE.search(bound or "")
+        lower, upper = (datetime.fromisoformat(match[1]), datetime.fromisoformat(match[2])) if match else (None, None)
+        partitions.append(Partition(table, name, lower, upper, max(rows, 0), total_bytes, index_bytes))
+    return partitions
+
+
+def create_partitions(cursor, start: datetime, end: datetime, *, parent_suffix: str = "") -> list[str]:
+    """Create the monthly partitions covering ``start``..``end`` that do not exist yet."""
+    cursor.execute(
+        "SELECT relname FROM pg_class WHERE relname LIKE 'shop_order%%' AND relkind = 'r'",
+        [],
+    )
+    existing = {name for (name,) in cursor.fetchall()}
+    created = []
+    month = month_start(start)
+    while month <= end:
+        upper = add_months(month, 1)
+        for table in TABLES:
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{table}{parent_suffix}" FOR VALUES FROM (%s) TO (%s)',
+                [month, upper],
+            )
+            created.append(name)
+        month = upper
+    return created
+
+
+def _columns(cursor, table: str) -> list[str]:
+    cursor.execute(
+        "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped "
+        "ORDER BY attnum",
+        [table],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def _index_definitions(cursor, table: str) -> list[str]:
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid), indisunique FROM pg_index "
+        "WHERE indrelid = %s::regclass AND NOT indisprimary",
+        [table],
+    )
+    rows = cursor.fetchall()
+    unique = [indexdef for indexdef, is_unique in rows if is_unique]
+    if unique:
+        msg = f"{table} has unique indexes without the partition key: {'; '.join(unique)}"
+        raise ValueError(msg)
+    return [indexdef for indexdef, _unique in rows]
+
+
+def _foreign_keys(cursor, table: str) -> list[tuple[str, str]]:
+    """Foreign keys of ``table`` except those referencing shop_order."""
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f' AND confrelid <> 'shop_order'::regclass",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _triggers(cursor, table: str) -> list[str]:
+    """CREATE TRIGGER statements of ``table``'s user triggers (``LIKE`` does not copy them)."""
+    cursor.execute(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal "
+        "ORDER BY tgname",
+        [table],
+    )
+    return [definition for (definition,) in cursor.fetchall()]
+
+
+def _now(cursor) -> datetime:
+    cursor.execute("SELECT now()")
+    return cursor.fetchone()[0]
+
+
+def convert(connection, months_ahead: int = 3) -> list[str]:
+    """Rebuild shop_order/shop_orderitem as partitioned tables, copying all rows.
+
+    Runs in one transaction holding ACCESS EXCLUSIVE locks on both tables for
+    the duration of the copy: a maintenance operation, not an online one.
+    Returns the partitions created.
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        if is_partitioned(cur):
+            msg = "shop_order is already partitioned."
+            raise ValueError(msg)
+        cur.execute("LOCK TABLE shop_order, shop_orderitem IN ACCESS EXCLUSIVE MODE")
+        indexes = {table: _index_definitions(cur, table) for table in TABLES}
+        foreign_keys = {table: _foreign_keys(cur, table) for table in TABLES}
+        columns = {table: _columns(cur, table) for table in TABLES}
+        triggers = {table: _triggers(cur, table) for table in TABLES}
+
+        for table, key in PARTITION_KEYS.items():
+            cur.execute(
+                f'CREATE TABLE "{table}_part" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING STORAGE) '
+                f'PARTITION BY RANGE ("{key}")',
+            )
+        cur.execute('ALTER TABLE "shop_orderitem_part" ALTER "order_created_at" SET NOT NULL')
+
+        cur.execute("SELECT min(created_at), max(created_at) FROM shop_order")
+        oldest, newest = cur.fetchone()
+        now = _now(cur)
+        created = create_partitions(
+            cur,
+            min(oldest or now, now),
+            add_months(max(newest or now, now), months_ahead),
+            parent_suffix="_part",
+        )
+
+        order_columns = ", ".join(f'"{c}"' for c in columns["shop_order"])
+        cur.execute(f'INSERT INTO "shop_order_part" ({order_columns}) SELECT {order_columns} FROM "shop_order"')
+        item_columns = ", ".join(f'"{c}"' for c in columns["shop_orderitem"])
+        item_select = ", ".join(
+            "o.created_at" if c == "order_created_at" else f'oi."{c}"' for c in columns["shop_orderitem"]
+        )
+        cur.execute(
+            f'INSERT INTO "shop_orderitem_part" ({item_columns}) SELECT {item_select} '
+            'FROM "shop_orderitem" oi JOIN "shop_order" o ON o.id = oi.order_id',
+        )
+
+        cur.execute('DROP TABLE "shop_orderitem", "shop_order"')
+        for table, key in PARTITION_KEYS.items():
+            cur.execute(f'ALTER TABLE "{table}_part" RENAME TO "{table}"')
+            # Identity columns on partitioned tables need PostgreSQL 17; use an owned sequence.
+            cur.execute(f'CREATE SEQUENCE "{table}_id_seq" AS bigint OWNED BY "{table}"."id"')
+            cur.execute(f"SELECT setval('{table}_id_seq', COALESCE((SELECT max(id) FROM \"{table}\"), 0) + 1, false)")
+            cur.execute(f'ALTER TABLE "{table}" ALTER "id" SET DEFAULT nextval(\'{table}_id_seq\')')
+            cur.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY ("id", "{key}")')
+            for indexdef in indexes[table]:
+                cur.execute(indexdef)
+            for name, definition in foreign_keys[table]:
+                cur.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+            for definition in triggers[table]:
+                cur.execute(definition)
+        cur.execute(
+            f'ALTER TABLE "shop_orderitem" ADD CONSTRAINT "{ORDER_FK_NAME}" '
+            'FOREIGN KEY ("order_id", "order_created_at") REFERENCES "shop_order" ("id", "created_at") '
+            "DEFERRABLE INITIALLY DEFERRED",
+        )
+        cur.execute("ANALYZE shop_order, shop_orderitem")
+    return created
+
+
+def detach_partition(connection, partition: Partition, *, drop: bool = False):
+    """Detach (and optionally drop) one month of orders or items without blocking traffic.
+
+    Detach items before their orders: detaching an order partition checks that
+    no item still references it, so the detached items' copy of the foreign key
+    is dropped first.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cur:
+        cur.execute(f"ALTER TABLE {quote(partition.table)} DETACH PARTITION {quote(partition.name)} CONCURRENTLY")
+        if partition.table == "shop_orderitem":
+            cur.execute(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND confrelid = 'shop_order'::regclass",
+                [partition.name],
+            )
+            for (name,) in cur.fetchall():
+                cur.execute(f"ALTER TABLE {quote(partition.name)} DROP CONSTRAINT {quote(name)}")
+        if drop:
+            cur.execute(f"DROP TABLE {quote(partition.name)}")
+    logger.info("%s partition %s", "Dropped" if drop else "Detached", partition.name)
+
+
+def expired(partitions: list[Partition], now: datetime, retain_months: int) -> list[Partition]:
+    """Partitions entirely older than ``retain_months`` full months before ``now``, items first."""
+    cutoff = add_months(month_start(now), -retain_months)
+    old = [p for p in partitions if p.upper is not None and p.upper <= cutoff]
+    return sorted(old, key=lambda p: (p.lower, p.table != "shop_orderitem"))
+
+
+def ensure_partitions(cursor, start: datetime, end: datetime) -> list[str]:
+    """Create missing partitions for ``start``..``end`` if the tables are partitioned."""
+    if not is_partitioned(cursor):
+        return []
+    return create_partitions(cursor, start, end)
@@ -0,0 +1,210 @@
+"""Capture which index a query actually uses, via ``EXPLAIN (ANALYZE, FORMAT JSON)``.
+
+Plans are cached by query fingerprint (the SQL text with placeholders, i.e. the
+query shape without parameter values), so each distinct shape is explained
+once no matter how often the workload runs it. Plans of partitioned tables
+name the partitions' indexes; ``PlanCache`` also records the indexes they are
+attached to, which are the ones operations expect.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from fnmatch import fnmatch
+
+from django.db import connections
+from django.db.models import QuerySet
+
+# Estimated and actual rows further apart than this are flagged as a misestimate.
+MISESTIMATE_FACTOR = 10
+
+ANCESTORS_SQL = """
+SELECT ic.relname, a.relname
+FROM pg_class ic
+CROSS JOIN LATERAL pg_partition_ancestors(ic.oid) WITH ORDINALITY AS p(relid, depth)
+JOIN pg_class a ON a.oid = p.relid
+WHERE ic.relname = ANY(%s)
+  AND a.oid <> ic.oid
+ORDER BY ic.relname, p.depth
+"""
+
+
+def fingerprint(queryset: QuerySet) -> str:
+    sql, _params = queryset.query.sql_with_params()
+    return hashlib.sha1(" ".join(sql.split()).encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class ScanNode:
+    node_type: str
+    relation: str
+    index: str
+    plan_rows: float
+    actual_rows: float | None
+    # Index Only Scan rows that had to visit the heap (page not all-visible).
+    heap_fetches: float | None = None
+
+    @property
+    def misestimated(self) -> bool:
+        if self.actual_rows is None:
+            return False
+        low, high = sorted((max(self.plan_rows, 1), max(self.actual_rows, 1)))
+        return high / low > MISESTIMATE_FACTOR
+
+    def __str__(self) -> str:
+        target = self.index or self.relation
+        actual = "?" if self.actual_rows is None else f"{self.actual_rows:g}"
+        fetches = "" if self.heap_fetches is None else f", heap fetches {self.heap_fetches:g}"
+        return f"{self.node_type} {target} (est {self.plan_rows:g} / actual {actual}{fetches})"
+
+
+@dataclass
+class PlanSummary:
+    fingerprint: str
+    sql: str
+    total_cost: float
+    execution_ms: float | None
+    scans: list[ScanNode] = field(default_factory=list)
+    # Partition index name -> the partitioned indexes it is attached to, innermost first.
+    ancestors: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    @property
+    def indexes(self) -> list[str]:
+        return [scan.index for scan in self.scans if scan.index]
+
+    @property
+    def seq_scans(self) -> list[str]:
+        return [scan.relation for scan in self.scans if scan.node_type == "Seq Scan"]
+
+    def verdict(self, expected: tuple[str, ...]) -> str:
+        """``ok`` when an expected index is used, else what the planner did instead."""
+        names = [name for index in self.indexes for name in (index, *self.ancestors.get(index, ()))]
+        if any(fnmatch(name, pattern) for name in names for pattern in expected):
+            return "ok"
+        if self.seq_scans:
+            return "SEQ SCAN"
+        if not expected:
+            return "ok"
+        return "UNEXPECTED INDEX" if self.indexes else "NO INDEX"
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _walk(child)
+
+
+def index_ancestors(cursor, names: list[str]) -> dict[str, tuple[str, ...]]:
+    """The partitioned indexes each of ``names`` is attached to; plain indexes are left out."""
+    if not names:
+        return {}
+    cursor.execute(ANCESTORS_SQL, [sorted(set(names))])
+    result: dict[str, tuple[str, ...]] = {}
+    for name, ancestor in cursor.fetchall():
+        result[name] = (*result.get(name, ()), ancestor)
+    return result
+
+
+def summarize_plan(explain_output, *, sql: str = "", fingerprint: str = "") -> PlanSummary:
+    """Reduce ``EXPLAIN (FORMAT JSON)`` output to the scans that matter for index choice."""
+    if isinstance(explain_output, str):
+        explain_output = json.loads(explain_output)
+    if isinstance(explain_output, list):
+        explain_output = explain_output[0]
+    root = explain_output["Plan"]
+    scans = []
+    for node in _walk(root):
+        if "Index Name" not in node and node["Node Type"] != "Seq Scan":
+            continue
+        actual = node.get("Actual Rows")
+        if actual is not None:
+            # Per-loop average in the plan; report the total.
+            actual = actual * node.get("Actual Loops", 1)
+        scans.append(
+            ScanNode(
+                node_type=node["Node Type"],
+                relation=node.get("Relation Name", ""),
+                index=node.get("Index Name", ""),
+                plan_rows=node.get("Plan Rows", 0),
+                actual_rows=actual,
+                heap_fetches=node.get("Heap Fetches"),
+            ),
+        )
+    return PlanSummary(
+        fingerprint=fingerprint,
+        sql=sql,
+        total_cost=root.get("Total Cost", 0.0),
+        execution_ms=explain_output.get("Execution Time"),
+        scans=scans,
+    )
+
+
+class PlanCache:
+    """Explain each query shape once and remember which operation produced it."""
+
+    def __init__(self, *, analyze: bool = True):
+        self.analyze = analyze
+        self.plans: dict[str, PlanSummary] = {}
+        self.by_operation: dict[str, list[str]] = {}
+
+    def capture(self, operation: str, queryset: QuerySet) -> PlanSummary:
+        key = fingerprint(queryset)
+        fingerprints = self.by_operation.setdefault(operation, [])
+        if key not in fingerprints:
+            fingerprints.append(key)
+        if key not in self.plans:
+            sql, _params = queryset.query.sql_with_params()
+            output = queryset.explain(format="json", analyze=self.analyze)
+            summary = summarize_plan(output, sql=sql, fingerprint=key)
+            with connections[queryset.db].cursor() as cur:
+                summary.ancestors = index_ancestors(cur, summary.indexes)
+            self.plans[key] = summary
+        return self.plans[key]
+
+
+@dataclass
+class HeapFetchStats:
+    samples: int = 0
+    index_only_scans: int = 0
+    rows: float = 0.0
+    heap_fetches: float = 0.0
+    indexes: set[str] = field(default_factory=set)
+
+    @property
+    def fetch_pct(self) -> float:
+        """Share of index-only rows that still visited the heap."""
+        return 100.0 * self.heap_fetches / self.rows if self.rows else 0.0
+
+
+class HeapFetchSampler:
+    """``EXPLAIN ANALYZE`` every ``every``-th call of each operation and sum its
+    Index Only Scan heap fetches.
+
+    Unlike ``PlanCache`` this re-explains the same query shape over time, so it
+    shows index-only scans degrading as writes clear visibility-map bits and
+    recovering after VACUUM.
+    """
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+        self.calls: Counter[str] = Counter()
+        self.stats: dict[str, HeapFetchStats] = {}
+
+    def sample(self, operation: str, queryset: QuerySet) -> PlanSummary | None:
+        self.calls[operation] += 1
+        if self.calls[operation] % self.every:
+            return None
+        plan = summarize_plan(queryset.explain(format="json", analyze=True))
+        stats = self.stats.setdefault(operation, HeapFetchStats())
+        stats.samples += 1
+        for scan in plan.scans:
+            if scan.node_type == "Index Only Scan":
+                stats.index_only_scans += 1
+                stats.rows += scan.actual_rows or 0
+                stats.heap_fetches += scan.heap_fetches or 0
+                stats.indexes.add(scan.index)
+        return plan
@@ -0,0 +1,207 @@
+"""ORM-side query fingerprinting and a simple index advisor.
+
+``QueryProfiler`` is installed with ``connection.execute_wrapper`` and sees
+every statement Django sends. Statements are fingerprinted by their SQL text
+(Django keeps parameters out of it, so the text is the query shape) and
+aggregated into a bounded table: call count, time, and the columns each shape
+filters and sorts on. ``advise`` matches those access patterns against the
+existing shop indexes to propose missing ones and to tell which are needed.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from dataclasses import field
+
+from goodvibes.shop.index_report import IndexKeys
+
+MAX_FINGERPRINTS = 500
+
+_FROM_RE = re.compile(r'\bFROM "(\w+)"')
+_COLUMN_RE = re.compile(r'(?:(\w+)\()?"(\w+)"\."(\w+)"')
+_WHERE_RE = re.compile(r"\bWHERE\b(.*?)(?=\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|$)", re.S)
+_ORDER_RE = re.compile(r"\bORDER BY\b(.*?)(?=\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|$)", re.S)
+_IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+# pg_get_indexdef() decorations that the ORM's SQL does not have.
+_INDEX_KEY_NOISE_RE = re.compile(r"::\w+|[()\s]")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and variable-length ``IN (%s, ...)`` lists."""
+    return _IN_LIST_RE.sub("IN (...)", " ".join(sql.split()))
+
+
+def _columns(clause: str) -> list[tuple[str, str]]:
+    """``(table, expression)`` for each qualified column in ``clause``, e.g. ``upper(email)``."""
+    result = []
+    for func, table, column in _COLUMN_RE.findall(clause):
+        expr = f"{func.lower()}({column})" if func else column
+        if (table, expr) not in result:
+            result.append((table, expr))
+    return result
+
+
+def _normalize_index_key(key: str) -> str:
+    # "lower((email)::text)" -> "lower(email)"; "customer_id" stays as is.
+    match = re.fullmatch(r"(\w+)\((.*)\)", key)
+    if match:
+        return f"{match.group(1).lower()}({_INDEX_KEY_NOISE_RE.sub('', match.group(2))})"
+    return _INDEX_KEY_NOISE_RE.sub("", key).strip('"')
+
+
+@dataclass
+class QueryStats:
+    fingerprint: str
+    table: str
+    filters: tuple[tuple[str, str], ...]
+    sorts: tuple[tuple[str, str], ...]
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+class QueryProfiler:
+    """``execute_wrapper`` callable aggregating statements by fingerprint.
+
+    At most ``max_fingerprints`` shapes are tracked; statements with a new shape
+    beyond that are only counted in ``overflow_calls``/``overflow_ms``.
+    """
+
+    def __init__(self, max_fingerprints: int = MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.stats: dict[str, QueryStats] = {}
+        self.overflow_calls = 0
+        self.overflow_ms = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, (time.perf_counter() - started) * 1000)
+
+    def record(self, sql: str, elapsed_ms: float):
+        if sql.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        fingerprint = normalize_sql(sql)
+        with self._lock:
+            stats = self.stats.get(fingerprint)
+            if stats is None:
+                if len(self.stats) >= self.max_fingerprints:
+                    self.overflow_calls += 1
+                    self.overflow_ms += elapsed_ms
+                    return
+                stats = self.stats[fingerprint] = self._parse(fingerprint)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+
+    def top(self, limit: int = 10) -> list[QueryStats]:
+        return sorted(self.stats.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+
+    @staticmethod
+    def _parse(fingerprint: str) -> QueryStats:
+        table = _FROM_RE.search(fingerprint)
+        where = _WHERE_RE.search(fingerprint)
+        order = _ORDER_RE.search(fingerprint)
+        return QueryStats(
+            fingerprint=fingerprint,
+            table=table.group(1) if table else "",
+            filters=tuple(_columns(where.group(1))) if where else (),
+            sorts=tuple(_columns(order.group(1))) if order else (),
+        )
+
+
+@dataclass
+class Proposal:
+    table: str
+    columns: tuple[str, ...]
+    calls: int
+    total_ms: float
+    examples: list[str] = field(default_factory=list)
+
+    @property
+    def sql(self) -> str:
+        keys = ", ".join(f"({c})" if "(" in c else c for c in self.columns)
+        return f"CREATE INDEX CONCURRENTLY ON {self.table} ({keys});"
+
+
+@dataclass
+class Advice:
+    proposals: list[Proposal]
+    # index name -> (calls, total_ms) of the query shapes it is the best match for
+    needed: dict[str, tuple[int, float]]
+    not_needed: list[str]
+
+
+def _matched_prefix(index_keys: tuple[str, ...], filters: set[str], sorts: list[str]) -> int:
+    """How many leading index keys the query can use: equality/IS NULL filters first, then sorts."""
+    matched = 0
+    keys = list(index_keys)
+    while matched < len(keys) and keys[matched] in filters:
+        matched += 1
+    sort_pos = 0
+    while matched < len(keys) and sort_pos < len(sorts) and keys[matched] == sorts[sort_pos]:
+        matched += 1
+        sort_pos += 1
+    return matched
+
+
+def advise(stats: list[QueryStats], indexes: list[IndexKeys], *, tables_prefix: str = "shop_") -> Advice:
+    """Match profiled access patterns against existing indexes.
+
+    For every query shape on a ``tables_prefix`` table, the index covering the
+    longest prefix of (filtered columns, then sort columns) is "needed"; a
+    shape no index can serve yields a proposal. Indexes that serve no profiled
+    shape are listed as not needed, except unique ones (they back constraints).
+    """
+    by_table: dict[str, list[tuple[IndexKeys, tuple[str, ...]]]] = defaultdict(list)
+    for index in indexes:
+        by_table[index.table].append((index, tuple(_normalize_index_key(k) for k in index.keys)))
+
+    needed: dict[str, tuple[int, float]] = {}
+    proposals: dict[tuple[str, tuple[str, ...]], Proposal] = {}
+    for query in stats:
+        if not query.table.startswith(tables_prefix):
+            continue
+        filters = [expr for table, expr in query.filters if table == query.table]
+        sorts = [expr for table, expr in query.sorts if table == query.table]
+        if not filters and not sorts:
+            continue
+        # Longest usable prefix wins; ties go to unique, then partial, then narrower indexes.
+        best, best_rank = None, None
+        for index, keys in by_table.get(query.table, []):
+            length = _matched_prefix(keys, set(filters), sorts)
+            rank = (length, index.unique, bool(index.predicate), -len(keys))
+            if length and (best_rank is None or rank > best_rank):
+                best, best_rank = index, rank
+        if best is not None:
+            calls, total_ms = needed.get(best.name, (0, 0.0))
+            needed[best.name] = (calls + query.calls, total_ms + query.total_ms)
+            continue
+        columns = tuple(filters + [c for c in sorts if c not in filters])
+        proposal = proposals.setdefault((query.table, columns), Proposal(query.table, columns, 0, 0.0))
+        proposal.calls += query.calls
+        proposal.total_ms += query.total_ms
+        if len(proposal.examples) < 3:
+            proposal.examples.append(query.fingerprint)
+
+    not_needed = sorted(
+        index.name
+        for index in indexes
+        if index.table.startswith(tables_prefix) and not index.unique and index.name not in needed
+    )
+    return Advice(
+        proposals=sorted(proposals.values(), key=lambda p: p.total_ms, reverse=True),
+        needed=needed,
+        not_needed=not_needed,
+    )
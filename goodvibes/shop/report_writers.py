@@ -0,0 +1,202 @@
+"""Output formats for ``report_indexes``.
+
+Every writer consumes ``IndexRow`` objects one at a time: ``begin()``, then
+``row()`` per index, then ``end()``. Nothing but the current row is kept in
+memory, except for the Prometheus writer which spools each metric family to a
+temporary file because the exposition format requires samples of one family
+to be contiguous.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import tempfile
+
+from goodvibes.shop.index_report import IndexRow
+
+MB = 1024 * 1024
+
+CSV_FIELDS = [
+    "schema",
+    "table",
+    "index",
+    "indexdef",
+    "idx_scan",
+    "scans_by_database",
+    "idx_tup_read",
+    "idx_tup_fetch",
+    "size_bytes",
+    "bloat_bytes",
+    "bloat_pct",
+    "redundancy",
+    "ins_per_sec",
+    "upd_per_sec",
+    "del_per_sec",
+    "non_hot_pct",
+    "growth_bytes_per_sec",
+    "write_bytes_per_sec",
+    "idx_blks_hit",
+    "idx_blks_read",
+    "idx_hit_pct",
+    "heap_blks_hit",
+    "heap_blks_read",
+    "heap_hit_pct",
+    "buffered_bytes",
+    "flags",
+]
+
+
+class TableWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        header = (
+            f"{'schema':<10} {'table':<18} {'index':<34} {'scan':>8} {'tup_read':>10} {'size_mb':>8} "
+            f"{'bloat_mb':>8} {'bloat%':>6} {'wr_kb/s':>8} {'hit%':>6} {'buf_mb':>7}  flags"
+        )
+        self.out.write(header)
+        self.out.write("-" * len(header))
+
+    def row(self, r: IndexRow):
+        if r.bloat_bytes is not None:
+            bloat_cols = f"{r.bloat_bytes / MB:>8.1f} {r.bloat_pct:>6.1f}"
+        else:
+            bloat_cols = f"{'-':>8} {'-':>6}"
+        if r.write_bytes_per_sec is not None:
+            write_col = f"{r.write_bytes_per_sec / 1024:>8.1f}"
+        else:
+            write_col = f"{'-':>8}"
+        hit_col = f"{r.idx_hit_pct:>6.1f}" if r.idx_hit_pct is not None else f"{'-':>6}"
+        buf_col = f"{r.buffered_bytes / MB:>7.1f}" if r.buffered_bytes is not None else f"{'-':>7}"
+        self.out.write(
+            f"{r.schema:<10} {r.table:<18} {r.index:<34} {r.idx_scan:>8} {r.idx_tup_read:>10} "
+            f"{r.size_bytes / MB:>8.1f} {bloat_cols} {write_col} {hit_col} {buf_col}  {' '.join(r.flags)}",
+        )
+
+    def end(self):
+        pass
+
+
+class JsonWriter:
+    """A JSON array written incrementally, one object per line."""
+
+    def __init__(self, out):
+        self.out = out
+        self.first = True
+
+    def begin(self):
+        self.out.write("[", ending="")
+
+    def row(self, r: IndexRow):
+        prefix = "\n" if self.first else ",\n"
+        self.first = False
+        data = {name: getattr(r, name) for name in CSV_FIELDS}
+        self.out.write(prefix + json.dumps(data), ending="")
+
+    def end(self):
+        self.out.write("\n]" if not self.first else "]")
+
+
+class CsvWriter:
+    def __init__(self, out):
+        self.writer = csv.writer(out, lineterminator="\n")
+
+    def begin(self):
+        self.writer.writerow(CSV_FIELDS)
+
+    def row(self, r: IndexRow):
+        values = [getattr(r, name) for name in CSV_FIELDS]
+        values[CSV_FIELDS.index("scans_by_database")] = ";".join(
+            f"{alias}={scans}" for alias, scans in r.scans_by_database.items()
+        )
+        values[-1] = " ".join(r.flags)
+        self.writer.writerow(["" if v is None else v for v in values])
+
+    def end(self):
+        pass
+
+
+class PrometheusWriter:
+    """Prometheus text exposition format (version 0.0.4)."""
+
+    # (metric name, type, help, IndexRow attribute or callable)
+    METRICS = [
+        ("goodvibes_index_info", "gauge", "Index definition and redundancy classification.", lambda r: 1),
+        ("goodvibes_index_scans_total", "counter", "Index scans initiated on the index.", "idx_scan"),
+        ("goodvibes_index_tuples_read_total", "counter", "Index entries returned by scans.", "idx_tup_read"),
+        ("goodvibes_index_tuples_fetched_total", "counter", "Live heap rows fetched by index scans.", "idx_tup_fetch"),
+        ("goodvibes_index_size_bytes", "gauge", "On-disk size of the index.", "size_bytes"),
+        ("goodvibes_index_bloat_bytes", "gauge", "Estimated reclaimable bytes in the index.", "bloat_bytes"),
+        (
+            "goodvibes_index_write_bytes_per_second",
+            "gauge",
+            "Estimated bytes written per second to maintain the index.",
+            "write_bytes_per_sec",
+        ),
+        ("goodvibes_index_blocks_hit_total", "counter", "Index blocks found in shared_buffers.", "idx_blks_hit"),
+        (
+            "goodvibes_index_blocks_read_total",
+            "counter",
+            "Index blocks read from outside shared_buffers.",
+            "idx_blks_read",
+        ),
+        (
+            "goodvibes_index_buffered_bytes",
+            "gauge",
+            "Bytes of the index currently in shared_buffers (pg_buffercache).",
+            "buffered_bytes",
+        ),
+        (
+            "goodvibes_index_unused",
+            "gauge",
+            "1 if the index had no scans in the window.",
+            lambda r: int(r.idx_scan == 0),
+        ),
+    ]
+
+    def __init__(self, out):
+        self.out = out
+        self.spools = []
+
+    def begin(self):
+        self.spools = [tempfile.SpooledTemporaryFile(max_size=MB, mode="w+") for _ in self.METRICS]  # noqa: SIM115
+
+    def row(self, r: IndexRow):
+        labels = {"schema": r.schema, "table": r.table, "index": r.index}
+        info_labels = {**labels, "redundancy": r.redundancy, "definition": r.indexdef}
+        for i, ((name, _type, _help, source), spool) in enumerate(zip(self.METRICS, self.spools, strict=True)):
+            value = source(r) if callable(source) else getattr(r, source)
+            if value is None:
+                continue
+            if name == "goodvibes_index_scans_total":
+                # Per-database breakdown so replicas can be told apart.
+                for alias, scans in r.scans_by_database.items():
+                    spool.write(f"{name}{{{_labels({**labels, 'database': alias})}}} {scans}\n")
+                continue
+            spool.write(f"{name}{{{_labels(info_labels if i == 0 else labels)}}} {value}\n")
+
+    def end(self):
+        for (name, type_, help_, _source), spool in zip(self.METRICS, self.spools, strict=True):
+            self.out.write(f"# HELP {name} {help_}")
+            self.out.write(f"# TYPE {name} {type_}")
+            spool.seek(0)
+            for line in spool:
+                self.out.write(line, ending="")
+            spool.close()
+
+
+def _labels(labels: dict[str, str]) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+WRITERS = {
+    "table": TableWriter,
+    "json": JsonWriter,
+    "csv": CsvWriter,
+    "prometheus": PrometheusWriter,
+}
@@ -0,0 +1,334 @@
+"""Local store of workload runs and regression checks between them.
+
+Every ``simulate_load``/``generate_bloat``/``run_scenario`` run appends one
+JSON line to ``RESULTS_FILE`` with the environment (server settings, applied
+shop migrations, git revision), a fingerprint of the dataset, the command's
+parameters and metrics, and enough raw data for statistics: the ops completed
+in each second and a sample of latencies, overall and per operation.
+
+``compare`` bootstraps the change in throughput (mean ops/s over the
+per-second series) and in p99 latency between a baseline and a candidate
+(each one run or several pooled runs). A change is flagged when the whole
+confidence interval lies beyond ``min_change_pct`` in the bad (or good)
+direction, so noise between two identical runs is not reported.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import subprocess
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+from goodvibes.shop import scenario
+from goodvibes.shop.load_stats import LoadStats
+from goodvibes.shop.load_stats import percentile
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+
+RESULTS_FILE = Path("benchmark-results/runs.jsonl")
+
+# Latency samples stored per run (evenly thinned from the LoadStats reservoir).
+STORED_SAMPLES = 2000
+STORED_OPERATION_SAMPLES = 500
+
+# BaseCommand options that say nothing about the workload.
+_BASE_OPTIONS = {
+    "verbosity",
+    "settings",
+    "pythonpath",
+    "traceback",
+    "no_color",
+    "force_color",
+    "skip_checks",
+    "stdout",
+    "stderr",
+    "no_record",
+    "results_file",
+    "label",
+}
+
+ESTIMATED_ROWS_SQL = """
+SELECT COALESCE(sum(GREATEST(c.reltuples, 0)), 0)::bigint
+FROM pg_partition_tree(%s::regclass) t
+JOIN pg_class c ON c.oid = t.relid
+WHERE t.isleaf
+"""
+
+# Scenario steps may record from several threads at once.
+_write_lock = threading.Lock()
+
+
+def add_record_arguments(parser):
+    parser.add_argument("--label", default="", help="Label stored with the run in the result store")
+    parser.add_argument(
+        "--results-file",
+        type=Path,
+        default=RESULTS_FILE,
+        help=f"JSON-lines result store (default: {RESULTS_FILE})",
+    )
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the result store")
+
+
+def dataset_fingerprint() -> dict:
+    """Id ranges and estimated row counts of the shop tables; equal hashes mean comparable data.
+
+    Nothing is counted: the id ranges come from the primary keys and the row
+    counts are the planner's ``reltuples`` (summed over partitions). Only the
+    id ranges are hashed, as the estimates move with every ANALYZE.
+    """
+    tables = {}
+    with connection.cursor() as cur:
+        for model in (Product, Customer, Order, OrderItem):
+            table = model._meta.db_table
+            cur.execute(ESTIMATED_ROWS_SQL, [table])
+            estimated = cur.fetchone()[0]
+            ids = model.objects.order_by("pk").values_list("pk", flat=True)
+            tables[table] = {"min_id": ids.first() or 0, "max_id": ids.last() or 0, "estimated_rows": estimated}
+    ranges = {table: [t["min_id"], t["max_id"]] for table, t in tables.items()}
+    digest = hashlib.sha1(json.dumps(ranges, sort_keys=True).encode(), usedforsecurity=False).hexdigest()
+    return {"tables": tables, "hash": digest[:12]}
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return out.stdout.strip()
+
+
+def run_environment() -> dict:
+    env = scenario.environment()
+    applied = MigrationRecorder(connection).applied_migrations()
+    env["shop_migration"] = max((name for app, name in applied if app == "shop"), default="")
+    env["git"] = _git_revision()
+    return env
+
+
+def _thin(values: list[float], limit: int) -> list[float]:
+    if len(values) > limit:
+        step = len(values) / limit
+        values = [values[int(i * step)] for i in range(limit)]
+    return [round(v * 1000, 4) for v in values]
+
+
+def record_run(
+    kind: str,
+    options: dict,
+    metrics: dict,
+    stats: LoadStats | None = None,
+    *,
+    dataset: dict | None = None,
+    runs: list[str] | None = None,
+) -> dict:
+    """Append a run to ``options['results_file']`` and return it.
+
+    ``dataset`` is the fingerprint taken before the run (taken now if not
+    given); ``runs`` lists the ids of runs recorded by a scenario's steps.
+    """
+    run = {
+        "id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "label": options.get("label", ""),
+        "recorded_at": timezone.now().isoformat(),
+        "environment": run_environment(),
+        "dataset": dataset or dataset_fingerprint(),
+        "parameters": {k: v for k, v in options.items() if k not in _BASE_OPTIONS},
+        "metrics": metrics,
+    }
+    if runs is not None:
+        run["runs"] = runs
+    if stats is not None:
+        run["series"] = {
+            "ops_per_second": stats.throughput_series(),
+            "latency_ms": _thin(stats.overall.samples, STORED_SAMPLES),
+            "operations": {name: _thin(op.samples, STORED_OPERATION_SAMPLES) for name, op in stats.operations.items()},
+        }
+    path = Path(options.get("results_file") or RESULTS_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(run, default=str) + "\n"
+    with _write_lock, path.open("a") as f:
+        f.write(line)
+    return run
+
+
+def load_runs(path: Path = RESULTS_FILE) -> list[dict]:
+    if not path.exists():
+        return []
+    with path.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def select_runs(runs: list[dict], ref: str, kind: str = "") -> list[dict]:
+    """Runs matching ``ref``: a run id (or unique prefix), a label (all its runs), or 'latest'.
+
+    Scenario runs expand to the runs their steps recorded; ``kind`` then keeps
+    only runs of one command (e.g. ``simulate_load``).
+    """
+    if ref == "latest":
+        matched = [run for run in runs if not kind or run["kind"] in (kind, "scenario")][-1:]
+    else:
+        matched = [run for run in runs if run["label"] == ref]
+        if not matched:
+            matched = [run for run in runs if run["id"].startswith(ref)]
+            if len(matched) > 1:
+                msg = f"Run id prefix {ref!r} is ambiguous."
+                raise ValueError(msg)
+    if not matched:
+        msg = f"No run with id or label {ref!r}."
+        raise ValueError(msg)
+
+    by_id = {run["id"]: run for run in runs}
+    selected = []
+    for run in matched:
+        if run["kind"] == "scenario":
+            selected.extend(by_id[child] for child in run.get("runs", []) if child in by_id)
+        else:
+            selected.append(run)
+    if kind:
+        selected = [run for run in selected if run["kind"] == kind]
+    if not selected:
+        msg = f"No {kind or 'workload'} runs recorded for {ref!r}."
+        raise ValueError(msg)
+    return selected
+
+
+@dataclass(frozen=True)
+class Comparison:
+    metric: str
+    baseline: float
+    candidate: float
+    # Relative change of the candidate and its confidence interval, in percent.
+    change_pct: float
+    low_pct: float
+    high_pct: float
+    higher_is_better: bool
+    verdict: str
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+def _p99(values):
+    return percentile(values, 99)
+
+
+def bootstrap_change(
+    baseline: list[float],
+    candidate: list[float],
+    statistic,
+    *,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    rng: random.Random,
+) -> tuple[float, float, float, float, float]:
+    """Point estimates and a percentile-bootstrap interval of the relative change."""
+    base, cand = statistic(baseline), statistic(candidate)
+    changes = []
+    for _ in range(resamples):
+        b = statistic(rng.choices(baseline, k=len(baseline)))
+        c = statistic(rng.choices(candidate, k=len(candidate)))
+        if b:
+            changes.append((c - b) / b * 100)
+    changes.sort()
+    if not changes or not base:
+        return base, cand, 0.0, 0.0, 0.0
+    tail = (1 - confidence) / 2
+    low = changes[int(tail * (len(changes) - 1))]
+    high = changes[int((1 - tail) * (len(changes) - 1))]
+    return base, cand, (cand - base) / base * 100, low, high
+
+
+def _verdict(low: float, high: float, *, higher_is_better: bool, min_change_pct: float) -> str:
+    if low > min_change_pct:
+        return "improvement" if higher_is_better else "regression"
+    if high < -min_change_pct:
+        return "regression" if higher_is_better else "improvement"
+    return "no change"
+
+
+def _pooled(runs: list[dict], *path: str) -> list[float]:
+    values = []
+    for run in runs:
+        data = run.get("series", {})
+        for key in path:
+            data = data.get(key, {})
+        values.extend(data or [])
+    return values
+
+
+def _pooled_keys(runs: list[dict]) -> set[str]:
+    keys = set()
+    for run in runs:
+        keys.update(run.get("series", {}).get("operations", {}))
+    return keys
+
+
+def compare(
+    baseline: list[dict],
+    candidate: list[dict],
+    *,
+    min_change_pct: float = 5.0,
+    confidence: float = 0.95,
+    resamples: int = 1000,
+    seed: int = 0,
+    min_samples: int = 5,
+) -> list[Comparison]:
+    """Compare throughput and p99 latency (overall and per operation)."""
+    rng = random.Random(seed)
+    checks = [("throughput ops/s", ("ops_per_second",), _mean, True), ("p99 ms", ("latency_ms",), _p99, False)]
+    operations = sorted(set(_pooled_keys(baseline)) & set(_pooled_keys(candidate)))
+    checks += [(f"{name} p99 ms", ("operations", name), _p99, False) for name in operations]
+
+    comparisons = []
+    for metric, path, statistic, higher_is_better in checks:
+        base_values, cand_values = _pooled(baseline, *path), _pooled(candidate, *path)
+        if len(base_values) < min_samples or len(cand_values) < min_samples:
+            base = statistic(base_values) if base_values else 0.0
+            cand = statistic(cand_values) if cand_values else 0.0
+            comparisons.append(Comparison(metric, base, cand, 0.0, 0.0, 0.0, higher_is_better, "insufficient data"))
+            continue
+        base, cand, change, low, high = bootstrap_change(
+            base_values,
+            cand_values,
+            statistic,
+            resamples=resamples,
+            confidence=confidence,
+            rng=rng,
+        )
+        verdict = _verdict(low, high, higher_is_better=higher_is_better, min_change_pct=min_change_pct)
+        comparisons.append(Comparison(metric, base, cand, change, low, high, higher_is_better, verdict))
+    return comparisons
+
+
+def differences(baseline: list[dict], candidate: list[dict]) -> list[str]:
+    """Warnings about run attributes that make a comparison questionable."""
+    warnings = []
+    for title, getter in (
+        ("dataset", lambda run: run["dataset"]["hash"]),
+        ("kind", lambda run: run["kind"]),
+        ("server settings", lambda run: run["environment"].get("settings")),
+        ("parameters", lambda run: run["parameters"]),
+    ):
+        values = {json.dumps(getter(run), sort_keys=True, default=str) for run in baseline + candidate}
+        if len(values) > 1:
+            warnings.append(f"Runs differ in {title}.")
+    return warnings
@@ -0,0 +1,194 @@
+"""Scenario files for ``run_scenario``.
+
+A scenario is a list of phases; each phase runs one management command, or
+several concurrently (``parallel``), via ``call_command``. Commands that set a
+``metrics`` attribute (``simulate_load``, ``generate_bloat``, ``report_indexes``,
+...) have it collected into the result bundle. Example (TOML)::
+
+    name = "bloat-under-load"
+
+    [[phases]]
+    command = "reset_index_stats"
+    options = { label = "start" }
+
+    [[phases]]
+    name = "load+churn"
+    parallel = [
+      { command = "simulate_load", options = { seconds = 60 } },
+      { command = "generate_bloat", options = { seconds = 60 } },
+    ]
+
+    [[phases]]
+    command = "report_indexes"
+    options = { since = "start" }
+
+JSON files use the same structure.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.core.management import call_command
+from django.core.management import get_commands
+from django.core.management import load_command_class
+from django.db import connection
+from django.db import connections
+from django.utils import timezone
+
+# Server settings recorded with every run so results stay comparable.
+SETTINGS = (
+    "server_version",
+    "shared_buffers",
+    "work_mem",
+    "maintenance_work_mem",
+    "effective_cache_size",
+    "random_page_cost",
+    "max_parallel_maintenance_workers",
+)
+
+
+class ScenarioError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Step:
+    command: str
+    options: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Phase:
+    name: str
+    steps: tuple[Step, ...]
+    # Record an index stats snapshot after the phase.
+    snapshot: bool = True
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    phases: tuple[Phase, ...]
+    output: str = ""
+
+
+def _command(name: str):
+    commands = get_commands()
+    if name not in commands:
+        msg = f"Unknown command {name!r}."
+        raise ScenarioError(msg)
+    return load_command_class(commands[name], name)
+
+
+def _step(data, where: str) -> Step:
+    if not isinstance(data, dict) or not isinstance(data.get("command"), str):
+        msg = f"{where}: expected a table with a 'command' string."
+        raise ScenarioError(msg)
+    options = data.get("options", {})
+    if not isinstance(options, dict):
+        msg = f"{where}: 'options' must be a table."
+        raise ScenarioError(msg)
+    # Validate option names up front instead of failing half-way through a run.
+    parser = _command(data["command"]).create_parser("manage.py", data["command"])
+    valid = {action.dest for action in parser._actions}
+    unknown = sorted(set(options) - valid)
+    if unknown:
+        msg = f"{where}: unknown option(s) for {data['command']}: {', '.join(unknown)}"
+        raise ScenarioError(msg)
+    return Step(data["command"], options)
+
+
+def parse_scenario(data: dict, default_name: str = "scenario") -> Scenario:
+    phases_data = data.get("phases")
+    if not isinstance(phases_data, list) or not phases_data:
+        msg = "A scenario needs a non-empty 'phases' list."
+        raise ScenarioError(msg)
+    phases = []
+    for i, phase in enumerate(phases_data, start=1):
+        where = f"phase {i}"
+        if not isinstance(phase, dict) or ("command" in phase) == ("parallel" in phase):
+            msg = f"{where}: give either 'command' or 'parallel'."
+            raise ScenarioError(msg)
+        if "parallel" in phase:
+            if not isinstance(phase["parallel"], list) or not phase["parallel"]:
+                msg = f"{where}: 'parallel' must be a non-empty list."
+                raise ScenarioError(msg)
+            steps = tuple(_step(step, f"{where}, step {j}") for j, step in enumerate(phase["parallel"], start=1))
+        else:
+            steps = (_step(phase, where),)
+        name = phase.get("name") or f"{i}-{'+'.join(step.command for step in steps)}"
+        phases.append(Phase(name, steps, bool(phase.get("snapshot", True))))
+    names = [phase.name for phase in phases]
+    if len(names) != len(set(names)):
+        msg = "Phase names must be unique."
+        raise ScenarioError(msg)
+    return Scenario(data.get("name") or default_name, tuple(phases), data.get("output", ""))
+
+
+def load_scenario(path: Path) -> Scenario:
+    if path.suffix == ".toml":
+        with path.open("rb") as f:
+            data = tomllib.load(f)
+    elif path.suffix == ".json":
+        data = json.loads(path.read_text())
+    else:
+        msg = f"Unsupported scenario file type {path.suffix!r}; use .toml or .json."
+        raise ScenarioError(msg)
+    return parse_scenario(data, default_name=path.stem)
+
+
+def run_step(step: Step) -> dict:
+    command = _command(step.command)
+    out, err = StringIO(), StringIO()
+    started = time.perf_counter()
+    result = {"command": step.command, "options": step.options}
+    try:
+        call_command(command, stdout=out, stderr=err, **step.options)
+    except Exception as exc:  # noqa: BLE001
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    result["metrics"] = getattr(command, "metrics", {})
+    result["output"] = out.getvalue()
+    if err.getvalue():
+        result["stderr"] = err.getvalue()
+    return result
+
+
+def _run_step_in_thread(step: Step) -> dict:
+    try:
+        return run_step(step)
+    finally:
+        # Each worker thread opened its own connections.
+        connections.close_all()
+
+
+def run_phase(phase: Phase) -> dict:
+    started_at = timezone.now()
+    started = time.perf_counter()
+    if len(phase.steps) == 1:
+        steps = [run_step(phase.steps[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(phase.steps), thread_name_prefix=f"phase-{phase.name}") as pool:
+            steps = list(pool.map(_run_step_in_thread, phase.steps))
+    return {
+        "name": phase.name,
+        "started_at": started_at.isoformat(),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "steps": steps,
+    }
+
+
+def environment() -> dict:
+    with connection.cursor() as cur:
+        cur.execute("SELECT name, current_setting(name) FROM pg_settings WHERE name = ANY(%s)", [list(SETTINGS)])
+        settings = dict(cur.fetchall())
+    return {"django": django.get_version(), "database": connection.settings_dict["NAME"], "settings": settings}
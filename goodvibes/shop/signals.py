@@ -0,0 +1,82 @@
+"""Keep ``goodvibes.shop.cache`` in step with product, customer and order writes."""
+
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from goodvibes.shop import cache
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import Product
+
+# Model -> (cache, field holding its key).
+CACHED_LOOKUPS = {
+    Product: (cache.product_by_sku, "sku"),
+    Customer: (cache.customer_by_email, "email"),
+}
+
+
+def _invalidate(lookup: cache.LookupCache, *keys: str | None, using: str):
+    # With the cache off there is nothing cached to invalidate.
+    if not lookup.active:
+        return
+    keys = {key for key in keys if key}
+
+    def invalidate():
+        for key in keys:
+            lookup.invalidate(key)
+
+    invalidate()
+    # Again after commit, in case a concurrent reader re-cached the old row meanwhile.
+    transaction.on_commit(invalidate, using=using)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Customer)
+def remember_cached_key(sender, instance, raw, using, update_fields, **kwargs):
+    # A changed SKU/email must also invalidate the entry under the old key.
+    lookup, field = CACHED_LOOKUPS[sender]
+    instance._cached_lookup_key = None
+    if raw or not lookup.active or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and field not in update_fields:
+        return
+    instance._cached_lookup_key = (
+        sender._default_manager.using(using).filter(pk=instance.pk).values_list(field, flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Customer)
+def invalidate_on_save(sender, instance, using, **kwargs):
+    lookup, field = CACHED_LOOKUPS[sender]
+    _invalidate(lookup, getattr(instance, field), getattr(instance, "_cached_lookup_key", None), using=using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Customer)
+def invalidate_on_delete(sender, instance, using, **kwargs):
+    lookup, field = CACHED_LOOKUPS[sender]
+    _invalidate(lookup, getattr(instance, field), using=using)
+
+
+@receiver(post_save, sender=Order)
+def update_recent_orders_on_save(sender, instance, raw, using, **kwargs):
+    # With the cache off there is nothing to keep in step; don't queue a callback per order.
+    if raw or not cache.recent_orders.active:
+        return
+    customer_id = instance.customer_id
+    order = cache.RecentOrder(instance.pk, instance.created_at, instance.cancelled_at is not None)
+    transaction.on_commit(lambda: cache.recent_orders.order_saved(customer_id, order), using=using)
+
+
+@receiver(post_delete, sender=Order)
+def update_recent_orders_on_delete(sender, instance, using, **kwargs):
+    if not cache.recent_orders.active:
+        return
+    customer_id, order_id = instance.customer_id, instance.pk
+    transaction.on_commit(lambda: cache.recent_orders.order_deleted(customer_id, order_id), using=using)
@@ -0,0 +1,191 @@
+"""Snapshot-and-diff store for per-index statistics.
+
+Instead of calling ``pg_stat_reset()`` (which wipes statistics for the whole
+database, including what autovacuum and monitoring rely on), we copy the
+cumulative counters of ``pg_stat_user_indexes``/``pg_statio_user_indexes`` into
+``IndexStatsSnapshot`` rows and report the difference later.
+"""
+
+from __future__ import annotations
+
+from django.db import connections
+from django.db import transaction
+
+from goodvibes.shop.models import IndexStatsSnapshot
+from goodvibes.shop.models import IndexStatsSnapshotEntry
+from goodvibes.shop.models import TableStatsSnapshotEntry
+
+COUNTERS = ("idx_scan", "idx_tup_read", "idx_tup_fetch", "idx_blks_read", "idx_blks_hit")
+TABLE_COUNTERS = ("n_tup_ins", "n_tup_upd", "n_tup_hot_upd", "n_tup_del", "heap_blks_read", "heap_blks_hit")
+
+# Our own bookkeeping tables also match shop_%; keep them out of index reports.
+SNAPSHOT_TABLES = (
+    IndexStatsSnapshot._meta.db_table,
+    IndexStatsSnapshotEntry._meta.db_table,
+    TableStatsSnapshotEntry._meta.db_table,
+)
+
+# Partitions' counters are recorded under the partitioned table and its index
+# (pg_partition_root), as the reports show them.
+COUNTERS_SQL = """
+SELECT
+  n.nspname,
+  c.relname,
+  ic.relname,
+  sum(s.idx_scan)::bigint,
+  sum(s.idx_tup_read)::bigint,
+  sum(s.idx_tup_fetch)::bigint,
+  COALESCE(sum(io.idx_blks_read), 0)::bigint,
+  COALESCE(sum(io.idx_blks_hit), 0)::bigint,
+  sum(pg_relation_size(s.indexrelid))::bigint
+FROM pg_stat_user_indexes s
+LEFT JOIN pg_statio_user_indexes io ON io.indexrelid = s.indexrelid
+JOIN pg_class ic ON ic.oid = COALESCE(pg_partition_root(s.indexrelid), s.indexrelid)
+JOIN pg_index i ON i.indexrelid = ic.oid
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+GROUP BY n.nspname, c.relname, ic.relname
+"""
+
+TABLE_COUNTERS_SQL = """
+SELECT
+  n.nspname,
+  c.relname,
+  sum(t.n_tup_ins)::bigint,
+  sum(t.n_tup_upd)::bigint,
+  sum(t.n_tup_hot_upd)::bigint,
+  sum(t.n_tup_del)::bigint,
+  COALESCE(sum(io.heap_blks_read), 0)::bigint,
+  COALESCE(sum(io.heap_blks_hit), 0)::bigint
+FROM pg_stat_user_tables t
+LEFT JOIN pg_statio_user_tables io ON io.relid = t.relid
+JOIN pg_class c ON c.oid = COALESCE(pg_partition_root(t.relid), t.relid)
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+GROUP BY n.nspname, c.relname
+"""
+
+
+def read_counters(cursor) -> list[tuple]:
+    """``(schema, table, index, *COUNTERS, size_bytes)`` for every shop index."""
+    cursor.execute(COUNTERS_SQL, [list(SNAPSHOT_TABLES)])
+    return cursor.fetchall()
+
+
+def take_snapshot(label: str = "", using: str = "default", databases: list[str] | None = None) -> IndexStatsSnapshot:
+    """Record counters read from ``databases`` (default: ``using``) into ``using``.
+
+    Replicas are read-only, so their counters are stored on the primary with
+    the alias they came from.
+    """
+    with connections[using].cursor() as cur:
+        cur.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+        row = cur.fetchone()
+        cur.execute(TABLE_COUNTERS_SQL, [list(SNAPSHOT_TABLES)])
+        table_rows = cur.fetchall()
+    rows_by_db = {}
+    for alias in databases or [using]:
+        with connections[alias].cursor() as cur:
+            rows_by_db[alias] = read_counters(cur)
+
+    with transaction.atomic(using=using):
+        snapshot = IndexStatsSnapshot.objects.using(using).create(label=label, stats_reset=row[0] if row else None)
+        IndexStatsSnapshotEntry.objects.using(using).bulk_create(
+            [
+                IndexStatsSnapshotEntry(
+                    snapshot=snapshot,
+                    database=alias,
+                    schema=schema,
+                    table=table,
+                    index=index,
+                    size_bytes=size_bytes,
+                    **dict(zip(COUNTERS, counters, strict=True)),
+                )
+                for alias, rows in rows_by_db.items()
+                for schema, table, index, *counters, size_bytes in rows
+            ],
+            batch_size=1000,
+        )
+        TableStatsSnapshotEntry.objects.using(using).bulk_create(
+            [
+                TableStatsSnapshotEntry(
+                    snapshot=snapshot,
+                    schema=schema,
+                    table=table,
+                    **dict(zip(TABLE_COUNTERS, counters, strict=True)),
+                )
+                for schema, table, *counters in table_rows
+            ],
+        )
+    return snapshot
+
+
+def resolve_snapshot(ref: str, using: str = "default") -> IndexStatsSnapshot:
+    """Look a snapshot up by id, by label (most recent wins) or ``latest``."""
+    qs = IndexStatsSnapshot.objects.using(using).order_by("-created_at", "-pk")
+    if ref == "latest":
+        snapshot = qs.first()
+    elif ref.isdigit():
+        snapshot = qs.filter(pk=int(ref)).first()
+    else:
+        snapshot = qs.filter(label=ref).first()
+    if snapshot is None:
+        msg = f"Index stats snapshot {ref!r} not found."
+        raise IndexStatsSnapshot.DoesNotExist(msg)
+    return snapshot
+
+
+def baseline(snapshot: IndexStatsSnapshot, database: str = "default") -> dict[tuple[str, str], dict[str, int]]:
+    """Counters recorded in ``snapshot`` for ``database`` keyed by ``(schema, index)``."""
+    entries = IndexStatsSnapshotEntry.objects.using(snapshot._state.db).filter(snapshot=snapshot, database=database)
+    return {
+        (schema, index): dict(zip((*COUNTERS, "size_bytes"), values, strict=True))
+        for schema, index, *values in entries.values_list("schema", "index", *COUNTERS, "size_bytes")
+    }
+
+
+def recorded_databases(snapshot: IndexStatsSnapshot) -> set[str]:
+    """Aliases whose index counters ``snapshot`` recorded."""
+    entries = IndexStatsSnapshotEntry.objects.using(snapshot._state.db).filter(snapshot=snapshot)
+    return set(entries.values_list("database", flat=True).distinct())
+
+
+def table_baseline(snapshot: IndexStatsSnapshot) -> dict[tuple[str, str], dict[str, int]]:
+    """Table counters (row writes, heap block I/O) recorded in ``snapshot`` keyed by ``(schema, table)``."""
+    entries = TableStatsSnapshotEntry.objects.using(snapshot._state.db).filter(snapshot=snapshot)
+    return {
+        (schema, table): dict(zip(TABLE_COUNTERS, values, strict=True))
+        for schema, table, *values in entries.values_list("schema", "table", *TABLE_COUNTERS)
+    }
+
+
+def delta(current: int, before: int | None) -> int:
+    """Counter growth since the snapshot.
+
+    Indexes created after the snapshot have no baseline, and a counter that went
+    backwards was reset in between; in both cases the current value is the best
+    available delta.
+    """
+    if before is None or current < before:
+        return current
+    return current - before
+
+
+def stats_reset_since(snapshot: IndexStatsSnapshot, using: str = "default") -> bool:
+    """Whether ``using``'s statistics were reset after ``snapshot``.
+
+    The snapshot stores ``stats_reset`` of the database it lives in only;
+    other databases (replicas) are compared with its creation time.
+    """
+    with connections[using].cursor() as cur:
+        cur.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+        row = cur.fetchone()
+    current = row[0] if row else None
+    if current is None:
+        return False
+    if using != snapshot._state.db:
+        return current > snapshot.created_at
+    return snapshot.stats_reset is None or current > snapshot.stats_reset
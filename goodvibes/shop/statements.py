@@ -0,0 +1,146 @@
+"""Per-statement server-side deltas from ``pg_stat_statements``.
+
+Counters are read before and after a workload run; the difference is what the
+run cost on the server (execution time, buffer hits/reads, WAL), to compare
+with the client-side latencies in ``load_stats.LoadStats``. Needs PostgreSQL
+13+ column names and the extension loaded via ``shared_preload_libraries``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+from dataclasses import dataclass
+
+from django.db import DatabaseError
+
+STATEMENTS_SQL = """
+SELECT
+  queryid,
+  query,
+  SUM(calls)::bigint,
+  SUM(total_exec_time),
+  SUM(shared_blks_hit)::bigint,
+  SUM(shared_blks_read)::bigint,
+  SUM(wal_bytes)::bigint
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+  AND query NOT LIKE '%%pg_stat_statements%%'
+GROUP BY queryid, query
+"""
+
+
+@dataclass(frozen=True)
+class StatementCounters:
+    query: str
+    calls: int
+    total_exec_ms: float
+    shared_blks_hit: int
+    shared_blks_read: int
+    wal_bytes: int
+
+
+@dataclass(frozen=True)
+class StatementDelta:
+    queryid: int
+    query: str
+    calls: int
+    total_exec_ms: float
+    shared_blks_hit: int
+    shared_blks_read: int
+    wal_bytes: int
+
+    @property
+    def mean_exec_ms(self) -> float:
+        return self.total_exec_ms / self.calls if self.calls else 0.0
+
+
+def read_statements(cursor) -> dict[int, StatementCounters] | None:
+    """Current counters by queryid, or None when pg_stat_statements is not usable."""
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements')")
+    if not cursor.fetchone()[0]:
+        return None
+    try:
+        cursor.execute(STATEMENTS_SQL, [])
+    except DatabaseError:
+        # Installed but not in shared_preload_libraries.
+        return None
+    return {row[0]: StatementCounters(*row[1:]) for row in cursor.fetchall()}
+
+
+def statement_deltas(
+    before: dict[int, StatementCounters],
+    after: dict[int, StatementCounters],
+) -> list[StatementDelta]:
+    """Statements that ran between the two reads, most server time first.
+
+    A statement evicted and re-added in between (or a ``pg_stat_statements_reset()``)
+    shows up with its counters since re-entry.
+    """
+    deltas = []
+    for queryid, now in after.items():
+        then = before.get(queryid)
+        if then is not None and now.calls >= then.calls:
+            values = (
+                now.calls - then.calls,
+                now.total_exec_ms - then.total_exec_ms,
+                now.shared_blks_hit - then.shared_blks_hit,
+                now.shared_blks_read - then.shared_blks_read,
+                now.wal_bytes - then.wal_bytes,
+            )
+        else:
+            values = (now.calls, now.total_exec_ms, now.shared_blks_hit, now.shared_blks_read, now.wal_bytes)
+        if values[0] > 0:
+            deltas.append(StatementDelta(queryid, now.query, *values))
+    return sorted(deltas, key=lambda d: d.total_exec_ms, reverse=True)
+
+
+def report_lines(deltas: list[StatementDelta], *, limit: int = 10, client_seconds: float | None = None) -> list[str]:
+    """Human-readable summary of ``statement_deltas`` output."""
+    lines = [
+        f"{'calls':>9} {'total_ms':>11} {'mean_ms':>8} {'blks_hit':>10} {'blks_read':>10} {'wal_kb':>9}  query",
+    ]
+    for d in deltas[:limit]:
+        query = " ".join(d.query.split())
+        lines.append(
+            f"{d.calls:>9} {d.total_exec_ms:>11.1f} {d.mean_exec_ms:>8.3f} {d.shared_blks_hit:>10} "
+            f"{d.shared_blks_read:>10} {d.wal_bytes / 1024:>9.1f}  {query[:80]}",
+        )
+    server_ms = sum(d.total_exec_ms for d in deltas)
+    if client_seconds:
+        client_ms = client_seconds * 1000
+        lines.append(
+            f"Server execution {server_ms:.0f}ms of {client_ms:.0f}ms spent in operations "
+            f"({server_ms / client_ms * 100:.0f}%); the rest is network, driver and ORM overhead.",
+        )
+    return lines
+
+
+def deltas_since(cursor, before: dict[int, StatementCounters] | None) -> list[StatementDelta] | None:
+    """Read counters again and diff against ``before`` (None when the extension is unusable)."""
+    if before is None:
+        return None
+    return statement_deltas(before, read_statements(cursor) or {})
+
+
+def summary_lines(deltas: list[StatementDelta] | None, *, client_seconds: float | None = None) -> list[str]:
+    if deltas is None:
+        return ["pg_stat_statements is not available; server-side timings skipped."]
+    return [
+        "Server-side (pg_stat_statements deltas for this run):",
+        *report_lines(deltas, client_seconds=client_seconds),
+    ]
+
+
+def summary_dict(deltas: list[StatementDelta] | None, *, limit: int = 20) -> dict | None:
+    """Plain-data form of ``deltas`` for command metrics."""
+    if deltas is None:
+        return None
+    return {
+        "statements": len(deltas),
+        "calls": sum(d.calls for d in deltas),
+        "total_exec_ms": round(sum(d.total_exec_ms for d in deltas), 3),
+        "shared_blks_hit": sum(d.shared_blks_hit for d in deltas),
+        "shared_blks_read": sum(d.shared_blks_read for d in deltas),
+        "wal_bytes": sum(d.wal_bytes for d in deltas),
+        "top": [{**asdict(d), "mean_exec_ms": round(d.mean_exec_ms, 3)} for d in deltas[:limit]],
+    }
@@ -0,0 +1,173 @@
+from datetime import UTC
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connection
+from django.db import connections
+from django.utils import timezone as django_timezone
+
+from goodvibes.shop.aggregates import daily_units
+from goodvibes.shop.aggregates import next_watermark
+from goodvibes.shop.aggregates import recompute_start
+from goodvibes.shop.aggregates import refresh
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+from goodvibes.shop.models import ProductDailySales
+from goodvibes.shop.models import SalesAggregateStaleDay
+from goodvibes.shop.models import SalesAggregateState
+
+
+@pytest.fixture
+def product():
+    return Product.objects.create(sku="B1", name="Book", category="books")
+
+
+@pytest.fixture
+def customer():
+    return Customer.objects.create(email="a@example.com", full_name="A")
+
+
+def _order(customer, product, *quantities, age=timedelta(hours=2)):
+    order = Order.objects.create(customer=customer, created_at=django_timezone.now() - age)
+    for quantity in quantities:
+        OrderItem.objects.create(order=order, product=product, quantity=quantity)
+    return order
+
+
+def _units(product, order):
+    row = ProductDailySales.objects.filter(product=product, day=order.created_at.astimezone(UTC).date()).first()
+    return (row.units, row.order_lines) if row else None
+
+
+def test_recompute_start_counts_today_in_utc():
+    # 01:30 on the 10th at UTC+3 is still the 9th in UTC.
+    now = datetime(2026, 3, 10, 1, 30, tzinfo=timezone(timedelta(hours=3)))
+
+    assert recompute_start(now, 0) is None
+    assert recompute_start(now, 1) == date(2026, 3, 9)
+    assert recompute_start(now.astimezone(UTC), 3) == date(2026, 3, 7)
+
+
+@pytest.mark.django_db
+def test_daily_units_groups_by_category():
+    books = [Product.objects.create(sku=f"B{i}", name="B", category="books") for i in range(2)]
+    game = Product.objects.create(sku="G", name="G", category="games")
+    day = date(2026, 3, 9)
+    for product, units in ((books[0], 3), (books[1], 4), (game, 5)):
+        ProductDailySales.objects.create(
+            day=day,
+            product=product,
+            category=product.category,
+            units=units,
+            order_lines=1,
+        )
+    ProductDailySales.objects.create(day=day - timedelta(days=1), product=game, category="games", units=9)
+
+    rows = list(daily_units(day, day))
+
+    assert rows == [
+        {"day": day, "category": "books", "units": 7, "order_lines": 2},
+        {"day": day, "category": "games", "units": 5, "order_lines": 1},
+    ]
+
+
+def test_next_watermark_waits_for_transactions_open_at_an_earlier_run():
+    # Nothing else open: everything visible is final.
+    assert next_watermark(5, None, 9, 100, None) == (9, None)
+    # Transaction 98 is open: 9 is parked until everything open at this snapshot has ended.
+    assert next_watermark(5, None, 9, 100, 98) == (5, (9, 100))
+    # 98 is still open; the pending id is kept rather than moved up.
+    assert next_watermark(5, (9, 100), 12, 104, 98) == (5, (9, 100))
+    # Only transactions started after that snapshot are open now.
+    assert next_watermark(5, (9, 100), 12, 104, 101) == (9, (12, 104))
+
+
+@pytest.mark.django_db
+def test_refresh_upserts_orders_above_the_watermark(customer, product):
+    first = _order(customer, product, 2, 3)
+    result = refresh(connection)
+
+    assert (result.previous_watermark, result.watermark) == (0, first.pk)
+    assert _units(product, first) == (5, 2)
+
+    second = _order(customer, product, 4, age=timedelta(0))
+    result = refresh(connection)
+
+    assert result.watermark == second.pk
+    assert SalesAggregateState.objects.get().last_order_id == second.pk
+    assert _units(product, first) == (9, 3)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_waits_for_an_open_seed_batch_below_visible_ids(customer, product):
+    seeder = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        seeder.set_autocommit(False)
+        with seeder.cursor() as cur:
+            # Seeding writes past timestamps and commits after later orders are visible.
+            cur.execute(
+                "INSERT INTO shop_order (customer_id, created_at) VALUES (%s, %s) RETURNING id",
+                [customer.pk, django_timezone.now() - timedelta(days=30)],
+            )
+            (seeded_id,) = cur.fetchone()
+            cur.execute(
+                "INSERT INTO shop_orderitem (order_id, product_id, quantity) VALUES (%s, %s, 6)",
+                [seeded_id, product.pk],
+            )
+        later = _order(customer, product, 1)
+
+        result = refresh(connection)
+        assert result.watermark == 0
+        assert SalesAggregateState.objects.get().pending_order_id == later.pk
+
+        seeder.commit()
+        result = refresh(connection)
+    finally:
+        seeder.close()
+
+    assert result.watermark == later.pk
+    seeded = Order.objects.get(pk=seeded_id)
+    assert seeded.pk < later.pk
+    assert _units(product, seeded) == (6, 1)
+
+
+@pytest.mark.django_db
+def test_refresh_rederives_days_of_cancelled_and_deleted_orders(customer, product):
+    cancelled = _order(customer, product, 2)
+    deleted = _order(customer, product, 3)
+    kept = _order(customer, product, 4)
+    refresh(connection)
+    assert _units(product, kept) == (9, 3)
+
+    # A bulk update sends no signals; the trigger still marks the day.
+    Order.objects.filter(pk=cancelled.pk).update(cancelled_at=django_timezone.now())
+    deleted.delete()
+    result = refresh(connection)
+
+    assert result.stale_days == 1
+    assert _units(product, kept) == (4, 1)
+
+    Order.objects.filter(pk=cancelled.pk).update(cancelled_at=None)
+    refresh(connection)
+
+    assert _units(product, kept) == (6, 2)
+
+
+@pytest.mark.django_db
+def test_stale_day_trigger_marks_each_day_once_per_statement(customer, product):
+    orders = [_order(customer, product, 1) for _ in range(3)]
+    _order(customer, product, 1, age=timedelta(days=3))
+
+    Order.objects.filter(pk__in=[o.pk for o in orders]).update(cancelled_at=django_timezone.now())
+    # Rewriting unchanged values marks nothing.
+    Order.objects.filter(pk__in=[o.pk for o in orders]).update(customer=customer)
+
+    assert list(SalesAggregateStaleDay.objects.values_list("day", flat=True)) == [
+        orders[0].created_at.astimezone(UTC).date(),
+    ]
@@ -0,0 +1,189 @@
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from goodvibes.shop import cache
+from goodvibes.shop.cache import LRUCache
+from goodvibes.shop.cache import RecentOrder
+from goodvibes.shop.cache import RecentOrdersCache
+from goodvibes.shop.cache import pack_recent_orders
+from goodvibes.shop.cache import unpack_recent_orders
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import Product
+
+
+def test_lru_evicts_least_recently_used(monkeypatch):
+    lru = LRUCache(maxsize=2, ttl=10)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert lru.get("a") is None
+    assert len(lru) == 1
+
+
+@pytest.mark.django_db
+def test_read_through_and_invalidation(django_assert_num_queries):
+    product = Product.objects.create(sku="SKU-1", name="P", category="books")
+
+    with cache.lookup_caches_enabled(enabled=True):
+        with django_assert_num_queries(1):
+            assert cache.product_by_sku.get("SKU-1")["id"] == product.pk
+            cache.product_by_sku.get("SKU-1")
+        cache.product_by_sku.local.clear()
+        with django_assert_num_queries(0):
+            cache.product_by_sku.get("SKU-1")
+        assert cache.product_by_sku.counters.as_dict() == {
+            "local_hits": 1,
+            "shared_hits": 1,
+            "misses": 1,
+            "invalidations": 0,
+            "updates": 0,
+            "hit_pct": 66.67,
+        }
+
+        product.sku = "SKU-2"
+        product.save()
+        assert cache.product_by_sku.get("SKU-1") is None
+        assert cache.product_by_sku.get("SKU-2")["id"] == product.pk
+
+        product.delete()
+        assert cache.product_by_sku.get("SKU-2") is None
+
+
+@pytest.mark.django_db
+def test_late_fill_from_before_an_invalidation_is_ignored(django_assert_num_queries):
+    Product.objects.create(sku="SKU-1", name="Old", category="books")
+    lookup = cache.product_by_sku
+
+    with cache.lookup_caches_enabled(enabled=True):
+        cache_key = lookup.cache_key("SKU-1")
+        # A reader misses and loads the old row...
+        _value, version = lookup._cached(cache_key)
+        stale = lookup.load("SKU-1")
+        # ...the writer commits and invalidates...
+        Product.objects.filter(sku="SKU-1").update(name="New")
+        lookup.invalidate("SKU-1")
+        # ...and only then does the reader store what it loaded.
+        lookup._store(cache_key, stale, version)
+        lookup.local.clear()
+
+        with django_assert_num_queries(1):
+            assert lookup.get("SKU-1")["name"] == "New"
+
+
+@pytest.mark.django_db
+def test_customer_lookup_ignores_case():
+    customer = Customer.objects.create(email="Ada@example.com", full_name="Ada")
+
+    with cache.lookup_caches_enabled(enabled=True):
+        assert cache.customer_by_email.get("ada@EXAMPLE.com")["id"] == customer.pk
+        customer.full_name = "Ada L."
+        customer.save(update_fields=["full_name"])
+        assert cache.customer_by_email.get("ADA@example.com")["full_name"] == "Ada L."
+
+
+def test_recent_orders_pack_round_trip():
+    orders = [
+        RecentOrder(7, datetime(2026, 5, 1, 12, 0, 0, 123456, tzinfo=UTC), cancelled=True),
+        RecentOrder(3, datetime(1999, 1, 1, tzinfo=UTC), cancelled=False),
+    ]
+
+    data = pack_recent_orders(orders, complete=False)
+
+    assert len(data) == 8 * 5
+    assert unpack_recent_orders(data) == (orders, False)
+
+
+@pytest.mark.django_db
+def test_recent_orders_follow_order_signals(django_capture_on_commit_callbacks, django_assert_num_queries):
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    older = Order.objects.create(customer=customer, created_at=datetime(2026, 1, 1, tzinfo=UTC))
+
+    with cache.lookup_caches_enabled(enabled=True):
+        assert cache.recent_orders.ids(customer.pk) == [older.pk]
+        with django_capture_on_commit_callbacks(execute=True):
+            newer = Order.objects.create(customer=customer, created_at=datetime(2026, 2, 1, tzinfo=UTC))
+            older.cancelled_at = datetime(2026, 3, 1, tzinfo=UTC)
+            older.save()
+        with django_assert_num_queries(0):
+            orders = cache.recent_orders.get(customer.pk)
+        assert [(o.id, o.cancelled) for o in orders] == [(newer.pk, False), (older.pk, True)]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            newer.delete()
+        assert cache.recent_orders.ids(customer.pk) == [older.pk]
+        assert cache.recent_orders.counters.updates == 3
+
+
+@pytest.mark.django_db
+def test_set_cancelled_at_updates_recent_orders(django_capture_on_commit_callbacks, django_assert_num_queries):
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    order = Order.objects.create(customer=customer, created_at=datetime(2026, 1, 1, tzinfo=UTC))
+
+    with cache.lookup_caches_enabled(enabled=True):
+        cache.recent_orders.get(customer.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            assert Order.objects.filter(pk=order.pk).set_cancelled_at(datetime(2026, 1, 2, tzinfo=UTC)) == 1
+        with django_assert_num_queries(0):
+            assert [o.cancelled for o in cache.recent_orders.get(customer.pk)] == [True]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert Order.objects.filter(pk=order.pk).set_cancelled_at(None) == 1
+        assert [o.cancelled for o in cache.recent_orders.get(customer.pk)] == [False]
+        assert cache.recent_orders.counters.updates == 2
+
+
+@pytest.mark.django_db
+def test_lookup_signals_do_nothing_while_cache_is_off(django_assert_num_queries, django_capture_on_commit_callbacks):
+    product = Product.objects.create(sku="SKU-1", name="P", category="books")
+    product.sku = "SKU-2"
+
+    with (
+        cache.lookup_caches_enabled(enabled=False),
+        django_capture_on_commit_callbacks() as callbacks,
+        django_assert_num_queries(1),  # the UPDATE, without the old-key SELECT
+    ):
+        product.save()
+
+    assert callbacks == []
+
+
+@pytest.mark.django_db
+def test_order_signals_do_nothing_while_cache_is_off(django_capture_on_commit_callbacks):
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+
+    with cache.lookup_caches_enabled(enabled=False), django_capture_on_commit_callbacks() as callbacks:
+        Order.objects.create(customer=customer).delete()
+
+    assert callbacks == []
+
+
+@pytest.mark.django_db
+def test_recent_orders_reload_when_window_runs_short(django_assert_num_queries):
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    orders = [Order.objects.create(customer=customer, created_at=start + timedelta(days=i)) for i in range(5)]
+    recent = RecentOrdersCache("test-recent-orders", limit=2, slack=1)
+    recent.enabled = True
+    assert recent.ids(customer.pk) == [orders[4].pk, orders[3].pk]
+
+    # limit + slack orders are kept, so one delete is absorbed ...
+    recent.order_deleted(customer.pk, orders[4].pk)
+    with django_assert_num_queries(0):
+        assert recent.ids(customer.pk) == [orders[3].pk, orders[2].pk]
+    # ... an older order outside the window is ignored ...
+    recent.order_saved(customer.pk, RecentOrder(orders[0].pk, orders[0].created_at, cancelled=True))
+    # ... and a delete leaving fewer than ``limit`` known orders drops the entry.
+    recent.order_deleted(customer.pk, orders[3].pk)
+    assert recent.counters.invalidations == 1
+    with django_assert_num_queries(1):
+        assert recent.ids(customer.pk) == [orders[4].pk, orders[3].pk]
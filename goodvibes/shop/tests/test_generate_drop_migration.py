@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.migrations.writer import MigrationWriter
+
+from goodvibes.shop.index_report import IndexRow
+from goodvibes.shop.management.commands.generate_drop_migration import Command
+from goodvibes.shop.operations import RemoveIndexConcurrently
+
+
+def _row(index, table, indexdef):
+    return IndexRow(1, "public", table, index, indexdef, 0, 0, 0, 8192, flags=["unused"])
+
+
+def test_meta_index_uses_state_aware_concurrent_removal():
+    row = _row(
+        "idx_order_customer_only",
+        "shop_order",
+        "CREATE INDEX idx_order_customer_only ON public.shop_order USING btree (customer_id)",
+    )
+
+    operation, reminder = Command()._operation(row)
+
+    assert isinstance(operation, RemoveIndexConcurrently)
+    assert operation.name == "idx_order_customer_only"
+    assert "Order.Meta.indexes" in reminder
+
+
+def test_foreign_key_index_drops_concurrently_and_updates_state():
+    row = _row(
+        "shop_orderitem_product_id_0f4a8e7c",
+        "shop_orderitem",
+        "CREATE INDEX shop_orderitem_product_id_0f4a8e7c ON public.shop_orderitem USING btree (product_id)",
+    )
+
+    operation, reminder = Command()._operation(row)
+
+    assert isinstance(operation, migrations.SeparateDatabaseAndState)
+    run_sql = operation.database_operations[0]
+    assert run_sql.sql == 'DROP INDEX CONCURRENTLY IF EXISTS "public"."shop_orderitem_product_id_0f4a8e7c";'
+    assert run_sql.reverse_sql.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS shop_orderitem_product_id")
+    assert operation.state_operations[0].field.db_index is False
+    assert reminder == "set db_index=False on OrderItem.product"
+
+    migration = migrations.Migration("0099_drop", "shop")
+    migration.operations = [operation]
+    assert "DROP INDEX CONCURRENTLY" in MigrationWriter(migration).as_string()
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+from django.db import connection
+
+from goodvibes.shop.http_load import COMPONENTS
+from goodvibes.shop.http_load import HttpLoad
+from goodvibes.shop.http_load import http_operations
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+from goodvibes.shop.workload import OPERATIONS
+from goodvibes.shop.workload import WorkloadKeys
+
+pytestmark = pytest.mark.django_db
+
+
+def test_http_operations_keep_served_subset():
+    served, skipped = http_operations(OPERATIONS)
+
+    assert [op.name for op in served] == ["product_by_sku", "customer_by_email", "recent_orders"]
+    assert skipped == ["order_items", "open_orders"]
+
+
+def test_request_time_is_split_into_components():
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    product = Product.objects.create(sku="SKU-1", name="P", category="books")
+    order = Order.objects.create(customer=customer)
+    OrderItem.objects.create(order=order, product=product)
+    keys = WorkloadKeys.load()
+    rng = random.Random(0)
+
+    # HttpLoad keeps the connection (and so the test's transaction) open across requests.
+    with HttpLoad(connection) as http:
+        for operation in http_operations(OPERATIONS)[0]:
+            http.get(operation.name, http.url(operation, keys, rng))
+        with pytest.raises(RuntimeError, match="404"):
+            http.get("missing", "/api/shop/products/NOPE/")
+
+    timing = http.endpoints["recent_orders"]
+    assert timing.statuses == {200: 1}
+    assert all(timing.seconds[c] >= 0 for c in COMPONENTS)
+    assert timing.seconds["db"] > 0
+    assert timing.seconds["orm"] > 0
+    assert http.endpoints["missing"].statuses == {404: 1}
+    assert set(http.as_dict()) == {"product_by_sku", "customer_by_email", "recent_orders", "missing"}
@@ -0,0 +1,60 @@
+from goodvibes.shop.index_report import IndexKeys
+from goodvibes.shop.index_report import classify_redundancy
+
+ORDER = 1
+PRODUCT = 2
+
+
+def _idx(oid, table, keys, *, unique=False, method="btree", predicate="", include=()):
+    return IndexKeys(oid, table, unique, method, tuple(keys), predicate, include=tuple(include))
+
+
+def test_classify_redundancy_mirrors_shop_models():
+    indexes = [
+        _idx(10, PRODUCT, ["sku"], unique=True),  # shop_product_sku_key
+        _idx(11, PRODUCT, ["sku"]),  # idx_product_sku_nonunique
+        _idx(12, PRODUCT, ["lower((name)::text)"]),
+        _idx(20, ORDER, ["customer_id", "created_at"]),  # idx_order_customer_created_at
+        _idx(21, ORDER, ["customer_id"]),  # idx_order_customer_only
+        _idx(22, ORDER, ["cancelled_at"]),  # idx_order_cancelled_full
+        _idx(23, ORDER, ["cancelled_at"], predicate="(cancelled_at IS NULL)"),  # partial
+        _idx(24, ORDER, ["customer_id"], include=["created_at"]),  # idx_order_cust_inc_created
+    ]
+
+    result = classify_redundancy(indexes)
+
+    assert result == {11: "duplicate", 21: "covered", 24: "covered"}
+
+
+def test_include_columns_decide_between_equal_keys():
+    result = classify_redundancy(
+        [
+            _idx(1, ORDER, ["a"]),
+            _idx(2, ORDER, ["a"], include=["b"]),
+            _idx(3, ORDER, ["a"], include=["c"]),
+            _idx(4, ORDER, ["a"], include=["c"]),
+        ],
+    )
+
+    # 2 and 3 answer different index-only scans; 1 has no INCLUDE columns at all.
+    assert result == {1: "covered", 4: "duplicate"}
+
+
+def test_longer_key_covers_only_when_it_holds_the_include_columns():
+    result = classify_redundancy([_idx(1, ORDER, ["a"], include=["c"]), _idx(2, ORDER, ["a", "b"])])
+
+    assert result == {}
+
+
+def test_keeps_oldest_of_identical_duplicates():
+    result = classify_redundancy([_idx(2, ORDER, ["a"]), _idx(1, ORDER, ["a"])])
+
+    assert result == {2: "duplicate"}
+
+
+def test_prefix_rule_only_applies_to_btree():
+    result = classify_redundancy(
+        [_idx(1, ORDER, ["a"], method="hash"), _idx(2, ORDER, ["a", "b"], method="hash")],
+    )
+
+    assert result == {}
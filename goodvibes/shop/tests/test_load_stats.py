@@ -0,0 +1,66 @@
+import pytest
+
+from goodvibes.shop.load_stats import LoadStats
+from goodvibes.shop.load_stats import percentile
+from goodvibes.shop.statements import StatementCounters
+from goodvibes.shop.statements import statement_deltas
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 95) == 0.0
+
+
+def test_measure_counts_errors_and_reraises():
+    stats = LoadStats()
+    with stats.measure("op"):
+        pass
+    with pytest.raises(KeyError), stats.measure("op"):
+        raise KeyError
+
+    op = stats.operations["op"]
+    assert (op.count, op.errors, len(op.samples)) == (2, 1, 2)
+
+
+def test_reservoir_is_bounded():
+    stats = LoadStats(reservoir_size=10)
+    for i in range(1000):
+        stats.record("op", i / 1000)
+    stats.stop()
+
+    assert len(stats.operations["op"].samples) == 10
+    summary = stats.as_dict()["operations"]["op"]
+    assert summary["count"] == 1000
+    assert summary["mean_ms"] == pytest.approx(499.5)
+
+
+def test_overall_percentiles_span_operations():
+    stats = LoadStats()
+    for ms in range(1, 51):
+        stats.record("fast", ms / 1000)
+        stats.record("slow", (ms + 50) / 1000)
+    stats.stop()
+
+    summary = stats.as_dict()
+    assert summary["ops"] == 100
+    assert (summary["p50_ms"], summary["p99_ms"]) == (50.0, 99.0)
+    assert summary["operations"]["slow"]["p50_ms"] == 75.0
+
+
+def test_statement_deltas():
+    before = {1: StatementCounters("SELECT 1", 10, 5.0, 100, 1, 0)}
+    after = {
+        1: StatementCounters("SELECT 1", 15, 7.5, 150, 1, 0),
+        2: StatementCounters("UPDATE x", 3, 9.0, 30, 2, 4096),  # new since the first read
+        3: StatementCounters("SELECT 3", 4, 1.0, 4, 0, 0),
+    }
+    before[3] = after[3]  # did not run in between
+
+    deltas = statement_deltas(before, after)
+
+    assert [(d.queryid, d.calls, d.total_exec_ms) for d in deltas] == [(2, 3, 9.0), (1, 5, 2.5)]
+    assert deltas[1].mean_exec_ms == 0.5
@@ -0,0 +1,18 @@
+from django.db import migrations
+from django.db.migrations.loader import MigrationLoader
+
+from goodvibes.shop import operations
+
+
+def _shop_migrations():
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return [m for (app, _name), m in loader.disk_migrations.items() if app == "shop"]
+
+
+def test_index_changes_use_concurrent_operations():
+    concurrent = (operations.AddIndexConcurrently, operations.RemoveIndexConcurrently)
+    for migration in _shop_migrations():
+        for op in migration.operations:
+            if isinstance(op, (migrations.AddIndex, migrations.RemoveIndex)):
+                assert isinstance(op, concurrent), f"{migration.name}: use goodvibes.shop.operations for {op!r}"
+                assert migration.atomic is False, f"{migration.name} must set atomic = False"
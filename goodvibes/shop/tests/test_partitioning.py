@@ -0,0 +1,107 @@
+from datetime import UTC
+from datetime import datetime
+
+import pytest
+from django.db import connection
+
+from goodvibes.shop import index_report
+from goodvibes.shop import io_stats
+from goodvibes.shop import partitioning
+from goodvibes.shop import write_cost
+from goodvibes.shop.layouts import LayoutSwitcher
+from goodvibes.shop.management.commands.generate_drop_migration import Command as DropMigrationCommand
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+from goodvibes.shop.partitioning import Partition
+from goodvibes.shop.partitioning import add_months
+from goodvibes.shop.partitioning import expired
+from goodvibes.shop.partitioning import month_start
+from goodvibes.shop.partitioning import partition_name
+from goodvibes.shop.plans import PlanSummary
+from goodvibes.shop.plans import ScanNode
+from goodvibes.shop.plans import index_ancestors
+
+
+def test_month_arithmetic():
+    start = month_start(datetime(2026, 11, 17, 13, 5, tzinfo=UTC))
+
+    assert start == datetime(2026, 11, 1, tzinfo=UTC)
+    assert add_months(start, 2) == datetime(2027, 1, 1, tzinfo=UTC)
+    assert add_months(start, -11) == datetime(2025, 12, 1, tzinfo=UTC)
+    assert partition_name("shop_orderitem", start) == "shop_orderitem_p2026_11"
+
+
+def test_expired_partitions_items_first():
+    def partition(table, month):
+        lower = datetime(2026, month, 1, tzinfo=UTC)
+        return Partition(table, partition_name(table, lower), lower, add_months(lower, 1), 0, 0, 0)
+
+    partitions = [partition(table, month) for table in ("shop_order", "shop_orderitem") for month in (1, 2, 3)]
+
+    old = expired(partitions, datetime(2026, 5, 20, tzinfo=UTC), retain_months=2)
+
+    assert [p.name for p in old] == [
+        "shop_orderitem_p2026_01",
+        "shop_order_p2026_01",
+        "shop_orderitem_p2026_02",
+        "shop_order_p2026_02",
+    ]
+
+
+@pytest.mark.django_db
+def test_order_item_copies_partition_key():
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    product = Product.objects.create(sku="SKU-1", name="P", category="books")
+    created_at = datetime(2025, 3, 4, 5, 6, tzinfo=UTC)
+    order = Order.objects.create(customer=customer, created_at=created_at)
+
+    item = OrderItem.objects.create(order=order, product=product)
+
+    assert item.order_created_at == created_at
+
+
+@pytest.mark.django_db
+def test_converted_tables_report_model_indexes_not_partition_copies():
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    product = Product.objects.create(sku="SKU-1", name="P", category="books")
+    for month in (1, 2):
+        order = Order.objects.create(customer=customer, created_at=datetime(2026, month, 5, tzinfo=UTC))
+        OrderItem.objects.create(order=order, product=product)
+    partitioning.convert(connection, months_ahead=0)
+
+    rows = {row.index: row for row in index_report.iter_index_rows(connection, bloat_by_oid={}, redundancy={})}
+    with connection.cursor() as cur:
+        keys = index_report.fetch_index_keys(cur)
+        costs = write_cost.fetch_write_costs(cur)
+        io = io_stats.fetch_io_stats(cur)
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'idx_order_customer_created_at'::regclass ORDER BY 1",
+        )
+        children = [name for (name,) in cur.fetchall()]
+        ancestors = index_ancestors(cur, children)
+
+    # One row per model index, holding its partitions' sizes.
+    assert {index.name for index in Order._meta.indexes} <= set(rows)
+    assert not [row.table for row in rows.values() if row.table.startswith(("shop_order_p", "shop_orderitem_p"))]
+    assert {key.name for key in keys} == set(rows)
+    row = rows["idx_order_customer_created_at"]
+    assert row.partitioned
+    assert row.size_bytes > 0
+    assert row.oid in costs
+    assert row.oid in io
+
+    # Partitioned indexes cannot be dropped concurrently.
+    assert set(LayoutSwitcher(connection).partitioned) >= {index.name for index in Order._meta.indexes}
+    run_sql = DropMigrationCommand()._run_sql(row)
+    assert run_sql.sql == 'DROP INDEX IF EXISTS "public"."idx_order_customer_created_at";'
+    assert " ON ONLY " not in run_sql.reverse_sql
+
+    # Plans name the partitions' indexes.
+    assert len(children) >= 2
+    assert ancestors == {name: ("idx_order_customer_created_at",) for name in children}
+    plan = PlanSummary("", "", 0.0, None, [ScanNode("Index Scan", "shop_order_p2026_01", children[0], 1, 1)])
+    plan.ancestors = ancestors
+    assert plan.verdict(("idx_order_customer_created_at",)) == "ok"
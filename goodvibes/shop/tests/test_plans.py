@@ -0,0 +1,107 @@
+import json
+
+from goodvibes.shop.models import Product
+from goodvibes.shop.plans import HeapFetchStats
+from goodvibes.shop.plans import fingerprint
+from goodvibes.shop.plans import summarize_plan
+
+NESTED_LOOP_PLAN = {
+    "Plan": {
+        "Node Type": "Limit",
+        "Total Cost": 8.3,
+        "Plans": [
+            {
+                "Node Type": "Index Scan",
+                "Relation Name": "shop_order",
+                "Index Name": "idx_order_customer_created_at",
+                "Plan Rows": 5,
+                "Actual Rows": 4,
+                "Actual Loops": 1,
+            },
+            {
+                "Node Type": "Bitmap Heap Scan",
+                "Relation Name": "shop_orderitem",
+                "Plans": [
+                    {
+                        "Node Type": "Bitmap Index Scan",
+                        "Index Name": "idx_orderitem_order_only",
+                        "Plan Rows": 3,
+                        "Actual Rows": 100,
+                        "Actual Loops": 4,
+                    },
+                ],
+            },
+        ],
+    },
+    "Execution Time": 0.25,
+}
+
+
+def test_summarize_plan_collects_index_scans():
+    # Django returns the JSON plan as a string.
+    plan = summarize_plan(json.dumps(NESTED_LOOP_PLAN))
+
+    assert plan.indexes == ["idx_order_customer_created_at", "idx_orderitem_order_only"]
+    assert plan.scans[1].actual_rows == 400
+    assert [scan.misestimated for scan in plan.scans] == [False, True]
+    assert plan.execution_ms == 0.25
+    assert plan.verdict(("idx_orderitem_order_*",)) == "ok"
+    assert plan.verdict(("idx_order_cancelled_partial",)) == "UNEXPECTED INDEX"
+
+
+def test_verdict_accepts_partitions_of_expected_indexes():
+    plan = summarize_plan(
+        [
+            {
+                "Plan": {
+                    "Node Type": "Index Scan",
+                    "Relation Name": "shop_order_p2026_10",
+                    "Index Name": "shop_order_p2026_10_customer_id_created_at_idx",
+                    "Plan Rows": 5,
+                },
+            },
+        ],
+    )
+
+    assert plan.verdict(("idx_order_customer_created_at",)) == "UNEXPECTED INDEX"
+    plan.ancestors = {"shop_order_p2026_10_customer_id_created_at_idx": ("idx_order_customer_created_at",)}
+    assert plan.verdict(("idx_order_customer_created_at",)) == "ok"
+
+
+def test_seq_scan_verdict():
+    plan = summarize_plan(
+        [{"Plan": {"Node Type": "Seq Scan", "Relation Name": "shop_customer", "Plan Rows": 1}}],
+    )
+
+    assert plan.seq_scans == ["shop_customer"]
+    assert plan.scans[0].actual_rows is None
+    assert plan.verdict(("idx_customer_email_lower",)) == "SEQ SCAN"
+
+
+def test_fingerprint_ignores_parameter_values():
+    a = Product.objects.only("id").filter(sku="A")
+    b = Product.objects.only("id").filter(sku="B")
+
+    assert fingerprint(a) == fingerprint(b)
+    assert fingerprint(a) != fingerprint(Product.objects.filter(name="A"))
+
+
+def test_index_only_scan_heap_fetches():
+    plan = summarize_plan(
+        {
+            "Plan": {
+                "Node Type": "Index Only Scan",
+                "Relation Name": "shop_orderitem",
+                "Index Name": "idx_orderitem_order_product",
+                "Plan Rows": 3,
+                "Actual Rows": 3,
+                "Actual Loops": 1,
+                "Heap Fetches": 2,
+            },
+        },
+    )
+    stats = HeapFetchStats(samples=1, index_only_scans=1, rows=3, heap_fetches=2)
+
+    assert plan.scans[0].heap_fetches == 2
+    assert str(plan.scans[0]).endswith("heap fetches 2)")
+    assert round(stats.fetch_pct, 1) == 66.7
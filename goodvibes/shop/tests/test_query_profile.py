@@ -0,0 +1,81 @@
+import pytest
+from django.db import connection
+
+from goodvibes.shop.index_report import IndexKeys
+from goodvibes.shop.models import Product
+from goodvibes.shop.query_profile import QueryProfiler
+from goodvibes.shop.query_profile import advise
+from goodvibes.shop.query_profile import normalize_sql
+
+RECENT_ORDERS = (
+    'SELECT "shop_order"."id" FROM "shop_order" WHERE "shop_order"."customer_id" = %s '
+    'ORDER BY "shop_order"."created_at" DESC LIMIT 50'
+)
+CUSTOMER_IEXACT = (
+    'SELECT "shop_customer"."id" FROM "shop_customer" WHERE UPPER("shop_customer"."email"::text) = UPPER(%s) LIMIT 21'
+)
+
+
+def _idx(name, table, keys, *, unique=False, predicate=""):
+    return IndexKeys(0, 0, unique, "btree", tuple(keys), predicate, name, table)
+
+
+def test_record_aggregates_by_shape():
+    profiler = QueryProfiler()
+    profiler.record(RECENT_ORDERS, 2.0)
+    profiler.record(RECENT_ORDERS.replace(" LIMIT", "  LIMIT"), 4.0)
+
+    [stats] = profiler.stats.values()
+    assert (stats.calls, stats.total_ms, stats.max_ms) == (2, 6.0, 4.0)
+    assert stats.table == "shop_order"
+    assert stats.filters == (("shop_order", "customer_id"),)
+    assert stats.sorts == (("shop_order", "created_at"),)
+
+
+def test_functional_filters_and_in_lists():
+    profiler = QueryProfiler()
+    profiler.record(CUSTOMER_IEXACT, 1.0)
+
+    assert profiler.top()[0].filters == (("shop_customer", "upper(email)"),)
+    assert normalize_sql('WHERE "t"."id" IN (%s, %s, %s)') == normalize_sql('WHERE "t"."id" IN (%s)')
+
+
+def test_profiler_is_bounded():
+    profiler = QueryProfiler(max_fingerprints=1)
+    profiler.record(RECENT_ORDERS, 1.0)
+    profiler.record(CUSTOMER_IEXACT, 3.0)
+
+    assert len(profiler.stats) == 1
+    assert (profiler.overflow_calls, profiler.overflow_ms) == (1, 3.0)
+
+
+def test_advise_picks_composite_and_proposes_missing_functional_index():
+    profiler = QueryProfiler()
+    profiler.record(RECENT_ORDERS, 1.0)
+    profiler.record(CUSTOMER_IEXACT, 5.0)
+    indexes = [
+        _idx("idx_order_customer_created_at", "shop_order", ["customer_id", "created_at"]),
+        _idx("idx_order_customer_only", "shop_order", ["customer_id"]),
+        _idx("idx_customer_email_lower", "shop_customer", ["lower((email)::text)"]),
+        _idx("shop_customer_email_key", "shop_customer", ["email"], unique=True),
+    ]
+
+    advice = advise(list(profiler.stats.values()), indexes)
+
+    assert advice.needed == {"idx_order_customer_created_at": (1, 1.0)}
+    assert [p.sql for p in advice.proposals] == [
+        "CREATE INDEX CONCURRENTLY ON shop_customer ((upper(email)));",
+    ]
+    assert advice.not_needed == ["idx_customer_email_lower", "idx_order_customer_only"]
+
+
+@pytest.mark.django_db
+def test_execute_wrapper_records_orm_queries():
+    profiler = QueryProfiler()
+    with connection.execute_wrapper(profiler):
+        list(Product.objects.filter(sku="A"))
+        list(Product.objects.filter(sku="B"))
+
+    [stats] = profiler.stats.values()
+    assert stats.calls == 2
+    assert stats.filters == (("shop_product", "sku"),)
@@ -0,0 +1,91 @@
+import csv
+import json
+from io import StringIO
+from itertools import groupby
+
+from django.core.management.base import OutputWrapper
+
+from goodvibes.shop.index_report import IndexRow
+from goodvibes.shop.io_stats import IoStats
+from goodvibes.shop.report_writers import WRITERS
+
+
+def _rows():
+    return [
+        IndexRow(1, "public", "shop_order", "idx_a", 'CREATE INDEX "a" ON t (x)', 0, 0, 0, 8192, flags=["unused"]),
+        IndexRow(
+            2,
+            "public",
+            "shop_order",
+            "idx_b",
+            "CREATE INDEX b ON t (y)",
+            5,
+            7,
+            3,
+            16384,
+            4096,
+            25.0,
+            scans_by_database={"default": 2, "replica1": 3},
+            idx_blks_hit=90,
+            idx_blks_read=10,
+            idx_hit_pct=90.0,
+            buffered_bytes=8192,
+        ),
+    ]
+
+
+def _render(fmt):
+    buf = StringIO()
+    writer = WRITERS[fmt](OutputWrapper(buf))
+    writer.begin()
+    for row in _rows():
+        writer.row(row)
+    writer.end()
+    return buf.getvalue()
+
+
+def test_json_is_a_valid_array():
+    data = json.loads(_render("json"))
+
+    assert [d["index"] for d in data] == ["idx_a", "idx_b"]
+    assert data[0]["indexdef"] == 'CREATE INDEX "a" ON t (x)'
+    assert data[1]["bloat_bytes"] == 4096
+
+
+def test_csv_has_header_and_one_line_per_index():
+    lines = list(csv.DictReader(StringIO(_render("csv"))))
+
+    assert len(lines) == 2
+    assert lines[0]["flags"] == "unused"
+    assert lines[0]["bloat_bytes"] == ""
+    assert lines[1]["scans_by_database"] == "default=2;replica1=3"
+
+
+def test_prometheus_groups_samples_by_family():
+    text = _render("prometheus")
+    names = [line.split("{")[0] for line in text.splitlines() if not line.startswith("#")]
+
+    blocks = [name for name, _ in groupby(names)]
+    assert len(blocks) == len(set(blocks))  # every family is one contiguous block
+    assert 'definition="CREATE INDEX \\"a\\" ON t (x)"' in text
+    assert 'goodvibes_index_bloat_bytes{schema="public",table="shop_order",index="idx_b"} 4096' in text
+    assert "goodvibes_index_bloat_bytes{" + 'schema="public",table="shop_order",index="idx_a"}' not in text
+    labels = 'schema="public",table="shop_order",index="idx_b",database="replica1"'
+    assert f"goodvibes_index_scans_total{{{labels}}} 3" in text
+
+
+def test_io_columns():
+    lines = list(csv.DictReader(StringIO(_render("csv"))))
+    text = _render("prometheus")
+
+    assert (lines[1]["idx_hit_pct"], lines[1]["buffered_bytes"]) == ("90.0", "8192")
+    assert lines[0]["buffered_bytes"] == ""
+    assert 'goodvibes_index_buffered_bytes{schema="public",table="shop_order",index="idx_b"} 8192' in text
+    assert 'goodvibes_index_blocks_read_total{schema="public",table="shop_order",index="idx_b"} 10' in text
+
+
+def test_io_stats_hit_ratios():
+    io = IoStats(idx_blks_read=1, idx_blks_hit=3, heap_blks_read=0, heap_blks_hit=0)
+
+    assert io.idx_hit_pct == 75.0
+    assert io.heap_hit_pct is None
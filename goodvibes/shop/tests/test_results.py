@@ -0,0 +1,85 @@
+import random
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.results import compare
+from goodvibes.shop.results import dataset_fingerprint
+from goodvibes.shop.results import select_runs
+
+
+def _run(run_id, *, kind="simulate_load", label="", ops=100, latency=1.0, seed=0, runs=None):
+    rng = random.Random(seed)
+    run = {
+        "id": run_id,
+        "kind": kind,
+        "label": label,
+        "series": {
+            "ops_per_second": [rng.gauss(ops, ops * 0.02) for _ in range(60)],
+            "latency_ms": [rng.expovariate(1 / latency) for _ in range(2000)],
+            "operations": {"product_by_sku": [rng.expovariate(1 / latency) for _ in range(500)]},
+        },
+    }
+    if runs is not None:
+        run["runs"] = runs
+    return run
+
+
+def test_select_runs_by_label_prefix_and_scenario():
+    runs = [
+        _run("aaa111", label="before"),
+        _run("aaa222", label="before"),
+        _run("bbb111", kind="generate_bloat"),
+        _run("ccc111", kind="scenario", label="nightly", runs=["aaa222", "bbb111"]),
+    ]
+
+    assert [r["id"] for r in select_runs(runs, "before")] == ["aaa111", "aaa222"]
+    assert [r["id"] for r in select_runs(runs, "bbb")] == ["bbb111"]
+    assert [r["id"] for r in select_runs(runs, "nightly", kind="generate_bloat")] == ["bbb111"]
+    assert [r["id"] for r in select_runs(runs, "latest")] == ["aaa222", "bbb111"]
+    with pytest.raises(ValueError, match="ambiguous"):
+        select_runs(runs, "aaa")
+    with pytest.raises(ValueError, match="No run"):
+        select_runs(runs, "zzz")
+
+
+def test_compare_flags_regressions_only_beyond_noise():
+    baseline = [_run("base", seed=1)]
+    same = [_run("same", seed=2)]
+    slower = [_run("slow", seed=3, ops=80, latency=1.5)]
+
+    assert {c.verdict for c in compare(baseline, same)} == {"no change"}
+    verdicts = {c.metric: c.verdict for c in compare(baseline, slower)}
+    assert verdicts == {
+        "throughput ops/s": "regression",
+        "p99 ms": "regression",
+        "product_by_sku p99 ms": "regression",
+    }
+    assert {c.verdict for c in compare(slower, baseline)} == {"improvement"}
+
+
+def test_compare_without_series():
+    comparisons = compare([{"id": "a"}], [{"id": "b"}])
+
+    assert {c.verdict for c in comparisons} == {"insufficient data"}
+
+
+@pytest.mark.django_db
+def test_dataset_fingerprint_hashes_id_ranges_without_counting():
+    customer = Customer.objects.create(email="a@example.com", full_name="A")
+    order = Order.objects.create(customer=customer)
+
+    with CaptureQueriesContext(connection) as ctx:
+        before = dataset_fingerprint()
+    Order.objects.filter(pk=order.pk).update(cancelled_at=timezone.now())
+    cancelled = dataset_fingerprint()
+    Order.objects.create(customer=customer)
+
+    assert not [q for q in ctx.captured_queries if "COUNT(" in q["sql"].upper()]
+    assert before["tables"]["shop_order"]["max_id"] == order.pk
+    assert cancelled["hash"] == before["hash"]
+    assert dataset_fingerprint()["hash"] != before["hash"]
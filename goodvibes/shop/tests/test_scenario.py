@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import pytest
+
+from goodvibes.shop.scenario import ScenarioError
+from goodvibes.shop.scenario import Step
+from goodvibes.shop.scenario import load_scenario
+from goodvibes.shop.scenario import parse_scenario
+from goodvibes.shop.scenario import run_phase
+
+SCENARIOS = Path(__file__).resolve().parent.parent / "scenarios"
+
+
+def test_bundled_scenario_parses():
+    scenario = load_scenario(SCENARIOS / "bloat_under_load.toml")
+
+    assert scenario.name == "bloat-under-load"
+    churn = next(phase for phase in scenario.phases if phase.name == "load+churn")
+    assert [step.command for step in churn.steps] == ["simulate_load", "generate_bloat"]
+    assert churn.snapshot
+
+
+def test_default_phase_names_and_options():
+    scenario = parse_scenario({"phases": [{"command": "report_indexes", "options": {"sort": "bloat"}}]})
+
+    assert scenario.phases[0].name == "1-report_indexes"
+    assert scenario.phases[0].steps == (Step("report_indexes", {"sort": "bloat"}),)
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        ({"phases": []}, "non-empty"),
+        ({"phases": [{"command": "no_such_command"}]}, "Unknown command"),
+        ({"phases": [{"command": "simulate_load", "options": {"minutes": 1}}]}, "unknown option"),
+        ({"phases": [{"command": "simulate_load", "parallel": []}]}, "either"),
+    ],
+)
+def test_invalid_scenarios(data, message):
+    with pytest.raises(ScenarioError, match=message):
+        parse_scenario(data)
+
+
+def test_run_phase_records_errors_and_output():
+    phase = parse_scenario({"phases": [{"command": "check"}]}).phases[0]
+
+    result = run_phase(phase)
+
+    [step] = result["steps"]
+    assert "error" not in step
+    assert "no issues" in step["output"]
+    assert step["metrics"] == {}
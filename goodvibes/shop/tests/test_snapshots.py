@@ -0,0 +1,41 @@
+import pytest
+
+from goodvibes.shop import snapshots
+from goodvibes.shop.index_report import collect_usage
+from goodvibes.shop.models import IndexStatsSnapshot
+from goodvibes.shop.models import IndexStatsSnapshotEntry
+
+
+def test_delta_counts_growth_since_snapshot():
+    assert snapshots.delta(150, 100) == 50
+
+
+def test_delta_without_baseline_or_after_reset_uses_current_value():
+    assert snapshots.delta(7, None) == 7
+    assert snapshots.delta(3, 100) == 3
+
+
+@pytest.mark.django_db
+class TestResolveSnapshot:
+    def test_by_id_label_and_latest(self):
+        first = IndexStatsSnapshot.objects.create(label="baseline")
+        second = IndexStatsSnapshot.objects.create(label="after-load")
+
+        assert snapshots.resolve_snapshot(str(first.pk)) == first
+        assert snapshots.resolve_snapshot("baseline") == first
+        assert snapshots.resolve_snapshot("latest") == second
+
+    def test_missing(self):
+        with pytest.raises(IndexStatsSnapshot.DoesNotExist):
+            snapshots.resolve_snapshot("nope")
+
+
+@pytest.mark.django_db
+def test_usage_of_databases_missing_from_the_snapshot_is_refused():
+    snapshot = IndexStatsSnapshot.objects.create(label="primary-only")
+    IndexStatsSnapshotEntry.objects.create(snapshot=snapshot, schema="public", table="shop_order", index="idx")
+
+    assert snapshots.recorded_databases(snapshot) == {"default"}
+    # Without a baseline, the replica's cumulative counters would be summed with the deltas.
+    with pytest.raises(ValueError, match="replica1"):
+        collect_usage(["replica1"], snapshot)
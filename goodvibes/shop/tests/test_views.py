@@ -0,0 +1,99 @@
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+from goodvibes.shop.views import decode_cursor
+from goodvibes.shop.views import encode_cursor
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _public_api(settings):
+    settings.SHOP_API_PUBLIC = True
+
+
+@pytest.fixture
+def customer():
+    customer = Customer.objects.create(email="Ada@example.com", full_name="Ada")
+    products = [Product.objects.create(sku=f"SKU-{i}", name=f"P{i}", category="books") for i in range(2)]
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    for i in range(5):
+        # Two orders share each timestamp so the cursor has to break ties on id.
+        order = Order.objects.create(customer=customer, created_at=start + timedelta(hours=i // 2))
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=i + 1)
+    return customer
+
+
+def test_api_is_staff_only_unless_public(client, settings, admin_user, customer):
+    settings.SHOP_API_PUBLIC = False
+    url = reverse("shop:customer-orders", kwargs={"customer_id": customer.pk})
+
+    assert client.get(url).status_code == HTTPStatus.FORBIDDEN
+    client.force_login(admin_user)
+    assert client.get(url).status_code == HTTPStatus.OK
+
+
+def test_product_by_sku(client):
+    Product.objects.create(sku="SKU-9", name="Nine", category="games")
+
+    response = client.get(reverse("shop:product-detail", kwargs={"sku": "SKU-9"}))
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["name"] == "Nine"
+    assert client.get(reverse("shop:product-detail", kwargs={"sku": "nope"})).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_customer_by_email_is_case_insensitive(client, customer):
+    url = reverse("shop:customer-by-email")
+
+    assert client.get(url, {"email": "ada@EXAMPLE.com"}).json()["id"] == customer.pk
+    assert client.get(url).status_code == HTTPStatus.BAD_REQUEST
+    assert client.get(url, {"email": "bob@example.com"}).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_orders_keyset_pagination(client, customer):
+    url = reverse("shop:customer-orders", kwargs={"customer_id": customer.pk})
+    orders = Order.objects.filter(customer=customer).order_by("-created_at", "-pk")
+    expected = list(orders.values_list("pk", flat=True))
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        with CaptureQueriesContext(connection) as queries:
+            body = client.get(url, params).json()
+        # Customer check, one page of orders, one prefetch for all their items (ATOMIC_REQUESTS adds savepoints).
+        assert sum(q["sql"].startswith("SELECT") for q in queries.captured_queries) == 3
+        assert all(len(order["items"]) == 2 for order in body["orders"])
+        seen.extend(order["id"] for order in body["orders"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_orders_rejects_bad_input(client, customer):
+    url = reverse("shop:customer-orders", kwargs={"customer_id": customer.pk})
+
+    assert client.get(url, {"cursor": "not-a-cursor"}).status_code == HTTPStatus.BAD_REQUEST
+    assert client.get(url, {"limit": "x"}).status_code == HTTPStatus.BAD_REQUEST
+    missing = reverse("shop:customer-orders", kwargs={"customer_id": customer.pk + 1})
+    assert client.get(missing).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_cursor_round_trip():
+    order = Order(pk=42, created_at=datetime(2026, 3, 4, 5, 6, 7, 890, tzinfo=UTC))
+
+    assert decode_cursor(encode_cursor(order)) == (order.created_at, 42)
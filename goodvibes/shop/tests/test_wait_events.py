@@ -0,0 +1,22 @@
+from goodvibes.shop.wait_events import WaitEventSampler
+from goodvibes.shop.wait_events import classify
+
+
+def test_classify():
+    assert classify("active", None, None) == "CPU"
+    assert classify("active", "IO", "DataFileRead") == "IO:DataFileRead"
+    assert classify("idle", "Client", "ClientRead") == "Client"
+    assert classify("idle in transaction", None, None) == "Client"
+
+
+def test_ring_buffer_keeps_latest_samples_per_operation():
+    sampler = WaitEventSampler(pid=1, capacity=3)
+    for sample in [("a", "CPU"), ("a", "IO:DataFileRead"), ("b", "CPU"), ("b", "CPU")]:
+        sampler.samples.append(sample)
+        sampler.total_samples += 1
+
+    summary = sampler.summary()
+
+    assert summary["a"] == {"IO:DataFileRead": 1}
+    assert summary["b"] == {"CPU": 2}
+    assert "1 older samples dropped" in sampler.report_lines()[0]
@@ -0,0 +1,44 @@
+import pytest
+from django.db import connection
+
+from goodvibes.shop.whatif import HypoPG
+from goodvibes.shop.whatif import hypothetical_indexes
+from goodvibes.shop.whatif import sample_queries
+from goodvibes.shop.workload import OPERATIONS
+from goodvibes.shop.workload import WorkloadKeys
+
+KEYS = WorkloadKeys(
+    product_skus=["SKU1", "SKU2"],
+    customer_ids=[1, 2],
+    customer_emails=["a@example.com"],
+    order_ids=[10, 11],
+)
+
+
+def test_sample_queries_are_deterministic_per_seed():
+    queries = sample_queries(KEYS, samples=3, seed=7)
+
+    assert [op.name for op, _sql, _params in queries] == [op.name for op in OPERATIONS for _ in range(3)]
+    assert queries == sample_queries(KEYS, samples=3, seed=7)
+
+
+def test_adding_indexes_requires_hypopg():
+    with pytest.raises(RuntimeError, match="HypoPG"):  # noqa: SIM117
+        with hypothetical_indexes(
+            connection,
+            add=["CREATE INDEX ON shop_order (created_at)"],
+            hide=[],
+            hypopg=HypoPG(installed=False, can_hide=False),
+        ):
+            pass
+
+
+def test_hiding_indexes_requires_hypopg_hide_index():
+    with pytest.raises(RuntimeError, match="hypopg_hide_index"):  # noqa: SIM117
+        with hypothetical_indexes(
+            connection,
+            add=[],
+            hide=["idx_order_customer_only"],
+            hypopg=HypoPG(installed=True, can_hide=False),
+        ):
+            pass
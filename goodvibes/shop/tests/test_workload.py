@@ -0,0 +1,54 @@
+import random
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+
+from goodvibes.shop.workload import INDEX_ONLY_OPERATIONS
+from goodvibes.shop.workload import MIXES
+from goodvibes.shop.workload import OPERATIONS
+from goodvibes.shop.workload import ORDER_RANGE
+from goodvibes.shop.workload import TIME_RANGE_OPERATIONS
+from goodvibes.shop.workload import OperationPicker
+from goodvibes.shop.workload import WorkloadKeys
+
+
+def _legacy_pick(r):
+    # The if/elif chain simulate_load used before operations became data.
+    for threshold, name in [
+        (0.3, "product_by_sku"),
+        (0.55, "customer_by_email"),
+        (0.8, "recent_orders"),
+        (0.95, "order_items"),
+    ]:
+        if r < threshold:
+            return name
+    return "open_orders"
+
+
+def test_picker_matches_legacy_distribution():
+    picker = OperationPicker()
+    rng = random.Random(123)
+    legacy = random.Random(123)
+
+    for _ in range(10_000):
+        assert picker.pick(rng).name == _legacy_pick(legacy.random())
+
+
+def test_picker_boundaries():
+    picker = OperationPicker()
+
+    assert picker.thresholds == [0.3, 0.55, 0.8, 0.95, 1.0]
+    assert [op.name for op in OPERATIONS][-1] == "open_orders"
+
+
+def test_time_range_operations_pick_windows_within_data():
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    keys = WorkloadKeys([], [], [], [], order_dates=(start, start + timedelta(days=30)))
+    orders_in_range = next(op for op in TIME_RANGE_OPERATIONS if op.name == "orders_in_range")
+
+    (lookup,) = orders_in_range.build(keys, random.Random(1)).query.where.children
+    lo, hi = lookup.rhs
+
+    assert start <= lo <= start + timedelta(days=30)
+    assert hi - lo == ORDER_RANGE
+    assert MIXES["all"] == OPERATIONS + TIME_RANGE_OPERATIONS + INDEX_ONLY_OPERATIONS
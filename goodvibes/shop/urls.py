@@ -0,0 +1,12 @@
+from django.urls import path
+
+from .views import customer_by_email_view
+from .views import customer_orders_view
+from .views import product_detail_view
+
+app_name = "shop"
+urlpatterns = [
+    path("products/<str:sku>/", view=product_detail_view, name="product-detail"),
+    path("customers/by-email/", view=customer_by_email_view, name="customer-by-email"),
+    path("customers/<int:customer_id>/orders/", view=customer_orders_view, name="customer-orders"),
+]
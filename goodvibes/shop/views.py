@@ -0,0 +1,140 @@
+"""Read-only JSON endpoints over the shop tables.
+
+They issue the same query shapes as the ``simulate_load`` operations
+(``product_by_sku``, ``customer_by_email``, ``recent_orders`` + ``order_items``)
+so HTTP-level benchmarks exercise the same indexes; the two single-row lookups
+go through ``goodvibes.shop.cache`` first. A customer's orders are
+paged with a keyset cursor on ``(created_at, id)``, which walks
+``idx_order_customer_created_at`` instead of counting past an OFFSET, and their
+items are loaded with one prefetch query per page.
+
+The endpoints return customer emails and order history, so they only answer
+staff users unless ``settings.DEBUG`` or ``settings.SHOP_API_PUBLIC`` is set
+(``simulate_load --http`` enables the latter for its in-process requests).
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from goodvibes.shop import cache
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _error(message: str, status: HTTPStatus) -> JsonResponse:
+    return JsonResponse({"error": message}, status=status)
+
+
+def encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        msg = "Invalid cursor."
+        raise ValueError(msg) from exc
+
+
+def api_allowed(request) -> bool:
+    return settings.DEBUG or getattr(settings, "SHOP_API_PUBLIC", False) or request.user.is_staff
+
+
+def shop_api(view):
+    """``require_GET`` plus the staff/``SHOP_API_PUBLIC`` gate."""
+
+    @require_GET
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not api_allowed(request):
+            return _error("The shop API is only available to staff users.", HTTPStatus.FORBIDDEN)
+        return view(request, *args, **kwargs)
+
+    return wrapped
+
+
+@shop_api
+def product_detail_view(request, sku: str):
+    product = cache.product_by_sku.get(sku)
+    if product is None:
+        return _error("Product not found.", HTTPStatus.NOT_FOUND)
+    return JsonResponse(product)
+
+
+@shop_api
+def customer_by_email_view(request):
+    email = request.GET.get("email", "").strip()
+    if not email:
+        return _error("The email parameter is required.", HTTPStatus.BAD_REQUEST)
+    customer = cache.customer_by_email.get(email)
+    if customer is None:
+        return _error("Customer not found.", HTTPStatus.NOT_FOUND)
+    return JsonResponse(customer)
+
+
+@shop_api
+def customer_orders_view(request, customer_id: int):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return _error("limit must be an integer.", HTTPStatus.BAD_REQUEST)
+    limit = min(max(1, limit), MAX_PAGE_SIZE)
+
+    if not Customer.objects.filter(pk=customer_id).exists():
+        return _error("Customer not found.", HTTPStatus.NOT_FOUND)
+
+    orders = Order.objects.filter(customer_id=customer_id)
+    if cursor := request.GET.get("cursor"):
+        try:
+            created_at, pk = decode_cursor(cursor)
+        except ValueError as exc:
+            return _error(str(exc), HTTPStatus.BAD_REQUEST)
+        # ``created_at <= x`` bounds the index scan; an OR of ``created_at < x`` and the
+        # tie would not, so the tie's already-seen rows are excluded separately.
+        orders = orders.filter(created_at__lte=created_at).exclude(created_at=created_at, pk__gte=pk)
+    items = OrderItem.objects.select_related("product").only("order_id", "quantity", "product__sku").order_by("pk")
+    page = list(
+        orders.order_by("-created_at", "-pk")
+        .only("id", "created_at", "cancelled_at")
+        .prefetch_related(Prefetch("orderitem_set", queryset=items, to_attr="items"))[: limit + 1],
+    )
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    return JsonResponse(
+        {
+            "customer_id": customer_id,
+            "orders": [
+                {
+                    "id": order.pk,
+                    "created_at": order.created_at.isoformat(),
+                    "cancelled_at": order.cancelled_at.isoformat() if order.cancelled_at else None,
+                    "items": [
+                        {"product_id": item.product_id, "sku": item.product.sku, "quantity": item.quantity}
+                        for item in order.items
+                    ],
+                }
+                for order in page
+            ],
+            "next_cursor": encode_cursor(page[-1]) if has_more else None,
+        },
+    )
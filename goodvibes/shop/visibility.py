@@ -0,0 +1,60 @@
+"""Visibility-map coverage of the shop tables.
+
+An Index Only Scan can skip the heap only for pages marked all-visible in the
+visibility map; VACUUM sets the bits, and every insert/update/delete on a page
+clears them. ``pg_class.relallvisible`` (refreshed by VACUUM and ANALYZE) is
+the planner's view of that coverage, so a low ratio means index-only paths are
+paying heap fetches until autovacuum catches up. The ``pg_visibility``
+extension gives exact counts; this estimate needs no extension.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from goodvibes.shop import snapshots
+
+VISIBILITY_SQL = """
+SELECT c.relname, c.relpages, c.relallvisible, s.n_dead_tup, s.n_mod_since_analyze, s.n_ins_since_vacuum,
+       GREATEST(s.last_vacuum, s.last_autovacuum)
+FROM pg_class c
+JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind = 'r'
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+ORDER BY c.relname
+"""
+
+
+@dataclass(frozen=True)
+class TableVisibility:
+    table: str
+    pages: int
+    all_visible_pages: int
+    dead_tuples: int
+    modified_since_analyze: int
+    inserted_since_vacuum: int
+    last_vacuum: datetime | None
+
+    @property
+    def all_visible_pct(self) -> float | None:
+        if self.pages <= 0:
+            return None
+        return min(100.0, 100.0 * self.all_visible_pages / self.pages)
+
+
+def fetch_visibility(cursor) -> list[TableVisibility]:
+    cursor.execute(VISIBILITY_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+    return [TableVisibility(*row) for row in cursor.fetchall()]
+
+
+def report_lines(tables: list[TableVisibility]) -> list[str]:
+    lines = [f"  {'table':<28} {'pages':>9} {'all-vis%':>8} {'dead_tup':>10} {'ins_since_vac':>13}  last vacuum"]
+    for t in tables:
+        pct = "-" if t.all_visible_pct is None else f"{t.all_visible_pct:.1f}"
+        vacuumed = f"{t.last_vacuum:%Y-%m-%d %H:%M}" if t.last_vacuum else "never"
+        lines.append(
+            f"  {t.table:<28} {t.pages:>9} {pct:>8} {t.dead_tuples:>10} {t.inserted_since_vacuum:>13}  {vacuumed}",
+        )
+    return lines
@@ -0,0 +1,91 @@
+"""Active-session-history style wait-event sampling for workload runs.
+
+A background thread polls ``pg_stat_activity`` for the workload's backend at a
+fixed interval and appends ``(operation, wait)`` to a bounded ring buffer. The
+workload marks which operation is running via ``WaitEventSampler.current``, so
+at the end each operation's time can be split into CPU, I/O, LWLock, lock and
+client-side (idle: Python, ORM, network) shares.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+from collections import deque
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SQL = "SELECT state, wait_event_type, wait_event FROM pg_stat_activity WHERE pid = %s"
+
+# Samples kept; at the default 10ms interval this is the last ~10 minutes.
+RING_SIZE = 60_000
+
+
+def classify(state: str | None, wait_event_type: str | None, wait_event: str | None) -> str:
+    if state != "active":
+        # Backend is waiting for the client: time spent in Python, the ORM or on the network.
+        return "Client"
+    if not wait_event_type:
+        return "CPU"
+    return f"{wait_event_type}:{wait_event}"
+
+
+class WaitEventSampler:
+    """Sample the wait state of backend ``pid`` from a separate connection."""
+
+    def __init__(self, pid: int, *, alias: str = "default", interval: float = 0.01, capacity: int = RING_SIZE):
+        self.pid = pid
+        self.alias = alias
+        self.interval = interval
+        self.samples: deque[tuple[str, str]] = deque(maxlen=capacity)
+        self.total_samples = 0
+        # Set by the workload loop; read by the sampler thread.
+        self.current: str | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wait-event-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            with connections[self.alias].cursor() as cur:
+                while not self._stop.wait(self.interval):
+                    operation = self.current or "-"
+                    cur.execute(SAMPLE_SQL, [self.pid])
+                    row = cur.fetchone()
+                    if row is None:
+                        continue
+                    self.samples.append((operation, classify(*row)))
+                    self.total_samples += 1
+        except Exception:
+            logger.exception("Wait-event sampling stopped")
+        finally:
+            connections[self.alias].close()
+
+    def summary(self) -> dict[str, Counter]:
+        """Wait classes per operation over the samples still in the ring buffer."""
+        result: dict[str, Counter] = {}
+        for operation, wait in self.samples:
+            result.setdefault(operation, Counter())[wait] += 1
+        return result
+
+    def report_lines(self, top: int = 4) -> list[str]:
+        summary = self.summary()
+        lines = [
+            f"Wait events: {len(self.samples)} samples every {self.interval * 1000:.0f}ms "
+            f"({self.total_samples - len(self.samples)} older samples dropped from the ring buffer)",
+        ]
+        for operation, waits in sorted(summary.items(), key=lambda item: -item[1].total()):
+            total = waits.total()
+            shares = ", ".join(f"{wait} {count / total * 100:.0f}%" for wait, count in waits.most_common(top))
+            lines.append(f"  {operation:<18} {total:>7} samples  {shares}")
+        return lines
@@ -0,0 +1,101 @@
+"""Evaluate workload plans against hypothetical index sets.
+
+Added indexes are created with HypoPG (``hypopg_create_index``), which only
+exists in the planner of the current session, so plain ``EXPLAIN`` sees them
+without anything being built. Hidden indexes use ``hypopg_hide_index`` (HypoPG
+1.4+); there is no fallback, since dropping a real index, even in a transaction
+that is rolled back, holds an ACCESS EXCLUSIVE lock on its table until the
+rollback.
+"""
+
+from __future__ import annotations
+
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from goodvibes.shop.plans import PlanSummary
+from goodvibes.shop.plans import summarize_plan
+from goodvibes.shop.workload import OPERATIONS
+from goodvibes.shop.workload import Operation
+from goodvibes.shop.workload import WorkloadKeys
+
+HYPOPG_SQL = """
+SELECT
+  EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'hypopg'),
+  EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'hypopg_hide_index')
+"""
+
+
+@dataclass(frozen=True)
+class HypoPG:
+    installed: bool
+    can_hide: bool
+
+
+def hypopg_support(cursor) -> HypoPG:
+    cursor.execute(HYPOPG_SQL)
+    installed, can_hide = cursor.fetchone()
+    return HypoPG(installed, installed and can_hide)
+
+
+def sample_queries(
+    keys: WorkloadKeys,
+    samples: int,
+    seed: int = 123,
+    operations: tuple[Operation, ...] = OPERATIONS,
+) -> list[tuple[Operation, str, list]]:
+    """``samples`` parameterised queries per workload operation."""
+    rng = random.Random(seed)
+    queries = []
+    for operation in operations:
+        for _ in range(samples):
+            sql, params = operation.build(keys, rng).query.sql_with_params()
+            queries.append((operation, sql, list(params)))
+    return queries
+
+
+@dataclass
+class Evaluation:
+    operation: Operation
+    mean_cost: float
+    plan: PlanSummary
+
+
+def evaluate(cursor, queries: list[tuple[Operation, str, list]]) -> dict[str, Evaluation]:
+    """Mean planner cost per operation (plain EXPLAIN, nothing is executed)."""
+    costs: dict[str, list[float]] = {}
+    result: dict[str, Evaluation] = {}
+    for operation, sql, params in queries:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = summarize_plan(cursor.fetchone()[0], sql=sql)
+        costs.setdefault(operation.name, []).append(plan.total_cost)
+        result.setdefault(operation.name, Evaluation(operation, 0.0, plan))
+    for name, values in costs.items():
+        result[name].mean_cost = sum(values) / len(values)
+    return result
+
+
+@contextmanager
+def hypothetical_indexes(connection, *, add: list[str], hide: list[str], hypopg: HypoPG):
+    """Make the planner of ``connection`` see ``add`` and not see ``hide`` for the block."""
+    if add and not hypopg.installed:
+        msg = "Hypothetical indexes require the HypoPG extension (CREATE EXTENSION hypopg)."
+        raise RuntimeError(msg)
+    if hide and not hypopg.can_hide:
+        msg = "Hiding indexes requires hypopg_hide_index() (HypoPG 1.4+)."
+        raise RuntimeError(msg)
+    try:
+        with connection.cursor() as cur:
+            for statement in add:
+                cur.execute("SELECT indexrelid FROM hypopg_create_index(%s)", [statement])
+            for name in hide:
+                cur.execute("SELECT hypopg_hide_index(%s::regclass)", [name])
+        yield
+    finally:
+        # HypoPG state lives in the session, not the transaction.
+        if hypopg.installed:
+            with connection.cursor() as cur:
+                cur.execute("SELECT hypopg_reset()")
+                if hypopg.can_hide:
+                    cur.execute("SELECT hypopg_unhide_all_indexes()")
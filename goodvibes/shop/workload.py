@@ -0,0 +1,213 @@
+"""The biased read workload driven by ``simulate_load``.
+
+Each access path is an ``Operation``: a relative weight, a function building
+the queryset for one call from preloaded keys, and the indexes it is meant to
+exercise. Keeping them as data lets other tools (EXPLAIN capture, profiling)
+reuse exactly the queries the load generator runs.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import random
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+
+from django.db.models import Max
+from django.db.models import Min
+from django.db.models import QuerySet
+
+from goodvibes.shop import cache
+from goodvibes.shop.models import Customer
+from goodvibes.shop.models import Order
+from goodvibes.shop.models import OrderItem
+from goodvibes.shop.models import Product
+
+
+@dataclass
+class WorkloadKeys:
+    """Ids and natural keys sampled by the operations, preloaded to avoid extra queries."""
+
+    product_skus: list[str]
+    customer_ids: list[int]
+    customer_emails: list[str]
+    order_ids: list[int]
+    # (oldest, newest) created_at, for the time-range operations.
+    order_dates: tuple[datetime, datetime] | None = None
+    product_dates: tuple[datetime, datetime] | None = None
+
+    @classmethod
+    def load(cls) -> WorkloadKeys:
+        order_dates = Order.objects.aggregate(lo=Min("created_at"), hi=Max("created_at"))
+        product_dates = Product.objects.aggregate(lo=Min("created_at"), hi=Max("created_at"))
+        return cls(
+            product_skus=list(Product.objects.values_list("sku", flat=True)[:10000]),
+            customer_ids=list(Customer.objects.values_list("id", flat=True)[:10000]),
+            customer_emails=list(Customer.objects.values_list("email", flat=True)[:10000]),
+            order_ids=list(Order.objects.values_list("id", flat=True)[:20000]),
+            order_dates=(order_dates["lo"], order_dates["hi"]) if order_dates["lo"] else None,
+            product_dates=(product_dates["lo"], product_dates["hi"]) if product_dates["lo"] else None,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.product_skus and self.customer_ids and self.customer_emails and self.order_ids)
+
+
+@dataclass(frozen=True)
+class Operation:
+    name: str
+    # Relative weight; operations are picked with probability weight / total.
+    weight: int
+    build: Callable[[WorkloadKeys, random.Random], QuerySet]
+    # ``get()`` a single row instead of evaluating the (sliced) queryset.
+    single: bool = False
+    # Index names (fnmatch patterns) this access path is expected to use.
+    expected_indexes: tuple[str, ...] = ()
+    description: str = ""
+    # Same lookup through goodvibes.shop.cache (``simulate_load --cached``); draws the same keys as ``build``.
+    cached: Callable[[WorkloadKeys, random.Random], object] | None = None
+
+    def run(self, queryset: QuerySet):
+        if self.single:
+            return queryset.get()
+        return list(queryset)
+
+
+OPERATIONS: tuple[Operation, ...] = (
+    Operation(
+        "product_by_sku",
+        30,
+        lambda keys, rng: Product.objects.only("id").filter(sku=rng.choice(keys.product_skus)),
+        single=True,
+        expected_indexes=("shop_product_sku_key",),
+        description="Product by SKU (implicit unique index; leaves the duplicate non-unique one unused)",
+        cached=lambda keys, rng: cache.product_by_sku.get(rng.choice(keys.product_skus)),
+    ),
+    Operation(
+        "customer_by_email",
+        25,
+        lambda keys, rng: Customer.objects.only("id").filter(email__iexact=rng.choice(keys.customer_emails)),
+        single=True,
+        expected_indexes=("idx_customer_email_lower",),
+        description="Customer by case-insensitive email (meant for the functional lower(email) index)",
+        cached=lambda keys, rng: cache.customer_by_email.get(rng.choice(keys.customer_emails)),
+    ),
+    Operation(
+        "recent_orders",
+        25,
+        lambda keys, rng: Order.objects.filter(customer_id=rng.choice(keys.customer_ids))
+        .order_by("-created_at")
+        .only("id")[:50],
+        expected_indexes=("idx_order_customer_created_at",),
+        description="Recent orders for a customer (composite (customer, created_at))",
+        cached=lambda keys, rng: cache.recent_orders.ids(rng.choice(keys.customer_ids)),
+    ),
+    Operation(
+        "order_items",
+        15,
+        lambda keys, rng: OrderItem.objects.filter(order_id=rng.choice(keys.order_ids)).only("id")[:100],
+        expected_indexes=("idx_orderitem_order_product", "idx_orderitem_order_only"),
+        description="Order items by order ((order, product) or (order))",
+    ),
+    Operation(
+        "open_orders",
+        5,
+        lambda keys, rng: Order.objects.filter(cancelled_at__isnull=True).order_by("created_at").only("id")[:50],
+        expected_indexes=("idx_order_cancelled_partial",),
+        description="Orders that are not cancelled (planner should use the partial index)",
+    ),
+)
+
+# Width of the created_at windows scanned by the time-range operations.
+ORDER_RANGE = timedelta(hours=1)
+PRODUCT_RANGE = timedelta(minutes=1)
+
+
+def _window(
+    dates: tuple[datetime, datetime] | None,
+    width: timedelta,
+    rng: random.Random,
+) -> tuple[datetime, datetime]:
+    if dates is None:
+        msg = "No rows to pick a time range from."
+        raise LookupError(msg)
+    lo, hi = dates
+    start = lo + (hi - lo) * rng.random()
+    return start, start + width
+
+
+# Range scans on created_at, which follows insertion order: compare BRIN and
+# B-tree by hiding one of them (benchmark_index_layouts / what_if_indexes).
+TIME_RANGE_OPERATIONS: tuple[Operation, ...] = (
+    Operation(
+        "orders_in_range",
+        60,
+        lambda keys, rng: Order.objects.filter(
+            created_at__range=_window(keys.order_dates, ORDER_RANGE, rng),
+        ).values_list("id", flat=True),
+        expected_indexes=("idx_order_created_brin", "idx_order_created_btree"),
+        description="Orders created within an hour (BRIN or B-tree on created_at)",
+    ),
+    Operation(
+        "products_in_range",
+        40,
+        lambda keys, rng: Product.objects.filter(
+            created_at__range=_window(keys.product_dates, PRODUCT_RANGE, rng),
+        ).values_list("id", flat=True),
+        expected_indexes=("idx_product_created_brin", "idx_product_created_btree"),
+        description="Products created within a minute (BRIN or B-tree on created_at)",
+    ),
+)
+
+# Queries that only read columns stored in an index, so the planner can use an
+# Index Only Scan; each heap fetch they still do is a page whose
+# visibility-map bit was cleared by writes since the last VACUUM.
+INDEX_ONLY_OPERATIONS: tuple[Operation, ...] = (
+    Operation(
+        "order_dates",
+        50,
+        lambda keys, rng: Order.objects.filter(customer_id=rng.choice(keys.customer_ids))
+        .order_by("-created_at")
+        .values_list("created_at", flat=True)[:50],
+        expected_indexes=("idx_order_customer_created_at", "idx_order_cust_inc_created"),
+        description="A customer's recent order timestamps (covered by (customer, created_at))",
+    ),
+    Operation(
+        "order_product_ids",
+        50,
+        lambda keys, rng: OrderItem.objects.filter(order_id=rng.choice(keys.order_ids)).values_list(
+            "product_id",
+            flat=True,
+        ),
+        expected_indexes=("idx_orderitem_order_product",),
+        description="Product ids of an order's items (covered by (order, product))",
+    ),
+)
+
+# Workload mixes selectable with ``simulate_load --mix``.
+MIXES: dict[str, tuple[Operation, ...]] = {
+    "default": OPERATIONS,
+    "time-range": TIME_RANGE_OPERATIONS,
+    "index-only": INDEX_ONLY_OPERATIONS,
+    "all": OPERATIONS + TIME_RANGE_OPERATIONS + INDEX_ONLY_OPERATIONS,
+}
+
+
+class OperationPicker:
+    """Pick operations by weight from a single ``random()`` draw per call.
+
+    With weights 30/25/25/15/5 this consumes the random stream exactly like the
+    original ``r < 0.3 / < 0.55 / ...`` chain, so seeded runs stay comparable.
+    """
+
+    def __init__(self, operations: tuple[Operation, ...] = OPERATIONS):
+        self.operations = operations
+        total = sum(op.weight for op in operations)
+        self.thresholds = [acc / total for acc in itertools.accumulate(op.weight for op in operations)]
+
+    def pick(self, rng: random.Random) -> Operation:
+        index = bisect.bisect_right(self.thresholds, rng.random())
+        return self.operations[min(index, len(self.operations) - 1)]
@@ -0,0 +1,123 @@
+"""Write-amplification cost attributed to each index.
+
+Every inserted row and every non-HOT update adds one entry to each index of the
+table (HOT updates touch no index at all), so the index write rate follows from
+``pg_stat_user_tables``. PostgreSQL does not count writes per index —
+``pg_statio_user_indexes`` only has block reads and hits — so the bytes an
+index costs per second are estimated as entries written times the average
+on-disk entry size plus a fixed WAL record overhead, and reported next to the
+size growth actually observed between snapshots.
+
+Rates are per second over the measurement window: since a snapshot when one
+is given, otherwise since statistics were last reset (or the server started).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from goodvibes.shop import snapshots
+
+# Approximate XLogRecord header + block reference + btree insert record,
+# excluding the index tuple itself. Full-page images are not included.
+WAL_RECORD_OVERHEAD = 50
+
+# Per model index; a partitioned table's row writes, sizes and entries are
+# summed over its partitions (pg_partition_tree).
+WRITE_COST_SQL = """
+SELECT
+  ic.oid,
+  n.nspname,
+  c.relname,
+  ic.relname,
+  t.n_tup_ins,
+  t.n_tup_upd,
+  t.n_tup_hot_upd,
+  t.n_tup_del,
+  idx.bytes,
+  idx.reltuples
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+CROSS JOIN LATERAL (
+  SELECT
+    COALESCE(sum(s.n_tup_ins), 0)::bigint AS n_tup_ins,
+    COALESCE(sum(s.n_tup_upd), 0)::bigint AS n_tup_upd,
+    COALESCE(sum(s.n_tup_hot_upd), 0)::bigint AS n_tup_hot_upd,
+    COALESCE(sum(s.n_tup_del), 0)::bigint AS n_tup_del
+  FROM (SELECT c.oid AS relid UNION SELECT relid FROM pg_partition_tree(c.oid)) AS tree
+  JOIN pg_stat_user_tables s ON s.relid = tree.relid
+) AS t
+CROSS JOIN LATERAL (
+  SELECT sum(pg_relation_size(r.oid))::bigint AS bytes, sum(GREATEST(r.reltuples, 0)) AS reltuples
+  FROM (SELECT ic.oid AS relid UNION SELECT relid FROM pg_partition_tree(ic.oid)) AS tree
+  JOIN pg_class r ON r.oid = tree.relid
+) AS idx
+WHERE c.relkind IN ('r', 'p')
+  AND NOT ic.relispartition
+  AND c.relname LIKE 'shop_%%'
+  AND c.relname <> ALL(%s)
+"""
+
+WINDOW_SQL = """
+SELECT EXTRACT(EPOCH FROM now() - COALESCE(stats_reset, pg_postmaster_start_time()))
+FROM pg_stat_database
+WHERE datname = current_database()
+"""
+
+
+@dataclass(frozen=True)
+class WriteCost:
+    ins_per_sec: float
+    upd_per_sec: float
+    del_per_sec: float
+    non_hot_pct: float | None
+    entries_per_sec: float
+    growth_bytes_per_sec: float | None
+    write_bytes_per_sec: float
+
+
+def window_seconds(cursor, snapshot=None) -> float:
+    if snapshot is not None:
+        cursor.execute("SELECT EXTRACT(EPOCH FROM now() - %s)", [snapshot.created_at])
+    else:
+        cursor.execute(WINDOW_SQL)
+    row = cursor.fetchone()
+    return max(1.0, float(row[0])) if row and row[0] is not None else 0.0
+
+
+def fetch_write_costs(cursor, snapshot=None) -> dict[int, WriteCost]:
+    """``{index_oid: WriteCost}`` for every shop index, since ``snapshot`` if given."""
+    seconds = window_seconds(cursor, snapshot)
+    if not seconds:
+        return {}
+    index_base = snapshots.baseline(snapshot, cursor.db.alias) if snapshot is not None else {}
+    table_base = snapshots.table_baseline(snapshot) if snapshot is not None else {}
+
+    cursor.execute(WRITE_COST_SQL, [list(snapshots.SNAPSHOT_TABLES)])
+    result: dict[int, WriteCost] = {}
+    for oid, schema, table, index, n_ins, n_upd, n_hot, n_del, size_bytes, reltuples in cursor.fetchall():
+        base = table_base.get((schema, table), {})
+        ins = snapshots.delta(n_ins, base.get("n_tup_ins"))
+        upd = snapshots.delta(n_upd, base.get("n_tup_upd"))
+        hot = snapshots.delta(n_hot, base.get("n_tup_hot_upd"))
+        dels = snapshots.delta(n_del, base.get("n_tup_del"))
+        non_hot = max(0, upd - hot)
+        entries_per_sec = (ins + non_hot) / seconds
+        entry_bytes = size_bytes / reltuples if reltuples else 0.0
+
+        growth = None
+        if (schema, index) in index_base:
+            growth = (size_bytes - index_base[(schema, index)]["size_bytes"]) / seconds
+
+        result[oid] = WriteCost(
+            ins_per_sec=ins / seconds,
+            upd_per_sec=upd / seconds,
+            del_per_sec=dels / seconds,
+            non_hot_pct=100.0 * non_hot / upd if upd else None,
+            entries_per_sec=entries_per_sec,
+            growth_bytes_per_sec=growth,
+            write_bytes_per_sec=entries_per_sec * (entry_bytes + WAL_RECORD_OVERHEAD),
+        )
+    return result